@@ -1,6 +1,16 @@
 from __future__ import absolute_import, print_function
 
 import abc
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from motex.common.constants import _DEFAULT_METADATA_KEY, _ORDER_KEY_SUFFIX, _DEFAULT_ORDER_PAGE_SIZE
+from motex.common.interval import MotexIntervalIndex
+from motex.common.schema import _SCHEMA_VERSION, record_field, upgrade_id, upgrade_record
+
+# order pages kept by a helper for random access
+_ORDER_PAGES_CACHED = 8
 
 
 class HelperMeta(metaclass=abc.ABCMeta):
@@ -13,4 +23,251 @@ class HelperMeta(metaclass=abc.ABCMeta):
 
 
 class HelperBase(HelperMeta):
-    pass
+    _records_key = None
+    _records_name = None
+    _record_class = None
+    _address_ordered = False
+    _order_pages_cache = None
+    _interval_index = None
+    _schema_version = None
+    # end address of a record, set by address-ordered kinds that can be
+    # searched without an interval index
+    _record_end = None
+
+    def all(self, batch_size=None):
+        return self._iter(batch_size)
+
+    def __iter__(self):
+        return self._iter()
+
+    def reverse(self, batch_size=None):
+        return self._iter(batch_size, reverse=True)
+
+    def _iter_linked(self):
+        raise NotImplementedError()
+
+    def _reverse_linked(self):
+        raise NotImplementedError()
+
+    def _get_schema_version(self):
+        if self._schema_version is None:
+            field = f'{self._records_name}_schema_version'
+            self._schema_version = self._storage.load(_DEFAULT_METADATA_KEY, field) or 1
+        return self._schema_version
+
+    def _field(self, index):
+        return record_field(self._records_name, index, self._get_schema_version())
+
+    def _parse_id(self, index):
+        '''
+        Ids given as text are hex addresses or decimal positions, as printed.
+        '''
+        return upgrade_id(self._records_name, index)
+
+    def _make(self, data):
+        version = self._get_schema_version()
+        if version < _SCHEMA_VERSION:
+            data = upgrade_record(self._records_name, data, version)
+        return self._record_class.from_dict(data)
+
+    def _get_pages(self):
+        field = f'{self._records_name}_pages'
+        return self._storage.load(_DEFAULT_METADATA_KEY, field)
+
+    def _iter(self, batch_size=None, reverse=False):
+        pages = self._get_pages()
+        if pages is None:
+            # datasets stored without order pages can only be walked record by record
+            return self._reverse_linked() if reverse else self._iter_linked()
+
+        return self._iter_batched(pages, batch_size or _DEFAULT_ORDER_PAGE_SIZE, reverse)
+
+    def _iter_fields(self, pages, batch_size, reverse=False):
+        fields = []
+        for page in (range(pages - 1, -1, -1) if reverse else range(pages)):
+            page_fields = [self._field(index) for index in self._get_order_page(page)]
+            fields.extend(reversed(page_fields) if reverse else page_fields)
+
+            while len(fields) >= batch_size:
+                yield fields[:batch_size]
+                fields = fields[batch_size:]
+
+        if fields:
+            yield fields
+
+    def _iter_batched(self, pages, batch_size, reverse=False):
+        '''
+        >>> for ins in MotexInstructionHelper(storage).all(batch_size=4096):
+        ...  print str(ins)
+
+        Records are fetched `batch_size` at a time with one bulk read, the
+        next batch being read ahead while the current one is consumed.
+        '''
+        batches = self._iter_fields(pages, batch_size, reverse)
+
+        def fetch():
+            fields = next(batches, None)
+            if fields is None:
+                return None
+            return self._storage.load_many(self._records_key, fields)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = executor.submit(fetch)
+            while True:
+                records = pending.result()
+                if records is None:
+                    break
+
+                pending = executor.submit(fetch)
+                for data in records:
+                    if data is not None:
+                        yield self._make(data)
+
+    def __len__(self):
+        return self._count or 0
+
+    def __getitem__(self, item):
+        '''
+        >>> helper = MotexInstructionHelper(storage)
+        >>> helper[500000], helper[-1], helper[10:20]
+        '''
+        ordinals = range(len(self))
+        if isinstance(item, slice):
+            return self._load_ordinals(ordinals[item])
+
+        if not isinstance(item, int):
+            raise TypeError("index must be int or slice")
+        return self._load_ordinals([ordinals[item]])[0]
+
+    def between(self, start, end):
+        '''
+        >>> for ins in MotexInstructionHelper(storage).between(0x401000, 0x401100):
+        ...  print str(ins)
+
+        Records whose address is in [start, end).
+        '''
+        if not self._address_ordered:
+            raise Exception(f"{self._records_name} are not ordered by address")
+
+        return self[self._bisect(start):self._bisect(end)]
+
+    def _get_page_size(self):
+        field = f'{self._records_name}_page_size'
+        return self._storage.load(_DEFAULT_METADATA_KEY, field) or _DEFAULT_ORDER_PAGE_SIZE
+
+    def _get_page_index(self):
+        field = f'{self._records_name}_page_index'
+        page_index = self._storage.load(_DEFAULT_METADATA_KEY, field) or []
+        if self._get_schema_version() < 2:
+            page_index = [upgrade_id(self._records_name, index) for index in page_index]
+        return page_index
+
+    def _get_order_page(self, page):
+        if self._order_pages_cache is None:
+            self._order_pages_cache = OrderedDict()
+
+        pages = self._order_pages_cache
+        if page in pages:
+            pages.move_to_end(page)
+            return pages[page]
+
+        indexes = self._storage.load(self._records_key + _ORDER_KEY_SUFFIX, str(page)) or []
+        if self._get_schema_version() < 2:
+            indexes = [upgrade_id(self._records_name, index) for index in indexes]
+
+        pages[page] = indexes
+        if len(pages) > _ORDER_PAGES_CACHED:
+            pages.popitem(last=False)
+        return indexes
+
+    def _ordinal_ids(self, ordinals):
+        '''
+        Ids of the records at `ordinals`, read from the order pages only.
+        '''
+        page_size = self._get_page_size()
+        for ordinal in ordinals:
+            yield self._get_order_page(ordinal // page_size)[ordinal % page_size]
+
+    def _load_records(self, ordinals):
+        if self._get_pages() is None:
+            raise Exception(f"{self._records_name} were stored without ordinals")
+
+        fields = [self._field(index) for index in self._ordinal_ids(ordinals)]
+        records = self._storage.load_many(self._records_key, fields) if fields else []
+        return [None if data is None else self._make(data) for data in records]
+
+    def _load_ordinals(self, ordinals):
+        return [record for record in self._load_records(ordinals) if record is not None]
+
+    def _bisect(self, address):
+        page = bisect_right(self._get_page_index(), address) - 1
+        if page < 0:
+            return 0
+        return page * self._get_page_size() + bisect_left(self._get_order_page(page), address)
+
+    def has_interval_index(self):
+        if self._interval_index is None:
+            self._interval_index = MotexIntervalIndex.load(self._storage, self._records_name)
+        return self._interval_index is not None
+
+    def has_address_lookup(self):
+        '''
+        Whether `containing` can answer, through the interval index or, for
+        address-ordered records, their order pages.
+        '''
+        if self.has_interval_index():
+            return True
+        return self._record_end is not None and self._get_pages() is not None
+
+    def _get_interval_index(self):
+        if not self.has_interval_index():
+            raise Exception(f"{self._records_name} were stored without an address index")
+        return self._interval_index
+
+    def containing(self, address):
+        '''
+        >>> print str(MotexFunctionHelper(storage).containing(0x401234))
+        0x401200 <MotexFunction> main
+
+        Record whose address range holds `address`, or None.
+        '''
+        if not self.has_interval_index() and self._record_end is not None:
+            return self._containing_ordered([address])[0]
+
+        ordinal = self._get_interval_index().find(address)
+        if ordinal is None:
+            return None
+        return self._load_records([ordinal])[0]
+
+    def containing_many(self, addresses):
+        '''
+        >>> functions = MotexFunctionHelper(storage).containing_many(trace)
+
+        `containing` for a whole batch of addresses: the ranges are resolved in
+        one sorted sweep and the distinct records read with one bulk load.
+        '''
+        if not self.has_interval_index() and self._record_end is not None:
+            return self._containing_ordered(addresses)
+
+        ordinals = self._get_interval_index().find_many(addresses)
+
+        unique = sorted(set(ordinal for ordinal in ordinals if ordinal is not None))
+        records = dict(zip(unique, self._load_records(unique)))
+        return [None if ordinal is None else records[ordinal] for ordinal in ordinals]
+
+    def _containing_ordered(self, addresses):
+        '''
+        Lookup for address-ordered records stored without an interval index
+        (streamed instructions): the candidate is the last record starting at
+        or before the address, kept if its `_record_end` is past the address.
+        '''
+        positions = [self._bisect(address + 1) - 1 for address in addresses]
+
+        unique = sorted(set(position for position in positions if position >= 0))
+        records = dict(zip(unique, self._load_records(unique)))
+
+        found = []
+        for (address, position) in zip(addresses, positions):
+            record = records.get(position)
+            found.append(record if record is not None and address < self._record_end(record) else None)
+        return found
@@ -1,5 +1,13 @@
 
 
+# keys are `motex:<namespace>:<kind>`, one namespace per extracted binary
+_DEFAULT_NAMESPACE = 'default'
+
+_DEFAULT_KEY_PREFIX = 'motex:default:'
+
+# namespaces loaded into a storage, kept outside of any namespace
+_CORPUS_KEY = 'motex:corpus'
+
 _DEFAULT_METADATA_KEY = 'motex:default:meta'
 
 _DEFAULT_SECTIONS_KEY = 'motex:default:sections'
@@ -16,4 +24,30 @@ _DEFAULT_BASICBLOCKS_KEY = 'motex:default:basicblocks'
 
 _DEFAULT_CALLSITES_KEY = 'motex:default:callsites'
 
-_DEFAULT_INSTRUCTIONS_KEY = 'motex:default:instructions'
\ No newline at end of file
+_DEFAULT_INSTRUCTIONS_KEY = 'motex:default:instructions'
+
+_DEFAULT_INDEX_KEY = 'motex:default:index'
+
+_DEFAULT_CHECKPOINT_KEY = 'motex:default:checkpoint'
+
+_ORDER_KEY_SUFFIX = ':order'
+
+_PAGES_KEY_SUFFIX = ':pages'
+
+_LAZY_KEY_SUFFIX = ':lazy'
+
+_DEFAULT_ORDER_PAGE_SIZE = 1024
+
+# bytes an extraction with `streaming = true` may hold, unless configured
+_DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# instructions swept between two checkpoints of an extraction, unless configured
+_DEFAULT_CHECKPOINT_INTERVAL = 1024 * 1024
+
+# addresses covered by a compressed page of records, and decoded pages kept, unless configured
+_DEFAULT_PAGE_SPAN = 4096
+
+_DEFAULT_PAGE_CACHE = 64
+
+# instructions re-decoded from the binary kept by a lazy instruction helper
+_DEFAULT_LAZY_CACHE = 65536
@@ -1,3 +1,5 @@
+import hashlib
+
 
 def int_to_hex(int_value):
     if not isinstance(int_value, int):
@@ -11,4 +13,12 @@ def int_to_hex(int_value):
 def hex_to_int(hex_value):
     if not isinstance(hex_value, str):
         raise ValueError(hex_value)
-    return int(hex_value, 16)
\ No newline at end of file
+    return int(hex_value, 16)
+
+
+def content_hash(data, *parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+    digest.update(data)
+    return digest.hexdigest()
@@ -0,0 +1,107 @@
+from array import array
+from bisect import bisect_right
+
+from motex.common.constants import _DEFAULT_INDEX_KEY
+
+
+class MotexIntervalIndex:
+    '''
+    Sorted [start, end) address ranges of one record kind, each pointing at
+    the ordinal of its record.
+
+    Containment is answered with a bisect over the start addresses. Ranges
+    may overlap (segments do): `max_ends` holds the largest end seen up to
+    each position, so the backward scan stops as soon as no earlier range can
+    reach the address.
+    '''
+    def __init__(self, starts=None, ends=None, ordinals=None):
+        self.starts = array('Q', starts or [])
+        self.ends = array('Q', ends or [])
+        self.ordinals = None if ordinals is None else array('Q', ordinals)
+        self.max_ends = self._max_ends(self.ends)
+        self._pending = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    @staticmethod
+    def _max_ends(ends):
+        max_ends = array('Q')
+        current = 0
+        for end in ends:
+            current = max(current, end)
+            max_ends.append(current)
+        return max_ends
+
+    def add(self, start, end, ordinal):
+        if end > start:
+            self._pending.append((start, end, ordinal))
+
+    def added(self):
+        '''
+        The (start, end, ordinal) ranges added since the last `build`.
+        '''
+        return self._pending
+
+    def build(self):
+        '''
+        Sorts the ranges collected by `add`. Ordinals are only kept when they
+        differ from the sorted positions.
+        '''
+        # on equal starts the narrower range sorts last and wins the lookup
+        ranges = sorted(self._pending, key=lambda r: (r[0], -r[1], r[2]))
+        self._pending = []
+
+        self.starts = array('Q', (start for (start, end, ordinal) in ranges))
+        self.ends = array('Q', (end for (start, end, ordinal) in ranges))
+        self.max_ends = self._max_ends(self.ends)
+
+        ordinals = [ordinal for (start, end, ordinal) in ranges]
+        self.ordinals = None if ordinals == list(range(len(ordinals))) else array('Q', ordinals)
+        return self
+
+    def _ordinal(self, position):
+        return position if self.ordinals is None else self.ordinals[position]
+
+    def _find(self, address, position):
+        while position >= 0 and self.max_ends[position] > address:
+            if self.ends[position] > address:
+                return self._ordinal(position)
+            position = position - 1
+        return None
+
+    def find(self, address):
+        '''
+        Ordinal of the range holding `address` (the innermost one when several
+        do), or None.
+        '''
+        return self._find(address, bisect_right(self.starts, address) - 1)
+
+    def find_many(self, addresses):
+        '''
+        Ordinals for a whole batch of addresses, in input order. The addresses
+        are swept in sorted order so each bisect only searches past the
+        previous hit.
+        '''
+        ordinals = [None] * len(addresses)
+        position = 0
+        for n in sorted(range(len(addresses)), key=addresses.__getitem__):
+            address = addresses[n]
+            position = bisect_right(self.starts, address, position)
+            ordinals[n] = self._find(address, position - 1)
+        return ordinals
+
+    def to_dict(self):
+        return {'starts': self.starts.tolist(),
+                'ends': self.ends.tolist(),
+                'ordinals': None if self.ordinals is None else self.ordinals.tolist()}
+
+    def save(self, storage, name):
+        storage.store(_DEFAULT_INDEX_KEY, name, self.build().to_dict())
+
+    @classmethod
+    def load(cls, storage, name):
+        data = storage.load(_DEFAULT_INDEX_KEY, name)
+        if data is None:
+            return None
+        return cls(data.get('starts'), data.get('ends'), data.get('ordinals'))
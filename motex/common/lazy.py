@@ -0,0 +1,205 @@
+import mmap
+import os
+import threading
+from bisect import bisect_left, bisect_right
+
+import capstone as capstone
+
+from motex.common.constants import (
+    _DEFAULT_METADATA_KEY,
+    _DEFAULT_INSTRUCTIONS_KEY,
+    _DEFAULT_ORDER_PAGE_SIZE,
+    _DEFAULT_LAZY_CACHE,
+    _ORDER_KEY_SUFFIX,
+    _LAZY_KEY_SUFFIX,
+)
+from motex.common.hextools import content_hash
+from motex.storage.cache import MotexStorageCache
+
+# longest x86 instruction
+_MAX_INSTRUCTION_SIZE = 15
+
+# instructions wanted within this many bytes of each other are decoded by one capstone call
+_DECODE_WINDOW = 4096
+
+# order pages, with the runs of their function and basic block addresses, kept decoded
+_LAZY_PAGES_CACHED = 16
+
+
+class MotexLazyInstructions:
+    '''
+    >>> storage = MotexLazyInstructions(storage, storage.load(_DEFAULT_METADATA_KEY, 'instructions_lazy'))
+
+    Storage of an extraction made with `lazy_instructions = true`, handed to
+    the instruction helper in place of the storage it wraps. Instruction
+    records are built again when loaded: the links and ordinal of an address
+    come from the order pages, its function and basic block from the runs
+    stored along with them, its bytes and text from capstone decoding the
+    code section of a read-only mmap of the binary, which must have the hash
+    it was extracted with. The last `cache_entries` records built are kept.
+    Other keys are read from the wrapped storage.
+    '''
+    def __init__(self, storage, lazy, cache_entries=None):
+        self._storage = storage
+        self.binary_path = lazy['binary_path']
+        self._code_address = lazy['code_address']
+        self._code_size = lazy['code_size']
+
+        try:
+            fd = open(self.binary_path, 'rb')
+        except OSError:
+            raise Exception(f"{self.binary_path}, the instructions of which were extracted lazily, cannot be read")
+
+        with fd:
+            changed = os.fstat(fd.fileno()).st_size != lazy['binary_size']
+            if not changed:
+                self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+                changed = content_hash(self._map) != lazy['binary_hash']
+            if changed:
+                raise Exception(f"{self.binary_path} changed since its instructions were extracted lazily")
+
+        code_offset = lazy['code_offset']
+        self._code = memoryview(self._map)[code_offset:code_offset + self._code_size]
+        self._md = capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_64)
+
+        self.cache = MotexStorageCache(max_entries=cache_entries or _DEFAULT_LAZY_CACHE)
+        self._pages = MotexStorageCache(max_entries=_LAZY_PAGES_CACHED)
+        self._page_index = None
+        self._page_size = None
+        # helpers read ahead from a background thread
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        return getattr(self._storage, name)
+
+    def _get_page_index(self):
+        if self._page_index is None:
+            self._page_index = self._storage.load(_DEFAULT_METADATA_KEY, 'instructions_page_index') or []
+            self._page_size = self._storage.load(_DEFAULT_METADATA_KEY, 'instructions_page_size') or \
+                _DEFAULT_ORDER_PAGE_SIZE
+        return self._page_index
+
+    def _get_page(self, page):
+        '''
+        (addresses, function runs, basic block runs) of an order page, the
+        runs as (starts, values).
+        '''
+        cached = self._pages.get(_DEFAULT_INSTRUCTIONS_KEY, page)
+        if cached is not None:
+            return cached
+
+        addresses = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY + _ORDER_KEY_SUFFIX, str(page)) or []
+        runs = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY + _LAZY_KEY_SUFFIX, str(page)) or dict()
+        cached = (addresses,) + tuple(([start for (start, _value) in runs.get(name, [])],
+                                       [value for (_start, value) in runs.get(name, [])])
+                                      for name in ('functions', 'basicblocks'))
+        self._pages.put(_DEFAULT_INSTRUCTIONS_KEY, page, cached)
+        return cached
+
+    @staticmethod
+    def _run_value(runs, address):
+        (starts, values) = runs
+        position = bisect_right(starts, address) - 1
+        return values[position] if position >= 0 else None
+
+    def _locate(self, address):
+        '''
+        The record of the instruction at `address` without its content, or
+        None when no instruction starts there.
+        '''
+        page_index = self._get_page_index()
+        page = bisect_right(page_index, address) - 1
+        if page < 0:
+            return None
+
+        (addresses, functions, basicblocks) = self._get_page(page)
+        position = bisect_left(addresses, address)
+        if position >= len(addresses) or addresses[position] != address:
+            return None
+
+        if position > 0:
+            prev = addresses[position - 1]
+        else:
+            prev = self._get_page(page - 1)[0][-1] if page > 0 else None
+
+        if position + 1 < len(addresses):
+            next_ = addresses[position + 1]
+        else:
+            next_ = page_index[page + 1] if page + 1 < len(page_index) else None
+
+        return {'prev_': prev,
+                'next_': next_,
+                'index_': address,
+                'ordinal_': page * self._page_size + position,
+                'address': address,
+                'function_address': self._run_value(functions, address),
+                'basicblock_address': self._run_value(basicblocks, address)}
+
+    def _decode(self, addresses):
+        '''
+        (size, mnemonic, op_str) of the instructions at the ascending
+        `addresses`. Close addresses are decoded by one linear sweep, which
+        starts over at the next address wanted when it falls out of step
+        (gaps of a recursive extraction, bytes capstone gives up on).
+        '''
+        decoded = dict()
+        n = 0
+        while n < len(addresses):
+            start = addresses[n]
+            offset = start - self._code_address
+            if offset < 0 or offset >= self._code_size:
+                n = n + 1
+                continue
+
+            last = bisect_right(addresses, start + _DECODE_WINDOW, n) - 1
+            end = min(self._code_size, addresses[last] - self._code_address + _MAX_INSTRUCTION_SIZE)
+            for (address, size, mnemonic, op_str) in self._md.disasm_lite(bytes(self._code[offset:end]), start):
+                if address > addresses[n]:
+                    break
+                if address == addresses[n]:
+                    decoded[address] = (size, mnemonic, op_str)
+                    n = n + 1
+                    if n > last:
+                        break
+
+            if start not in decoded:
+                # nothing decodes at `start`
+                n = n + 1
+        return decoded
+
+    def _build(self, addresses):
+        records = dict()
+        for address in addresses:
+            record = self._locate(address)
+            if record is not None:
+                records[address] = record
+
+        for (address, (size, mnemonic, op_str)) in self._decode(sorted(records)).items():
+            offset = address - self._code_address
+            records[address]['content'] = self._code[offset:offset + size].hex()
+            records[address]['content_str'] = [mnemonic, op_str]
+        return {address: record for (address, record) in records.items() if 'content' in record}
+
+    def load(self, key, field):
+        if key != _DEFAULT_INSTRUCTIONS_KEY:
+            return self._storage.load(key, field)
+        return self.load_many(key, [field])[0]
+
+    def load_many(self, key, fields):
+        if key != _DEFAULT_INSTRUCTIONS_KEY:
+            return self._storage.load_many(key, fields)
+
+        with self._lock:
+            records = [self.cache.get(key, field) for field in fields]
+            missing = dict()
+            for (field, record) in zip(fields, records):
+                if record is None and field.isdigit():
+                    missing[int(field)] = field
+
+            if missing:
+                built = self._build(sorted(missing))
+                for (address, record) in built.items():
+                    self.cache.put(key, missing[address], record)
+                records = [built.get(int(field)) if record is None and field.isdigit() else record
+                           for (field, record) in zip(fields, records)]
+            return records
@@ -0,0 +1,196 @@
+import json
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class MotexProfiler:
+    '''
+    >>> profiler = MotexProfiler()
+    >>> profiler.start()
+    >>> with profiler.phase('instructions'):
+    ...     extract_instructions()
+    >>> profiler.stop()
+    >>> profiler.save('profile.json')
+
+    Wall and CPU time of the phases of an extraction, the records it saved,
+    the values serialized by the storage format, the calls made to the
+    storage backend with their latency, and the peak of the memory traced by
+    tracemalloc between `start` and `stop`. Phases can be entered many times
+    and nested, the time of a nested phase counts in the outer one as well.
+    A disabled profiler measures nothing.
+    '''
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.phases = OrderedDict()
+        self.records = OrderedDict()
+        self.serialized = {'values': 0, 'bytes': 0, 'seconds': 0.0}
+        self.backend_calls = OrderedDict()
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_memory = None
+        self._started = None
+
+    def start(self):
+        if not self.enabled:
+            return
+
+        tracemalloc.start()
+        self._started = (time.perf_counter(), time.process_time())
+
+    def stop(self):
+        if not self.enabled or self._started is None:
+            return
+
+        (wall, cpu) = self._started
+        self.wall_seconds = time.perf_counter() - wall
+        self.cpu_seconds = time.process_time() - cpu
+        self.peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self._started = None
+
+    def _phase(self, name):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0}
+        return phase
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            phase = self._phase(name)
+            phase['calls'] = phase['calls'] + 1
+            phase['wall_seconds'] = phase['wall_seconds'] + time.perf_counter() - wall
+            phase['cpu_seconds'] = phase['cpu_seconds'] + time.process_time() - cpu
+
+    def iterate(self, name, iterable):
+        '''
+        Yields from `iterable`, timing in phase `name` what it takes to
+        produce every item, for generators doing their work lazily.
+        '''
+        if not self.enabled:
+            yield from iterable
+            return
+
+        phase = self._phase(name)
+        iterator = iter(iterable)
+        while True:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                phase['wall_seconds'] = phase['wall_seconds'] + time.perf_counter() - wall
+                phase['cpu_seconds'] = phase['cpu_seconds'] + time.process_time() - cpu
+            phase['calls'] = phase['calls'] + 1
+            yield item
+
+    def count_records(self, session):
+        '''
+        Records saved through the helpers of a MotexStorageSession.
+        '''
+        for kind in ('sections', 'symbols', 'segments', 'relocations',
+                     'instructions', 'callsites', 'functions', 'basicblocks'):
+            self.records[kind] = getattr(session, kind).count
+
+    def backend_call(self, name, records, seconds):
+        call = self.backend_calls.get(name)
+        if call is None:
+            call = self.backend_calls[name] = {'calls': 0, 'records': 0, 'seconds': 0.0, 'max_seconds': 0.0}
+        call['calls'] = call['calls'] + 1
+        call['records'] = call['records'] + records
+        call['seconds'] = call['seconds'] + seconds
+        call['max_seconds'] = max(call['max_seconds'], seconds)
+
+    def report(self, **details):
+        '''
+        The measures as a dict for json, with `details` on what was profiled.
+        '''
+        report = dict(details)
+        report.update({'wall_seconds': self.wall_seconds,
+                       'cpu_seconds': self.cpu_seconds,
+                       'peak_traced_memory': self.peak_memory,
+                       'phases': self.phases,
+                       'records': self.records,
+                       'serialized': self.serialized,
+                       'backend_calls': self.backend_calls})
+        return report
+
+    def save(self, path, **details):
+        with open(path, 'w') as fd:
+            json.dump(self.report(**details), fd, indent=2)
+            fd.write('\n')
+
+
+class MotexProfiledBackend:
+    '''
+    Storage backend reporting its calls to a MotexProfiler, see
+    MotexStorage.profiled.
+    '''
+    def __init__(self, backend, profiler):
+        self._backend = backend
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+    def _call(self, name, records, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._profiler.backend_call(name, records, time.perf_counter() - start)
+
+    def store(self, key, field, value):
+        return self._call('store', 1, self._backend.store, key, field, value)
+
+    def store_many(self, key, mapping):
+        return self._call('store_many', len(mapping), self._backend.store_many, key, mapping)
+
+    def load(self, key, field):
+        return self._call('load', 1, self._backend.load, key, field)
+
+    def load_many(self, key, fields):
+        return self._call('load_many', len(fields), self._backend.load_many, key, fields)
+
+    def delete(self, key, field):
+        return self._call('delete', 1, self._backend.delete, key, field)
+
+    def cleanup(self, key):
+        return self._call('cleanup', 0, self._backend.cleanup, key)
+
+
+class MotexProfiledFormatter:
+    '''
+    Storage formatter adding what it serializes to a MotexProfiler.
+    '''
+    def __init__(self, formatter, profiler):
+        self._formatter = formatter
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._formatter, name)
+
+    def serialize(self, data, kind=None):
+        start = time.perf_counter()
+        serialized = self._formatter.serialize(data, kind)
+
+        counters = self._profiler.serialized
+        counters['values'] = counters['values'] + 1
+        counters['bytes'] = counters['bytes'] + len(serialized)
+        counters['seconds'] = counters['seconds'] + time.perf_counter() - start
+        return serialized
+
+    def deserialize(self, data, kind=None):
+        return self._formatter.deserialize(data, kind)
@@ -0,0 +1,80 @@
+from motex.common.schema import _LINK_FIELDS
+
+
+def _make_function(name, source, namespace=None):
+    namespace = dict(namespace or {})
+    exec(source, namespace)
+    return namespace[name]
+
+
+class MotexRecord:
+    '''
+    Base of the stored record classes.
+
+    Subclasses list their schema fields in `__slots__`, so instances carry no
+    per-instance `__dict__`. Every field, the linked-list ones included,
+    defaults to None. Slots starting with an underscore are left out of the
+    fields.
+
+    `__init__` (keyword only), `from_dict` and `to_dict` are generated per
+    subclass with one plain attribute access per field, the way `dataclasses`
+    builds its methods.
+    '''
+    __slots__ = tuple(field for (field, _type) in _LINK_FIELDS)
+
+    _fields = __slots__
+
+    def __init_subclass__(cls, *args, **kwargs):
+        super().__init_subclass__(*args, **kwargs)
+        # underscored slots hold runtime state, not stored fields
+        cls._fields = tuple(field for klass in reversed(cls.__mro__)
+                            for field in klass.__dict__.get('__slots__', ()) if not field.startswith('_'))
+
+        params = ', '.join(f'{field}=None' for field in cls._fields)
+        inits = ''.join(f'    self.{field} = {field}\n' for field in cls._fields)
+        cls.__init__ = _make_function('__init__',
+                                      f'def __init__(self, *, {params}):\n'
+                                      f'{inits}')
+
+        assigns = ''.join(f"    record.{field} = data.get('{field}')\n" for field in cls._fields)
+        cls.from_dict = classmethod(_make_function('from_dict',
+                                                   'def from_dict(cls, data):\n'
+                                                   '    record = __new__(cls)\n'
+                                                   f'{assigns}'
+                                                   '    return record\n',
+                                                   {'__new__': object.__new__}))
+
+        items = ', '.join(f"'{field}': self.{field}" for field in cls._fields)
+        cls.to_dict = _make_function('to_dict',
+                                     'def to_dict(self):\n'
+                                     f'    return {{{items}}}\n')
+
+    def __init__(self, **kwargs):
+        for field in self._fields:
+            setattr(self, field, kwargs.get(field))
+
+    @classmethod
+    def from_dict(cls, data):
+        '''
+        Builds a record from its stored form. Fields the schema does not know
+        are ignored.
+        '''
+        record = cls.__new__(cls)
+        for field in cls._fields:
+            setattr(record, field, data.get(field))
+        return record
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self._fields}
+
+    def get_id(self):
+        return self.index_
+
+    def get_next_id(self):
+        return self.next_
+
+    def get_prev_id(self):
+        return self.prev_
+
+    def get_ordinal(self):
+        return self.ordinal_
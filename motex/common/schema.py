@@ -0,0 +1,170 @@
+'''
+Fixed field layout of every stored record kind.
+
+Each kind maps to its ordered (field, type) pairs, `type` being one of
+`id`, `address`, `address_list`, `int`, `float`, `bool`, `str`, `hex` (bytes
+held as a lowercase hex string) or `list`. The linked-list fields (`prev_`,
+`next_`, `index_`) and the dense position `ordinal_` are common to every kind
+and listed apart.
+
+Schema version 2 keeps addresses and ids as integers. Version 1 datasets held
+them as zero-padded hex strings and are upgraded record by record on read.
+
+Schema version 3 stores the instructions of a function as [start, end) address
+ranges and a count instead of one address per instruction. Fields dropped from
+a schema stay listed in `_RETIRED_FIELDS` so older records still carry them.
+'''
+import motex.common.hextools as hextools
+
+_SCHEMA_VERSION = 3
+
+# kinds whose records are keyed by their address rather than their position
+_ADDRESS_KEYED_KINDS = ('instructions', 'functions', 'callsites', 'basicblocks')
+
+_LINK_FIELDS = (('prev_', 'id'),
+                ('next_', 'id'),
+                ('index_', 'id'),
+                ('ordinal_', 'int'))
+
+_RECORD_SCHEMAS = {
+    'instructions': (('address', 'address'),
+                     ('function_address', 'address'),
+                     ('basicblock_address', 'address'),
+                     ('content', 'hex'),
+                     ('content_str', 'list')),
+
+    'functions': (('address', 'address'),
+                  ('name', 'str'),
+                  ('basicblock_leaders', 'address_list'),
+                  ('function_edges', 'address_list'),
+                  ('callsites_list', 'address_list'),
+                  ('basicblock_edges', 'list'),
+                  ('instructions_ranges', 'list'),
+                  ('instructions_count', 'int')),
+
+    'callsites': (('address', 'address'),
+                  ('return_address', 'address'),
+                  ('target_resolved', 'bool'),
+                  ('target_address', 'address'),
+                  ('target_type', 'str'),
+                  ('target_name', 'str'),
+                  ('function_address', 'address'),
+                  ('basicblock_leader', 'address')),
+
+    'basicblocks': (('address', 'address'),
+                    ('end_address', 'address'),
+                    ('function_address', 'address'),
+                    ('instructions_count', 'int'),
+                    ('successors', 'address_list'),
+                    ('predecessors', 'address_list')),
+
+    'symbols': (('symbol_num', 'int'),
+                ('symbol_index', 'str'),
+                ('symbol_value', 'address'),
+                ('symbol_size', 'int'),
+                ('symbol_type', 'str'),
+                ('symbol_bind', 'str'),
+                ('symbol_visibility', 'str'),
+                ('symbol_name', 'str'),
+                ('symbol_import_export', 'str'),
+                ('symbol_version', 'str')),
+
+    'sections': (('section_name', 'str'),
+                 ('section_type', 'str'),
+                 ('section_offset', 'address'),
+                 ('section_virtual_address', 'address'),
+                 ('section_size', 'int'),
+                 ('section_entry_size', 'int'),
+                 ('section_entropy', 'float'),
+                 ('section_segments', 'str')),
+
+    'segments': (('segment_type', 'str'),
+                 ('segment_offset', 'address'),
+                 ('segment_virtual_address', 'address'),
+                 ('segment_virtual_size', 'int'),
+                 ('segment_physical_address', 'address'),
+                 ('segment_physical_size', 'int'),
+                 ('segment_flags', 'str'),
+                 ('segment_sections', 'list'),
+                 ('segment_section_addrs', 'address_list')),
+
+    'relocations': (('relocation_address', 'address'),
+                    ('relocation_type', 'str'),
+                    ('relocation_symbol_value', 'address'),
+                    ('relocation_symbol_name', 'str'),
+                    ('relocation_computed_plt_address', 'address')),
+}
+
+
+_RETIRED_FIELDS = {
+    'functions': (('instructions_list', 'address_list'),),
+}
+
+
+def record_kind(key):
+    '''
+    >>> record_kind('motex:default:instructions')
+    'instructions'
+    '''
+    kind = key.rsplit(':', 1)[-1]
+    return kind if kind in _RECORD_SCHEMAS else None
+
+
+def record_fields(kind):
+    return _LINK_FIELDS + _RECORD_SCHEMAS[kind]
+
+
+def stored_fields(kind):
+    '''
+    `record_fields` followed by the fields older schema versions stored.
+    '''
+    return record_fields(kind) + _RETIRED_FIELDS.get(kind, ())
+
+
+def _to_int(value):
+    return value if isinstance(value, int) else hextools.hex_to_int(value)
+
+
+def upgrade_id(kind, value):
+    if value is None or isinstance(value, int):
+        return value
+    return hextools.hex_to_int(value) if kind in _ADDRESS_KEYED_KINDS else int(value)
+
+
+def upgrade_record(kind, record, version=1):
+    '''
+    Record of schema `version` to the current one. Version 1 hex string
+    addresses and ids become ints; before version 3 the instructions of a
+    function are only known by their addresses, which are kept under the
+    retired `instructions_list` with the count alongside.
+    '''
+    upgraded = dict(record)
+    if version < 2:
+        for field, _type in stored_fields(kind):
+            value = record.get(field)
+            if value is None:
+                continue
+
+            if _type == 'id':
+                upgraded[field] = upgrade_id(kind, value)
+            elif _type == 'address':
+                upgraded[field] = _to_int(value)
+            elif _type == 'address_list':
+                upgraded[field] = [_to_int(item) for item in value]
+
+    if version < 3 and kind == 'functions':
+        upgraded['instructions_count'] = len(upgraded.get('instructions_list') or [])
+    return upgraded
+
+
+def record_field(kind, index, version=_SCHEMA_VERSION):
+    '''
+    Storage field of the record with id `index`. Strings are taken as
+    already formatted fields.
+    '''
+    if isinstance(index, str):
+        return index
+
+    if version < 2 and kind in _ADDRESS_KEYED_KINDS:
+        return hextools.int_to_hex(index)
+    return str(index)
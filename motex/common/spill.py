@@ -0,0 +1,54 @@
+import tempfile
+from array import array
+
+
+class MotexSpillList:
+    '''
+    Append-only list of unsigned integers (addresses) that keeps at most
+    `max_bytes` of them in memory. Past that the buffered items are appended
+    to an anonymous temporary file, in `directory` when given; iteration reads
+    them back in order before the buffered ones.
+    '''
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max(max_bytes, array('Q').itemsize)
+        self.directory = directory
+        self.spilled = 0
+        self._items = array('Q')
+        self._file = None
+
+    def __len__(self):
+        return self.spilled + len(self._items)
+
+    def append(self, value):
+        self._items.append(value)
+        if len(self._items) * self._items.itemsize >= self.max_bytes:
+            self._spill()
+
+    def _spill(self):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self.directory)
+
+        self._file.seek(0, 2)
+        self._items.tofile(self._file)
+        self.spilled = self.spilled + len(self._items)
+        self._items = array('Q')
+
+    def __iter__(self):
+        if self._file is not None:
+            self._file.seek(0)
+            while True:
+                block = self._file.read(self.max_bytes - self.max_bytes % self._items.itemsize)
+                if not block:
+                    break
+                yield from array('Q', block)
+        yield from self._items
+
+    def tolist(self):
+        return list(self)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._items = array('Q')
+        self.spilled = 0
@@ -6,13 +6,14 @@ import toml
 from logzero import logger
 
 from motex.storage import MotexStorage
-from motex.core.instruction import MotexInstruction, MotexInstructionHelper
-from motex.core.callsite import MotexCallsite, MotexCallsiteHelper
-from motex.core.function import MotexFunction, MotexFunctionHelper
-from motex.core.relocation import MotexRelocation, MotexRelocationHelper
-from motex.core.segment import MotexSegment, MotexSegmentHelper
-from motex.core.section import MotexSection, MotexSectionHelper
-from motex.core.symbol import MotexSymbol, MotexSymbolHelper
+from motex.core.instruction import MotexInstruction, MotexInstructionHelper, MotexInstructionStorageHelper
+from motex.core.callsite import MotexCallsite, MotexCallsiteHelper, MotexCallsiteStorageHelper
+from motex.core.basicblock import MotexBasicblock, MotexBasicblockHelper, MotexBasicblockStorageHelper
+from motex.core.function import MotexFunction, MotexFunctionHelper, MotexFunctionStorageHelper
+from motex.core.relocation import MotexRelocation, MotexRelocationHelper, MotexRelocationStorageHelper
+from motex.core.segment import MotexSegment, MotexSegmentHelper, MotexSegmentStorageHelper
+from motex.core.section import MotexSection, MotexSectionHelper, MotexSectionStorageHelper
+from motex.core.symbol import MotexSymbol, MotexSymbolHelper, MotexSymbolStorageHelper
 
 
 class MotexConfig:
@@ -52,19 +53,55 @@ class MotexConfig:
 
 
 class Motex(MotexConfig):
-    def __init__(self, config_path, **kwargs):
+    def __init__(self, config_path, namespace=None, **kwargs):
         super().__init__(config_path)
         self._storage = MotexStorage(self.storage_config['backend'],
-                                     self.storage_config['format'], **self.storage_config['args'])
+                                     self.storage_config['format'],
+                                     batch_size=self.storage_config.get('batch_size'),
+                                     cache_entries=self.storage_config.get('cache_entries'),
+                                     cache_bytes=self.storage_config.get('cache_bytes'),
+                                     namespace=namespace or self.storage_config.get('namespace'),
+                                     pages=self.storage_config.get('pages'),
+                                     page_span=self.storage_config.get('page_span'),
+                                     page_cache=self.storage_config.get('page_cache'),
+                                     **self.storage_config['args'])
 
     @property
     def storage(self):
         return self._storage
 
 
+class MotexStorageSession:
+    '''
+    >>> session = MotexStorageSession()
+    >>> session.instructions.prepare(storage)
+
+    The storage helpers of one extraction. They hold the linked list state
+    of the records being saved, so extractions with sessions of their own
+    can run side by side in one process.
+    '''
+    def __init__(self):
+        self.sections = MotexSectionStorageHelper()
+        self.symbols = MotexSymbolStorageHelper()
+        self.segments = MotexSegmentStorageHelper()
+        self.relocations = MotexRelocationStorageHelper()
+        self.instructions = MotexInstructionStorageHelper()
+        self.callsites = MotexCallsiteStorageHelper()
+        self.functions = MotexFunctionStorageHelper()
+        self.basicblocks = MotexBasicblockStorageHelper()
+
+
 class MotexHelpers:
+    '''
+    >>> this = MotexHelpers(storage, namespace='libc.so.6')
 
-    def __init__(self, storage):
+    Helpers over the records of the storage namespace, or of `namespace`.
+    '''
+    def __init__(self, storage, namespace=None):
+        if namespace is not None:
+            storage = storage.in_namespace(namespace)
+
+        self._storage = storage
         self._functions = MotexFunctionHelper(storage)
         self._callsites = MotexCallsiteHelper(storage)
         self._instructions = MotexInstructionHelper(storage)
@@ -72,7 +109,7 @@ class MotexHelpers:
         self._segments = MotexSegmentHelper(storage)
         self._symbols = MotexSymbolHelper(storage)
         self._sections = MotexSectionHelper(storage)
-        self._basicblocks = None
+        self._basicblocks = MotexBasicblockHelper(storage)
 
     @property
     def instructions(self):
@@ -110,6 +147,45 @@ class MotexHelpers:
     def callsites(self):
         return self._callsites
 
+    @property
+    def namespace(self):
+        return self._storage.namespace
+
+    def namespaces(self):
+        return self._storage.namespaces()
+
+    def open(self, namespace):
+        '''
+        >>> for name in this.namespaces():
+        ...     print(name, len(this.open(name).functions))
+
+        Helpers over another namespace of the same storage.
+        '''
+        return MotexHelpers(self._storage, namespace)
+
+    def _containers(self):
+        helpers = {'instructions': self._instructions,
+                   'basicblocks': self._basicblocks,
+                   'functions': self._functions,
+                   'sections': self._sections,
+                   'segments': self._segments}
+        return {name: helper for name, helper in helpers.items()
+                if helper is not None and helper.has_address_lookup()}
+
+    def resolve(self, address):
+        '''
+        >>> this.resolve(0x401234)
+        {'instructions': <MotexInstruction>, 'functions': <MotexFunction>, ...}
+        '''
+        return {name: helper.containing(address) for name, helper in self._containers().items()}
+
+    def resolve_many(self, addresses):
+        '''
+        >>> this.resolve_many(trace_addresses)['functions']
+        [<MotexFunction>, None, <MotexFunction>, ...]
+        '''
+        return {name: helper.containing_many(addresses) for name, helper in self._containers().items()}
+
 
 __all__ = ['MotexSection',
            'MotexSymbol',
@@ -120,4 +196,5 @@ __all__ = ['MotexSection',
            'MotexBasicblock',
            'MotexCallsite',
            'Motex',
-           'MotexHelpers']
+           'MotexHelpers',
+           'MotexStorageSession']
@@ -1,4 +1,195 @@
+import motex.common.hextools as hextools
+from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_BASICBLOCKS_KEY
+from motex.storage import MotexStorageTracker
+from motex.common.base import HelperBase
+from motex.common.record import MotexRecord
 
-class MotexBasicblock:
-    pass
-    
\ No newline at end of file
+
+class MotexBasicblock(MotexRecord):
+    __slots__ = ('address',
+                 'end_address',
+                 'function_address',
+                 'instructions_count',
+                 'successors',
+                 'predecessors')
+
+    def __lt__(self, other):
+        return self.address < other.address
+
+    def __le__(self, other):
+        return self.address <= other.address
+
+    def __gt__(self, other):
+        return self.address > other.address
+
+    def __ge__(self, other):
+        return self.address >= other.address
+
+    def __eq__(self, other):
+        return self.address == other.address
+
+    def __str__(self):
+        return "%s: <MotexBasicblock> (%s instructions)" % (hextools.int_to_hex(self.address), self.instructions_count)
+
+
+class MotexBasicblockStorageHelper(MotexStorageTracker):
+    _records_key = _DEFAULT_BASICBLOCKS_KEY
+    _records_name = 'basicblocks'
+
+    def prepare(self, storage):
+        storage.cleanup(_DEFAULT_BASICBLOCKS_KEY)
+        self._track_prepare(storage)
+
+    def save(self, index=None, current=None, prev=None, storage=None):
+        field = index
+        current.index_ = field
+        current.ordinal_ = self.count
+
+        if self.first is None:
+            self.first = field
+
+        if storage is not None:
+            self._track(storage, field)
+
+        if self.prev_ is not None:
+            self.prev_.next_ = field
+            current.prev_ = self.prev_.index_
+
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_BASICBLOCKS_KEY, str(self.prev_.index_), self.prev_.to_dict())
+
+        self.prev_ = current
+        self.count = self.count + 1
+
+    def complete(self, storage=None):
+        if self.prev_ is None:
+            return
+
+        self.prev_.next_ = None
+        field = str(self.prev_.index_)
+
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_BASICBLOCKS_KEY, field, self.prev_.to_dict())
+
+            field = 'basicblocks_first'
+            storage.store(_DEFAULT_METADATA_KEY, field, self.first)
+
+            field = 'basicblocks_last'
+            storage.store(_DEFAULT_METADATA_KEY, field, self.prev_.get_id())
+
+            field = 'basicblocks_count'
+            storage.store(_DEFAULT_METADATA_KEY, field, self.count)
+
+            self._track_complete(storage)
+
+
+class MotexBasicblockHelper(HelperBase):
+    _records_key = _DEFAULT_BASICBLOCKS_KEY
+    _records_name = 'basicblocks'
+    _record_class = MotexBasicblock
+    _address_ordered = True
+
+    @staticmethod
+    def _record_end(record):
+        return record.end_address
+
+    def __init__(self, storage):
+        self._storage = storage
+        self._first = self._get_first()
+        self._last = self._get_last()
+        self._count = self._get_count()
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def first(self):
+        return self._first
+
+    def _get_first(self):
+        field = 'basicblocks_first'
+        first = self._storage.load(_DEFAULT_METADATA_KEY, field)
+        if first is None:
+            return None
+
+        data = self._storage.load(_DEFAULT_BASICBLOCKS_KEY, self._field(first))
+        if data is not None:
+            return self._make(data)
+        return None
+
+    def _get_last(self):
+        field = 'basicblocks_last'
+        first = self._storage.load(_DEFAULT_METADATA_KEY, field)
+        if first is None:
+            return None
+
+        data = self._storage.load(_DEFAULT_BASICBLOCKS_KEY, self._field(first))
+        if data is not None:
+            return self._make(data)
+        return None
+
+    def _get_count(self):
+        field = 'basicblocks_count'
+        return self._storage.load(_DEFAULT_METADATA_KEY, field)
+
+    def _iter_linked(self):
+        '''
+        >>> for ins in MotexBasicblockHelper(storage).all():
+        ...  print str(ins)
+        ...
+        0x01
+        0x02
+        0x03
+        0x04
+        '''
+        curr = self._first
+        while curr is not None and curr.get_id() is not None:
+            data = self._storage.load(_DEFAULT_BASICBLOCKS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
+
+            yield curr
+
+            data = dict()
+            if curr.get_next_id() is not None:
+                data = self._storage.load(_DEFAULT_BASICBLOCKS_KEY, self._field(curr.get_next_id()))
+
+            next_curr = self._make(data)
+            curr = next_curr
+
+    def _reverse_linked(self):
+        '''
+        >>> for ins in MotexBasicblockHelper(storage).reverse():
+        ...  print str(ins)
+        ...
+        0x04 <MotexBasicblock> (3 instructions)
+        0x03 <MotexBasicblock> (3 instructions)
+        0x02 <MotexBasicblock> (1 instructions)
+        0x01 <MotexBasicblock> (2 instructions)
+        '''
+        curr = self._last
+        while curr is not None and curr.get_id() is not None:
+            data = self._storage.load(_DEFAULT_BASICBLOCKS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
+
+            yield curr
+
+            data = dict()
+            if curr.get_prev_id() is not None:
+                data = self._storage.load(_DEFAULT_BASICBLOCKS_KEY, self._field(curr.get_prev_id()))
+
+            next_curr = self._make(data)
+            curr = next_curr
+
+    def get(self, index):
+        '''
+        >>> ins = MotexBasicblockHelper(storage).get(addr):
+        ... print str(ins)
+        ...
+        0x04 <MotexBasicblock> (3 instructions)
+        '''
+        if not isinstance(index, (int, str)):
+            raise Exception("index must be int or string")
+
+        data = self._storage.load(_DEFAULT_BASICBLOCKS_KEY, self._field(self._parse_id(index))) or dict()
+        return self._make(data)
@@ -2,107 +2,95 @@ import motex.common.hextools as hextools
 from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_CALLSITES_KEY
 from motex.storage import MotexStorageTracker
 from motex.common.base import HelperBase
+from motex.common.record import MotexRecord
 
 
-class MotexCallsite:
-    next_ = None
-    prev_ = None
-    index_ = None
-
-    def __init__(self, **kwargs):
-        for key, val in kwargs.items():
-            setattr(self, key, val)
+class MotexCallsite(MotexRecord):
+    __slots__ = ('address',
+                 'return_address',
+                 'target_resolved',
+                 'target_address',
+                 'target_type',
+                 'target_name',
+                 'function_address',
+                 'basicblock_leader')
 
     def __lt__(self, other):
-        return hextools.hex_to_int(self.address) < hextools.hex_to_int(other.address)
+        return self.address < other.address
 
     def __le__(self, other):
-        return hextools.hex_to_int(self.address) <= hextools.hex_to_int(other.address)
+        return self.address <= other.address
 
     def __gt__(self, other):
-        return hextools.hex_to_int(self.address) > hextools.hex_to_int(other.address)
+        return self.address > other.address
 
     def __ge__(self, other):
-        return hextools.hex_to_int(self.address) >= hextools.hex_to_int(other.address)
+        return self.address >= other.address
 
     def __eq__(self, other):
-        return hextools.hex_to_int(self.address) == hextools.hex_to_int(other.address)
+        return self.address == other.address
 
     def __str__(self):
-        return "%s: <MotexCallsite> (%s)" % (self.address, self.target_name)
-
-    def get_id(self):
-        return self.index_
-
-    def get_next_id(self):
-        return self.next_
-
-    def get_prev_id(self):
-        return self.prev_
-
-    def to_dict(self):
-        return {'prev_': self.prev_,
-                'next_': self.next_,
-                'index_': self.index_,
-                'address': self.address,
-                'return_address': self.return_address,
-                'target_resolved': self.target_resolved,
-                'target_address': self.target_address,
-                'target_type': self.target_type,
-                'target_name': self.target_name,
-                'function_address': self.function_address,
-                'basicblock_leader': self.basicblock_leader,}
+        return "%s: <MotexCallsite> (%s)" % (hextools.int_to_hex(self.address), self.target_name)
 
 
 class MotexCallsiteStorageHelper(MotexStorageTracker):
-    first = None
-    count = 0
-    prev_ = None
+    _records_key = _DEFAULT_CALLSITES_KEY
+    _records_name = 'callsites'
 
-    @classmethod
-    def prepare(cls, storage):
+    def prepare(self, storage):
         storage.cleanup(_DEFAULT_CALLSITES_KEY)
+        self._track_prepare(storage)
 
-    @classmethod
-    def save(cls, index=None, current=None, prev=None, storage=None):
+    def save(self, index=None, current=None, prev=None, storage=None):
         field = index
         current.index_ = field
+        current.ordinal_ = self.count
 
-        if cls.first is None:
-            cls.first = field
+        if self.first is None:
+            self.first = field
 
-        if cls.prev_ is not None:
-            cls.prev_.next_ = field
-            current.prev_ = cls.prev_.index_
+        if storage is not None:
+            self._track(storage, field)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_CALLSITES_KEY, cls.prev_.index_, cls.prev_.to_dict())
+        if self.prev_ is not None:
+            self.prev_.next_ = field
+            current.prev_ = self.prev_.index_
 
-        cls.prev_ = current
-        cls.count = cls.count + 1
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_CALLSITES_KEY, str(self.prev_.index_), self.prev_.to_dict())
 
-    @classmethod
-    def complete(cls, storage=None):
-        if cls.prev_ is None:
+        self.prev_ = current
+        self.count = self.count + 1
+
+    def complete(self, storage=None):
+        if self.prev_ is None:
             return
 
-        cls.prev_.next_ = None
-        field = cls.prev_.index_
+        self.prev_.next_ = None
+        field = str(self.prev_.index_)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_CALLSITES_KEY, field, cls.prev_.to_dict())
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_CALLSITES_KEY, field, self.prev_.to_dict())
 
             field = 'callsites_first'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.first)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.first)
 
             field = 'callsites_last'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.prev_.get_id())
+            storage.store(_DEFAULT_METADATA_KEY, field, self.prev_.get_id())
 
             field = 'callsites_count'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.count)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.count)
+
+            self._track_complete(storage)
     
 
 class MotexCallsiteHelper(HelperBase):
+    _records_key = _DEFAULT_CALLSITES_KEY
+    _records_name = 'callsites'
+    _record_class = MotexCallsite
+    _address_ordered = True
+
     def __init__(self, storage):
         self._storage = storage
         self._first = self._get_first()
@@ -123,9 +111,9 @@ class MotexCallsiteHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_CALLSITES_KEY, first)
+        data = self._storage.load(_DEFAULT_CALLSITES_KEY, self._field(first))
         if data != None:
-            return MotexCallsite(**data)
+            return self._make(data)
         return None
 
     def _get_last(self):
@@ -134,19 +122,16 @@ class MotexCallsiteHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_CALLSITES_KEY, first)
+        data = self._storage.load(_DEFAULT_CALLSITES_KEY, self._field(first))
         if data != None:
-            return MotexCallsite(**data)
+            return self._make(data)
         return None
 
     def _get_count(self):
         field = 'callsites_count'
         return self._storage.load(_DEFAULT_METADATA_KEY, field)
 
-    def all(self):
-        return self.__iter__()
-
-    def __iter__(self):
+    def _iter_linked(self):
         '''
         >>> for ins in MotexCallsiteHelper(storage).all():
         ...  print str(ins)
@@ -158,19 +143,19 @@ class MotexCallsiteHelper(HelperBase):
         '''
         curr = self._first
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_CALLSITES_KEY, curr.get_id()) or dict()
-            curr = MotexCallsite(**data)
+            data = self._storage.load(_DEFAULT_CALLSITES_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_next_id() is not None:
-                data = self._storage.load(_DEFAULT_CALLSITES_KEY, curr.get_next_id())
+                data = self._storage.load(_DEFAULT_CALLSITES_KEY, self._field(curr.get_next_id()))
 
-            next_curr = MotexCallsite(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
-    def reverse(self):
+    def _reverse_linked(self):
         '''
         >>> for ins in MotexCallsiteHelper(storage).reverse():
         ...  print str(ins)
@@ -182,16 +167,16 @@ class MotexCallsiteHelper(HelperBase):
         '''
         curr = self._last
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_CALLSITES_KEY, curr.get_id()) or dict()
-            curr = MotexCallsite(**data)
+            data = self._storage.load(_DEFAULT_CALLSITES_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_prev_id() is not None:
-                data = self._storage.load(_DEFAULT_CALLSITES_KEY, curr.get_prev_id())
+                data = self._storage.load(_DEFAULT_CALLSITES_KEY, self._field(curr.get_prev_id()))
 
-            next_curr = MotexCallsite(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
     def get(self, index):
@@ -201,8 +186,8 @@ class MotexCallsiteHelper(HelperBase):
         ...
         0x04 <MotexCallsite> function_name
         '''
-        if not isinstance(index, str):
-            raise Exception("index must be string")
+        if not isinstance(index, (int, str)):
+            raise Exception("index must be int or string")
 
-        data = self._storage.load(_DEFAULT_CALLSITES_KEY, index) or dict()
-        return MotexCallsite(**data)
+        data = self._storage.load(_DEFAULT_CALLSITES_KEY, self._field(self._parse_id(index))) or dict()
+        return self._make(data)
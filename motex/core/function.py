@@ -1,108 +1,177 @@
+from collections.abc import Sequence
+
 import motex.common.hextools as hextools
 from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_FUNCTIONS_KEY
 from motex.storage import MotexStorageTracker
 from motex.common.base import HelperBase
+from motex.common.record import MotexRecord
+from motex.core.instruction import MotexInstructionHelper
+
+
+class MotexFunctionInstructions(Sequence):
+    '''
+    >>> function = MotexFunctionHelper(storage).get(0x401136)
+    >>> len(function.instructions_list), function.instructions_list[0]
+    (12, 4198710)
+
+    Addresses of the instructions of a function. Functions only store the
+    [start, end) ranges their instructions cover; the addresses are read from
+    the order pages of the instruction store on access, without loading the
+    instruction records. Functions stored before schema version 3 carry their
+    address list, which is served as is.
+    '''
+    def __init__(self, ranges, count, helper=None, addresses=None):
+        self.ranges = ranges or []
+        self.count = count or 0
+        self._helper = helper
+        self._addresses = addresses
+        self._ordinal_ranges = None
+
+    def _get_ordinal_ranges(self):
+        if self._ordinal_ranges is None:
+            if self._helper is None:
+                raise Exception("function is not bound to an instruction store")
+
+            instructions = self._helper.instructions
+            self._ordinal_ranges = [range(instructions._bisect(start), instructions._bisect(end))
+                                    for (start, end) in self.ranges]
+        return self._ordinal_ranges
+
+    def _ordinals(self):
+        for ordinals in self._get_ordinal_ranges():
+            yield from ordinals
+
+    def __len__(self):
+        return self.count if self._addresses is None else len(self._addresses)
+
+    def __iter__(self):
+        if self._addresses is not None:
+            return iter(self._addresses)
+        return self._helper.instructions._ordinal_ids(self._ordinals())
 
+    def __getitem__(self, item):
+        if self._addresses is not None:
+            return self._addresses[item]
 
-class MotexFunction:
-    next_ = None
-    prev_ = None
-    index_ = None
-    address = '0x0'
+        if isinstance(item, slice):
+            return [self[position] for position in range(len(self))[item]]
 
-    def __init__(self, **kwargs):
-        for key, val in kwargs.items():
-            setattr(self, key, val)
+        position = range(len(self))[item]
+        for ordinals in self._get_ordinal_ranges():
+            if position < len(ordinals):
+                return next(self._helper.instructions._ordinal_ids([ordinals[position]]))
+            position = position - len(ordinals)
+        raise IndexError("function instruction index out of range")
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def instructions(self):
+        '''
+        The MotexInstruction records of the function, read with bulk loads.
+        '''
+        if self._addresses is not None:
+            return [self._helper.instructions.get(address) for address in self._addresses]
+        return self._helper.instructions._load_ordinals(list(self._ordinals()))
+
+
+class MotexFunction(MotexRecord):
+    __slots__ = ('address',
+                 'name',
+                 'basicblock_leaders',
+                 'function_edges',
+                 'callsites_list',
+                 'basicblock_edges',
+                 'instructions_ranges',
+                 'instructions_count',
+                 '_instructions')
 
     def __lt__(self, other):
-        return hextools.hex_to_int(self.address) < hextools.hex_to_int(other.address)
+        return self.address < other.address
 
     def __le__(self, other):
-        return hextools.hex_to_int(self.address) <= hextools.hex_to_int(other.address)
+        return self.address <= other.address
 
     def __gt__(self, other):
-        return hextools.hex_to_int(self.address) > hextools.hex_to_int(other.address)
+        return self.address > other.address
 
     def __ge__(self, other):
-        return hextools.hex_to_int(self.address) >= hextools.hex_to_int(other.address)
+        return self.address >= other.address
 
     def __eq__(self, other):
-        return hextools.hex_to_int(self.address) == hextools.hex_to_int(other.address)
+        return self.address == other.address
 
     def __str__(self):
-        return "%s: <MotexFunction> (%s)" % (self.address, self.name)
-
-    def get_id(self):
-        return self.index_
+        return "%s: <MotexFunction> (%s)" % (hextools.int_to_hex(self.address), self.name)
 
-    def get_next_id(self):
-        return self.next_
-
-    def get_prev_id(self):
-        return self.prev_
-
-    def to_dict(self):
-        return {'prev_': self.prev_,
-                'next_': self.next_,
-                'index_': self.index_,
-                'address': self.address,
-                'name': self.name,
-                'basicblock_leaders': self.basicblock_leaders,
-                'function_edges': self.function_edges,
-                'callsites_list': self.callsites_list,
-                'basicblock_edges': self.basicblock_edges,
-                'instructions_list': self.instructions_list}
+    @property
+    def instructions_list(self):
+        try:
+            return self._instructions
+        except AttributeError:
+            return MotexFunctionInstructions(self.instructions_ranges, self.instructions_count)
 
 
 class MotexFunctionStorageHelper(MotexStorageTracker):
-    first = None
-    count = 0
-    prev_ = None
+    _records_key = _DEFAULT_FUNCTIONS_KEY
+    _records_name = 'functions'
 
-    @classmethod
-    def prepare(cls, storage):
+    def prepare(self, storage):
         storage.cleanup(_DEFAULT_FUNCTIONS_KEY)
+        self._track_prepare(storage)
 
-    @classmethod
-    def save(cls, index=None, current=None, prev=None, storage=None):
+    def save(self, index=None, current=None, prev=None, storage=None):
         field = index
         current.index_ = field
+        current.ordinal_ = self.count
 
-        if cls.first is None:
-            cls.first = field
+        if self.first is None:
+            self.first = field
 
-        if cls.prev_ is not None:
-            cls.prev_.next_ = field
-            current.prev_ = cls.prev_.index_
+        if storage is not None:
+            self._track(storage, field)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_FUNCTIONS_KEY, cls.prev_.index_, cls.prev_.to_dict())
+        if self.prev_ is not None:
+            self.prev_.next_ = field
+            current.prev_ = self.prev_.index_
 
-        cls.prev_ = current
-        cls.count = cls.count + 1
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_FUNCTIONS_KEY, str(self.prev_.index_), self.prev_.to_dict())
 
-    @classmethod
-    def complete(cls, storage=None):
-        if cls.prev_ is None:
+        self.prev_ = current
+        self.count = self.count + 1
+
+    def complete(self, storage=None):
+        if self.prev_ is None:
             return
 
-        cls.prev_.next_ = None
-        field = cls.prev_.index_
+        self.prev_.next_ = None
+        field = str(self.prev_.index_)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_FUNCTIONS_KEY, field, cls.prev_.to_dict())
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_FUNCTIONS_KEY, field, self.prev_.to_dict())
 
             field = 'functions_first'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.first)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.first)
 
             field = 'functions_last'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.prev_.get_id())
+            storage.store(_DEFAULT_METADATA_KEY, field, self.prev_.get_id())
 
             field = 'functions_count'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.count)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.count)
+
+            self._track_complete(storage)
 
 
 class MotexFunctionHelper(HelperBase):
+    _records_key = _DEFAULT_FUNCTIONS_KEY
+    _records_name = 'functions'
+    _record_class = MotexFunction
+    _address_ordered = True
+    _instructions = None
+
     def __init__(self, storage):
         self._storage = storage
         self._first = self._get_first()
@@ -123,9 +192,9 @@ class MotexFunctionHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, first)
+        data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, self._field(first))
         if data != None:
-            return MotexFunction(**data)
+            return self._make(data)
         return None
 
     def _get_last(self):
@@ -134,19 +203,28 @@ class MotexFunctionHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, first)
+        data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, self._field(first))
         if data != None:
-            return MotexFunction(**data)
+            return self._make(data)
         return None
 
     def _get_count(self):
         field = 'functions_count'
         return self._storage.load(_DEFAULT_METADATA_KEY, field)
 
-    def all(self):
-        return self.__iter__()
-
-    def __iter__(self):
+    @property
+    def instructions(self):
+        if self._instructions is None:
+            self._instructions = MotexInstructionHelper(self._storage)
+        return self._instructions
+
+    def _make(self, data):
+        function = super()._make(data)
+        function._instructions = MotexFunctionInstructions(function.instructions_ranges, function.instructions_count,
+                                                           self, data.get('instructions_list'))
+        return function
+
+    def _iter_linked(self):
         '''
         >>> for ins in MotexFunctionHelper(storage).all():
         ...  print str(ins)
@@ -158,19 +236,19 @@ class MotexFunctionHelper(HelperBase):
         '''
         curr = self._first
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, curr.get_id()) or dict()
-            curr = MotexFunction(**data)
+            data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_next_id() is not None:
-                data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, curr.get_next_id())
+                data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, self._field(curr.get_next_id()))
 
-            next_curr = MotexFunction(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
-    def reverse(self):
+    def _reverse_linked(self):
         '''
         >>> for ins in MotexFunctionHelper(storage).reverse():
         ...  print str(ins)
@@ -182,16 +260,16 @@ class MotexFunctionHelper(HelperBase):
         '''
         curr = self._last
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, curr.get_id()) or dict()
-            curr = MotexFunction(**data)
+            data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_prev_id() is not None:
-                data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, curr.get_prev_id())
+                data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, self._field(curr.get_prev_id()))
 
-            next_curr = MotexFunction(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
     def get(self, index):
@@ -201,8 +279,8 @@ class MotexFunctionHelper(HelperBase):
         ...
         0x04 <MotexFunction> function_name
         '''
-        if not isinstance(index, str):
-            raise Exception("index must be string")
+        if not isinstance(index, (int, str)):
+            raise Exception("index must be int or string")
 
-        data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, index) or dict()
-        return MotexFunction(**data)
+        data = self._storage.load(_DEFAULT_FUNCTIONS_KEY, self._field(self._parse_id(index))) or dict()
+        return self._make(data)
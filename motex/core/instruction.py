@@ -1,117 +1,165 @@
 import motex.common.hextools as hextools
-from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_INSTRUCTIONS_KEY
+from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_INSTRUCTIONS_KEY, _LAZY_KEY_SUFFIX
 from motex.storage import MotexStorageTracker
 from motex.common.base import HelperBase
+from motex.common.lazy import MotexLazyInstructions
+from motex.common.record import MotexRecord
 
 
-class MotexInstruction:
-    next_ = None
-    prev_ = None
-    index_ = None
-
-    def __init__(self, **kwargs):
-        '''
-        ins = MotexInstruction("0x1", "12")
-        print str(ins)
-        ...
-        0x01
-        '''
-        # if address is not None:
-        #     self.address = address 
-
-        # if content is not None:
-        #     self.content = content
-        for key, val in kwargs.items():
-            setattr(self, key, val)      
+class MotexInstruction(MotexRecord):
+    __slots__ = ('address',
+                 'function_address',
+                 'basicblock_address',
+                 'content',
+                 'content_str')
 
     def __lt__(self, other):
-        return hextools.hex_to_int(self.address) < hextools.hex_to_int(other.address)
+        return self.address < other.address
 
     def __le__(self, other):
-        return hextools.hex_to_int(self.address) <= hextools.hex_to_int(other.address)
+        return self.address <= other.address
 
     def __gt__(self, other):
-        return hextools.hex_to_int(self.address) > hextools.hex_to_int(other.address)
+        return self.address > other.address
 
     def __ge__(self, other):
-        return hextools.hex_to_int(self.address) >= hextools.hex_to_int(other.address)
+        return self.address >= other.address
 
     def __eq__(self, other):
-        return hextools.hex_to_int(self.address) == hextools.hex_to_int(other.address)
+        return self.address == other.address
 
     def __str__(self):
-        return "%s: <MotexInstruction> (%s)" % (self.address, self.content)
+        return "%s: <MotexInstruction> (%s)" % (hextools.int_to_hex(self.address), self.content)
 
-    def get_id(self):
-        return self.index_
 
-    def get_next_id(self):
-        return self.next_
+class MotexInstructionStorageHelper(MotexStorageTracker):
+    '''
+    With `lazy` the records are not stored: besides the order pages, every
+    order page gets under `<key>:lazy` the runs of the function and basic
+    block addresses of its instructions, [address, value] where the value
+    changes. The rest of a record is decoded again from the binary, see
+    MotexLazyInstructions.
+    '''
+    _records_key = _DEFAULT_INSTRUCTIONS_KEY
+    _records_name = 'instructions'
+
+    lazy = False
+
+    def prepare(self, storage):
+        storage.cleanup(_DEFAULT_INSTRUCTIONS_KEY)
+        storage.cleanup(_DEFAULT_INSTRUCTIONS_KEY + _LAZY_KEY_SUFFIX)
+        storage.delete(_DEFAULT_METADATA_KEY, 'instructions_lazy')
+        self._track_prepare(storage)
+        self._runs = {'functions': [], 'basicblocks': []}
+
+    def _add_runs(self, current):
+        for (name, value) in (('functions', current.function_address),
+                              ('basicblocks', current.basicblock_address)):
+            runs = self._runs[name]
+            if not runs or runs[-1][1] != value:
+                runs.append([current.address, value])
+
+    def _track_flush(self, storage):
+        if self.lazy and self._order:
+            storage.store(_DEFAULT_INSTRUCTIONS_KEY + _LAZY_KEY_SUFFIX, str(self._order_pages), self._runs)
+            self._runs = {'functions': [], 'basicblocks': []}
+        super()._track_flush(storage)
+
+    def checkpoint(self):
+        state = super().checkpoint()
+        if self.lazy:
+            state['runs'] = {name: [list(run) for run in runs] for (name, runs) in self._runs.items()}
+        return state
+
+    def resume(self, state, record_class):
+        super().resume(state, record_class)
+        self._runs = state.get('runs') or {'functions': [], 'basicblocks': []}
+
+    def save(self, index=0, current=None, prev=None, storage=None):
+        field = index
+        current.index_ = field
+        current.ordinal_ = self.count
 
-    def get_prev_id(self):
-        return self.prev_
+        if self.first is None:
+            self.first = field
 
-    def to_dict(self):
-        return {'prev_': self.prev_,
-                'next_': self.next_,
-                'index_': self.index_,
-                'address': self.address,
-                'function_address': self.function_address,
-                'basicblock_address': self.basicblock_address,
-                'content': self.content,
-                'content_str': self.content_str,}
+        if self.lazy:
+            self._add_runs(current)
 
+        if storage is not None:
+            self._track(storage, field)
 
-class MotexInstructionStorageHelper(MotexStorageTracker):
-    first = None
-    count = 0
-    prev_ = None
+        if self.prev_ is not None:
+            self.prev_.next_ = field
+            current.prev_ = self.prev_.index_
 
-    @classmethod
-    def prepare(cls, storage):
-        storage.cleanup(_DEFAULT_INSTRUCTIONS_KEY)
+        if storage is not None and self.prev_ is not None and not self.lazy:
+            storage.store(_DEFAULT_INSTRUCTIONS_KEY, str(self.prev_.index_), self.prev_.to_dict())
 
-    @classmethod
-    def save(cls, index=0, current=None, prev=None, storage=None):
-        field = str(index)
-        current.index_ = field
+        self.prev_ = current
+        self.count = self.count + 1
 
-        if cls.first is None:
-            cls.first = field
+    def save_stored(self, indexes, last, storage=None):
+        '''
+        Takes over the records at `indexes`, stored by a previous extraction
+        with the links and ordinals they get now, without writing them again.
+        `last` is the record of the last one, linked to the next record saved.
+        '''
+        if self.first is None:
+            self.first = indexes[0]
+
+        if storage is not None:
+            for index in indexes:
+                self._track(storage, index)
 
-        if cls.prev_ is not None:
-            cls.prev_.next_ = field
-            current.prev_ = cls.prev_.index_
+        if self.prev_ is not None:
+            self.prev_.next_ = indexes[0]
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_INSTRUCTIONS_KEY, cls.prev_.index_, cls.prev_.to_dict())
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_INSTRUCTIONS_KEY, str(self.prev_.index_), self.prev_.to_dict())
 
-        cls.prev_ = current
-        cls.count = cls.count + 1
+        self.prev_ = last
+        self.count = self.count + len(indexes)
 
-    @classmethod
-    def complete(cls, storage=None):
-        if cls.prev_ is None:
+    def complete(self, storage=None):
+        if self.prev_ is None:
             return
 
-        cls.prev_.next_ = None
-        field = cls.prev_.index_
+        self.prev_.next_ = None
+        field = str(self.prev_.index_)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_INSTRUCTIONS_KEY, field, cls.prev_.to_dict())
+        if storage is not None and self.prev_ is not None:
+            if not self.lazy:
+                storage.store(_DEFAULT_INSTRUCTIONS_KEY, field, self.prev_.to_dict())
 
             field = 'instructions_first'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.first)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.first)
 
             field = 'instructions_last'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.prev_.get_id())
+            storage.store(_DEFAULT_METADATA_KEY, field, self.prev_.get_id())
 
             field = 'instructions_count'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.count)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.count)
+
+            self._track_complete(storage)
 
 
 class MotexInstructionHelper(HelperBase):
+    _records_key = _DEFAULT_INSTRUCTIONS_KEY
+    _records_name = 'instructions'
+    _record_class = MotexInstruction
+    _address_ordered = True
+
+    @staticmethod
+    def _record_end(record):
+        return record.address + len(record.content) // 2
+
     def __init__(self, storage):
+        # records of a lazy extraction are decoded from the binary on access
+        lazy = storage.load(_DEFAULT_METADATA_KEY, 'instructions_lazy')
+        if lazy is not None:
+            storage = MotexLazyInstructions(storage, lazy)
+
         self._storage = storage
         self._first = self._get_first()
         self._last = self._get_last()
@@ -131,9 +179,9 @@ class MotexInstructionHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, first)
+        data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, self._field(first))
         if data != None:
-            return MotexInstruction(**data)
+            return self._make(data)
         return None
 
     def _get_last(self):
@@ -142,19 +190,26 @@ class MotexInstructionHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, first)
+        data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, self._field(first))
         if data != None:
-            return MotexInstruction(**data)
+            return self._make(data)
         return None
 
     def _get_count(self):
         field = 'instructions_count'
         return self._storage.load(_DEFAULT_METADATA_KEY, field)
 
-    def all(self):
-        return self.__iter__()
+    def coverage(self):
+        '''
+        >>> MotexInstructionHelper(storage).coverage()['undecoded_bytes']
+        1470
+
+        Coverage of a recursive descent extraction, None after a linear sweep.
+        '''
+        field = 'instructions_coverage'
+        return self._storage.load(_DEFAULT_METADATA_KEY, field)
 
-    def __iter__(self):
+    def _iter_linked(self):
         '''
         >>> for ins in MotexInstructionHelper(storage).all():
         ...  print str(ins)
@@ -166,19 +221,19 @@ class MotexInstructionHelper(HelperBase):
         '''
         curr = self._first
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, curr.get_id()) or dict()
-            curr = MotexInstruction(**data)
+            data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_next_id() is not None:
-                data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, curr.get_next_id())
+                data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, self._field(curr.get_next_id()))
 
-            next_curr = MotexInstruction(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
-    def reverse(self):
+    def _reverse_linked(self):
         '''
         >>> for ins in MotexInstructionHelper(storage).reverse():
         ...  print str(ins)
@@ -190,16 +245,16 @@ class MotexInstructionHelper(HelperBase):
         '''
         curr = self._last
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, curr.get_id()) or dict()
-            curr = MotexInstruction(**data)
+            data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_prev_id() is not None:
-                data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, curr.get_prev_id())
+                data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, self._field(curr.get_prev_id()))
 
-            next_curr = MotexInstruction(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
     def get(self, index):
@@ -209,11 +264,11 @@ class MotexInstructionHelper(HelperBase):
         ...
         0x04 <MotexInstruction> instruction
         '''
-        if not isinstance(index, str):
-            raise Exception("index must be string")
+        if not isinstance(index, (int, str)):
+            raise Exception("index must be int or string")
 
-        data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, index) or dict()
-        return MotexInstruction(**data)
+        data = self._storage.load(_DEFAULT_INSTRUCTIONS_KEY, self._field(self._parse_id(index))) or dict()
+        return self._make(data)
 
     def from_int(self, address):
         '''
@@ -222,5 +277,8 @@ class MotexInstructionHelper(HelperBase):
         ...
         0x01
         '''
-        pass
+        if not isinstance(address, int):
+            raise Exception("address must be int")
+
+        return self.containing(address)
 
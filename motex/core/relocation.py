@@ -2,105 +2,91 @@ import motex.common.hextools as hextools
 from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_RELOCATIONS_KEY
 from motex.storage import MotexStorageTracker
 from motex.common.base import HelperBase
+from motex.common.record import MotexRecord
 
 
-class MotexRelocation:
-    next_ = None
-    prev_ = None
-    index_ = None
-
-    def __init__(self, **kwargs):
-        for key, val in kwargs.items():
-            if val is not None:
-                setattr(self, key, val)
+class MotexRelocation(MotexRecord):
+    __slots__ = ('relocation_address',
+                 'relocation_type',
+                 'relocation_symbol_value',
+                 'relocation_symbol_name',
+                 'relocation_computed_plt_address')
 
     def __lt__(self, other):
-        return hextools.hex_to_int(self.relocation_address) < hextools.hex_to_int(other.relocation_address)
+        return self.relocation_address < other.relocation_address
 
     def __le__(self, other):
-        return hextools.hex_to_int(self.relocation_address) <= hextools.hex_to_int(other.relocation_address)
+        return self.relocation_address <= other.relocation_address
 
     def __gt__(self, other):
-        return hextools.hex_to_int(self.relocation_address) > hextools.hex_to_int(other.relocation_address)
+        return self.relocation_address > other.relocation_address
 
     def __ge__(self, other):
-        return hextools.hex_to_int(self.relocation_address) >= hextools.hex_to_int(other.relocation_address)
+        return self.relocation_address >= other.relocation_address
 
     def __eq__(self, other):
-        return hextools.hex_to_int(self.relocation_address) == hextools.hex_to_int(other.relocation_address)
+        return self.relocation_address == other.relocation_address
 
     def __str__(self):
-        return "%s: <MotexRelocation> (%s)" % (self.relocation_symbol_name, self.relocation_address)
-
-    def get_id(self):
-        return self.index_
-
-    def get_next_id(self):
-        return self.next_
-
-    def get_prev_id(self):
-        return self.prev_
-
-    def to_dict(self):
-        return {'prev_': self.prev_,
-                'next_': self.next_,
-                'index_': self.index_,
-                'relocation_address': self.relocation_address,
-                'relocation_type': self.relocation_type,
-                'relocation_symbol_value': self.relocation_symbol_value,
-                'relocation_symbol_name': self.relocation_symbol_name,
-                'relocation_computed_plt_address': self.relocation_computed_plt_address,}
+        return "%s: <MotexRelocation> (%s)" % (self.relocation_symbol_name, hextools.int_to_hex(self.relocation_address))
 
 
 class MotexRelocationStorageHelper(MotexStorageTracker):
-    first = None
-    count = 0
-    prev_ = None
+    _records_key = _DEFAULT_RELOCATIONS_KEY
+    _records_name = 'relocations'
 
-    @classmethod
-    def prepare(cls, storage):
+    def prepare(self, storage):
         storage.cleanup(_DEFAULT_RELOCATIONS_KEY)
+        self._track_prepare(storage)
 
-    @classmethod
-    def save(cls, index=0, current=None, prev=None, storage=None):
-        field = str(index)
+    def save(self, index=0, current=None, prev=None, storage=None):
+        field = index
         current.index_ = field
+        current.ordinal_ = self.count
 
-        if cls.first is None:
-            cls.first = field
+        if self.first is None:
+            self.first = field
 
-        if cls.prev_ is not None:
-            cls.prev_.next_ = field
-            current.prev_ = cls.prev_.index_
+        if storage is not None:
+            self._track(storage, field)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_RELOCATIONS_KEY, cls.prev_.index_, cls.prev_.to_dict())
+        if self.prev_ is not None:
+            self.prev_.next_ = field
+            current.prev_ = self.prev_.index_
 
-        cls.prev_ = current
-        cls.count = cls.count + 1
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_RELOCATIONS_KEY, str(self.prev_.index_), self.prev_.to_dict())
 
-    @classmethod
-    def complete(cls, storage=None):
-        if cls.prev_ is None:
+        self.prev_ = current
+        self.count = self.count + 1
+
+    def complete(self, storage=None):
+        if self.prev_ is None:
             return
 
-        cls.prev_.next_ = None
-        field = cls.prev_.index_
+        self.prev_.next_ = None
+        field = str(self.prev_.index_)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_RELOCATIONS_KEY, field, cls.prev_.to_dict())
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_RELOCATIONS_KEY, field, self.prev_.to_dict())
 
             field = 'relocations_first'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.first)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.first)
 
             field = 'relocations_last'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.prev_.get_id())
+            storage.store(_DEFAULT_METADATA_KEY, field, self.prev_.get_id())
 
             field = 'relocations_count'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.count)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.count)
+
+            self._track_complete(storage)
 
 
 class MotexRelocationHelper(HelperBase):
+    _records_key = _DEFAULT_RELOCATIONS_KEY
+    _records_name = 'relocations'
+    _record_class = MotexRelocation
+
     def __init__(self, storage):
         self._storage = storage
         self._first = self._get_first()
@@ -121,9 +107,9 @@ class MotexRelocationHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, first)
+        data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, self._field(first))
         if data != None:
-            return MotexRelocation(**data)
+            return self._make(data)
         return None
 
     def _get_last(self):
@@ -132,19 +118,16 @@ class MotexRelocationHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, first)
+        data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, self._field(first))
         if data != None:
-            return MotexRelocation(**data)
+            return self._make(data)
         return None
 
     def _get_count(self):
         field = 'relocations_count'
         return self._storage.load(_DEFAULT_METADATA_KEY, field)
 
-    def all(self):
-        return self.__iter__()
-
-    def __iter__(self):
+    def _iter_linked(self):
         '''
         >>> for ins in MotexRelocationHelper(storage).all():
         ...  print str(ins)
@@ -156,19 +139,19 @@ class MotexRelocationHelper(HelperBase):
         '''
         curr = self._first
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, curr.get_id()) or dict()
-            curr = MotexRelocation(**data)
+            data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_next_id() is not None:
-                data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, curr.get_next_id())
+                data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, self._field(curr.get_next_id()))
 
-            next_curr = MotexRelocation(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
-    def reverse(self):
+    def _reverse_linked(self):
         '''
         >>> for ins in MotexRelocationHelper(storage).reverse():
         ...  print str(ins)
@@ -180,16 +163,16 @@ class MotexRelocationHelper(HelperBase):
         '''
         curr = self._last
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, curr.get_id()) or dict()
-            curr = MotexRelocation(**data)
+            data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_prev_id() is not None:
-                data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, curr.get_prev_id())
+                data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, self._field(curr.get_prev_id()))
 
-            next_curr = MotexRelocation(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
     def get(self, index):
@@ -199,8 +182,8 @@ class MotexRelocationHelper(HelperBase):
         ...
         0x04 <MotexRelocation> reloc
         '''
-        if not isinstance(index, str):
-            raise Exception("index must be string")
+        if not isinstance(index, (int, str)):
+            raise Exception("index must be int or string")
 
-        data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, index) or dict()
-        return MotexRelocation(**data)
+        data = self._storage.load(_DEFAULT_RELOCATIONS_KEY, self._field(self._parse_id(index))) or dict()
+        return self._make(data)
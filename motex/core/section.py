@@ -2,108 +2,94 @@ import motex.common.hextools as hextools
 from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_SECTIONS_KEY
 from motex.storage import MotexStorageTracker
 from motex.common.base import HelperBase
+from motex.common.record import MotexRecord
 
 
-class MotexSection:
-    next_ = None
-    prev_ = None
-    index_ = None
-
-    def __init__(self, **kwargs):
-        for key, val in kwargs.items():
-            if val is not None:
-                setattr(self, key, val)
+class MotexSection(MotexRecord):
+    __slots__ = ('section_name',
+                 'section_type',
+                 'section_offset',
+                 'section_virtual_address',
+                 'section_size',
+                 'section_entry_size',
+                 'section_entropy',
+                 'section_segments')
 
     def __lt__(self, other):
-        return hextools.hex_to_int(self.section_virtual_address) < hextools.hex_to_int(other.section_virtual_address)
+        return self.section_virtual_address < other.section_virtual_address
 
     def __le__(self, other):
-        return hextools.hex_to_int(self.section_virtual_address) <= hextools.hex_to_int(other.section_virtual_address)
+        return self.section_virtual_address <= other.section_virtual_address
 
     def __gt__(self, other):
-        return hextools.hex_to_int(self.section_virtual_address) > hextools.hex_to_int(other.section_virtual_address)
+        return self.section_virtual_address > other.section_virtual_address
 
     def __ge__(self, other):
-        return hextools.hex_to_int(self.section_virtual_address) >= hextools.hex_to_int(section_virtual_address.offset)
+        return self.section_virtual_address >= other.section_virtual_address
 
     def __eq__(self, other):
-        return hextools.hex_to_int(self.section_virtual_address) == hextools.hex_to_int(other.section_virtual_address)
+        return self.section_virtual_address == other.section_virtual_address
 
     def __str__(self):
-        return "%s: <MotexSection> (%s)" % (self.section_virtual_address, self.section_name)
-
-    def get_id(self):
-        return self.index_
-
-    def get_next_id(self):
-        return self.next_
-
-    def get_prev_id(self):
-        return self.prev_
-
-    def to_dict(self):
-        return {'prev_': self.prev_,
-                'next_': self.next_,
-                'index_': self.index_,
-                'section_name': self.section_name,
-                'section_type': self.section_type,
-                'section_offset': self.section_offset,
-                'section_virtual_address': self.section_virtual_address,
-                'section_size': self.section_size,
-                'section_entry_size': self.section_entry_size,
-                'section_entropy': self.section_entropy,
-                'section_segments': self.section_segments,}
+        return "%s: <MotexSection> (%s)" % (hextools.int_to_hex(self.section_virtual_address), self.section_name)
 
 
 class MotexSectionStorageHelper(MotexStorageTracker):
-    first = None
-    count = 0
-    prev_ = None
+    _records_key = _DEFAULT_SECTIONS_KEY
+    _records_name = 'sections'
 
-    @classmethod
-    def prepare(cls, storage):
+    def prepare(self, storage):
         storage.cleanup(_DEFAULT_SECTIONS_KEY)
+        self._track_prepare(storage)
 
-    @classmethod
-    def save(cls, index=0, current=None, prev=None, storage=None):
-        field = str(index)
+    def save(self, index=0, current=None, prev=None, storage=None):
+        field = index
         current.index_ = field
+        current.ordinal_ = self.count
 
-        if cls.first is None:
-            cls.first = field
+        if self.first is None:
+            self.first = field
 
-        if cls.prev_ is not None:
-            cls.prev_.next_ = field
-            current.prev_ = cls.prev_.index_
+        if storage is not None:
+            self._track(storage, field)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_SECTIONS_KEY, cls.prev_.index_, cls.prev_.to_dict())
+        if self.prev_ is not None:
+            self.prev_.next_ = field
+            current.prev_ = self.prev_.index_
 
-        cls.prev_ = current
-        cls.count = cls.count + 1
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_SECTIONS_KEY, str(self.prev_.index_), self.prev_.to_dict())
 
-    @classmethod
-    def complete(cls, storage=None):
-        if cls.prev_ is None:
+        self.prev_ = current
+        self.count = self.count + 1
+
+    def complete(self, storage=None):
+        if self.prev_ is None:
             return
 
-        cls.prev_.next_ = None
-        field = cls.prev_.index_
+        self.prev_.next_ = None
+        field = str(self.prev_.index_)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_SECTIONS_KEY, field, cls.prev_.to_dict())
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_SECTIONS_KEY, field, self.prev_.to_dict())
 
             field = 'sections_first'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.first)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.first)
 
             field = 'sections_last'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.prev_.get_id())
+            storage.store(_DEFAULT_METADATA_KEY, field, self.prev_.get_id())
 
             field = 'sections_count'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.count)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.count)
+
+            self._track_complete(storage)
 
 
 class MotexSectionHelper(HelperBase):
+    _records_key = _DEFAULT_SECTIONS_KEY
+    _records_name = 'sections'
+    _record_class = MotexSection
+
     def __init__(self, storage):
         self._storage = storage
         self._first = self._get_first()
@@ -119,35 +105,32 @@ class MotexSectionHelper(HelperBase):
         return self._first
 
     def _get_first(self):
-        field = 'symbols_first'
+        field = 'sections_first'
         first = self._storage.load(_DEFAULT_METADATA_KEY, field)
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_SECTIONS_KEY, first)
+        data = self._storage.load(_DEFAULT_SECTIONS_KEY, self._field(first))
         if data != None:
-            return MotexSection(**data)
+            return self._make(data)
         return None
 
     def _get_last(self):
-        field = 'symbols_last'
+        field = 'sections_last'
         first = self._storage.load(_DEFAULT_METADATA_KEY, field)
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_SECTIONS_KEY, first)
+        data = self._storage.load(_DEFAULT_SECTIONS_KEY, self._field(first))
         if data != None:
-            return MotexSection(**data)
+            return self._make(data)
         return None
 
     def _get_count(self):
-        field = 'symbols_count'
+        field = 'sections_count'
         return self._storage.load(_DEFAULT_METADATA_KEY, field)
 
-    def all(self):
-        return self.__iter__()
-
-    def __iter__(self):
+    def _iter_linked(self):
         '''
         >>> for ins in MotexSectionHelper(storage).all():
         ...  print str(ins)
@@ -159,19 +142,19 @@ class MotexSectionHelper(HelperBase):
         '''
         curr = self._first
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_SECTIONS_KEY, curr.get_id()) or dict()
-            curr = MotexSection(**data)
+            data = self._storage.load(_DEFAULT_SECTIONS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_next_id() is not None:
-                data = self._storage.load(_DEFAULT_SECTIONS_KEY, curr.get_next_id())
+                data = self._storage.load(_DEFAULT_SECTIONS_KEY, self._field(curr.get_next_id()))
 
-            next_curr = MotexSection(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
-    def reverse(self):
+    def _reverse_linked(self):
         '''
         >>> for ins in MotexSectionHelper(storage).reverse():
         ...  print str(ins)
@@ -183,16 +166,16 @@ class MotexSectionHelper(HelperBase):
         '''
         curr = self._last
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_SECTIONS_KEY, curr.get_id()) or dict()
-            curr = MotexSection(**data)
+            data = self._storage.load(_DEFAULT_SECTIONS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_prev_id() is not None:
-                data = self._storage.load(_DEFAULT_SECTIONS_KEY, curr.get_prev_id())
+                data = self._storage.load(_DEFAULT_SECTIONS_KEY, self._field(curr.get_prev_id()))
 
-            next_curr = MotexSection(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
     def get(self, index):
@@ -202,8 +185,8 @@ class MotexSectionHelper(HelperBase):
         ...
         0x04 <MotexSection> sec
         '''
-        if not isinstance(index, str):
-            raise Exception("index must be string")
+        if not isinstance(index, (int, str)):
+            raise Exception("index must be int or string")
 
-        data = self._storage.load(_DEFAULT_SECTIONS_KEY, index) or dict()
-        return MotexSection(**data)
+        data = self._storage.load(_DEFAULT_SECTIONS_KEY, self._field(self._parse_id(index))) or dict()
+        return self._make(data)
@@ -2,112 +2,98 @@ import motex.common.hextools as hextools
 from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_SEGMENTS_KEY
 from motex.storage import MotexStorageTracker
 from motex.common.base import HelperBase
+from motex.common.record import MotexRecord
 
 
-class MotexSegment:
-    next_ = None
-    prev_ = None
-    index_ = None
-
-    def __init__(self, **kwargs):
-        for key, val in kwargs.items():
-            if val is not None:
-                setattr(self, key, val)
+class MotexSegment(MotexRecord):
+    __slots__ = ('segment_type',
+                 'segment_offset',
+                 'segment_virtual_address',
+                 'segment_virtual_size',
+                 'segment_physical_address',
+                 'segment_physical_size',
+                 'segment_flags',
+                 'segment_sections',
+                 'segment_section_addrs')
 
     def __lt__(self, other):
-        return hextools.hex_to_int(self.segment_offset) < hextools.hex_to_int(other.segment_offset)
+        return self.segment_offset < other.segment_offset
 
     def __le__(self, other):
-        return hextools.hex_to_int(self.segment_offset) <= hextools.hex_to_int(other.segment_offset)
+        return self.segment_offset <= other.segment_offset
 
     def __gt__(self, other):
-        return hextools.hex_to_int(self.segment_offset) > hextools.hex_to_int(other.segment_offset)
+        return self.segment_offset > other.segment_offset
 
     def __ge__(self, other):
-        return hextools.hex_to_int(self.segment_offset) >= hextools.hex_to_int(other.segment_offset)
+        return self.segment_offset >= other.segment_offset
 
     def __eq__(self, other):
-        return hextools.hex_to_int(self.segment_offset) == hextools.hex_to_int(other.segment_offset)
+        return self.segment_offset == other.segment_offset
 
     def __str__(self):
         if self.segment_offset == None:
             return None
         else:
-            return "%s: <MotexSegment> (%s)" % (self.segment_offset, self.segment_type)
-
-    def get_id(self):
-        return self.index_
-
-    def get_next_id(self):
-        return self.next_
-
-    def get_prev_id(self):
-        return self.prev_
-
-    def to_dict(self):
-        return {'prev_': self.prev_,
-                'next_': self.next_,
-                'index_': self.index_,
-                'segment_type': self.segment_type,
-                'segment_offset': self.segment_offset,
-                'segment_virtual_address': self.segment_virtual_address,
-                'segment_virtual_size': self.segment_virtual_size,
-                'segment_physical_address': self.segment_physical_address,
-                'segment_physical_size': self.segment_physical_size,
-                'segment_flags': self.segment_flags,
-                'segment_sections': self.segment_sections,
-                'segment_section_addrs': self.segment_section_addrs,}
+            return "%s: <MotexSegment> (%s)" % (hextools.int_to_hex(self.segment_offset), self.segment_type)
 
 
 class MotexSegmentStorageHelper(MotexStorageTracker):
-    first = None
-    count = 0
-    prev_ = None
+    _records_key = _DEFAULT_SEGMENTS_KEY
+    _records_name = 'segments'
 
-    @classmethod
-    def prepare(cls, storage):
+    def prepare(self, storage):
         storage.cleanup(_DEFAULT_SEGMENTS_KEY)
+        self._track_prepare(storage)
 
-    @classmethod
-    def save(cls, index=0, current=None, prev=None, storage=None):
-        field = str(index)
+    def save(self, index=0, current=None, prev=None, storage=None):
+        field = index
         current.index_ = field
+        current.ordinal_ = self.count
 
-        if cls.first is None:
-            cls.first = field
+        if self.first is None:
+            self.first = field
 
-        if cls.prev_ is not None:
-            cls.prev_.next_ = field
-            current.prev_ = cls.prev_.index_
+        if storage is not None:
+            self._track(storage, field)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_SEGMENTS_KEY, cls.prev_.index_, cls.prev_.to_dict())
+        if self.prev_ is not None:
+            self.prev_.next_ = field
+            current.prev_ = self.prev_.index_
 
-        cls.prev_ = current
-        cls.count = cls.count + 1
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_SEGMENTS_KEY, str(self.prev_.index_), self.prev_.to_dict())
 
-    @classmethod
-    def complete(cls, storage=None):
-        if cls.prev_ is None:
+        self.prev_ = current
+        self.count = self.count + 1
+
+    def complete(self, storage=None):
+        if self.prev_ is None:
             return
 
-        cls.prev_.next_ = None
-        field = cls.prev_.index_
+        self.prev_.next_ = None
+        field = str(self.prev_.index_)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_SEGMENTS_KEY, field, cls.prev_.to_dict())
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_SEGMENTS_KEY, field, self.prev_.to_dict())
 
             field = 'segments_first'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.first)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.first)
 
             field = 'segments_last'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.prev_.get_id())
+            storage.store(_DEFAULT_METADATA_KEY, field, self.prev_.get_id())
 
             field = 'segments_count'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.count)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.count)
+
+            self._track_complete(storage)
 
 
 class MotexSegmentHelper(HelperBase):
+    _records_key = _DEFAULT_SEGMENTS_KEY
+    _records_name = 'segments'
+    _record_class = MotexSegment
+
     def __init__(self, storage):
         self._storage = storage
         self._first = self._get_first()
@@ -128,9 +114,9 @@ class MotexSegmentHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_SEGMENTS_KEY, first)
+        data = self._storage.load(_DEFAULT_SEGMENTS_KEY, self._field(first))
         if data != None:
-            return MotexSegment(**data)
+            return self._make(data)
         return None
 
     def _get_last(self):
@@ -139,19 +125,16 @@ class MotexSegmentHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_SEGMENTS_KEY, first)
+        data = self._storage.load(_DEFAULT_SEGMENTS_KEY, self._field(first))
         if data != None:
-            return MotexSegment(**data)
+            return self._make(data)
         return None
 
     def _get_count(self):
         field = 'segments_count'
         return self._storage.load(_DEFAULT_METADATA_KEY, field)
 
-    def all(self):
-        return self.__iter__()
-
-    def __iter__(self):
+    def _iter_linked(self):
         '''
         >>> for ins in MotexSegmentHelper(storage).all():
         ...  print str(ins)
@@ -163,19 +146,19 @@ class MotexSegmentHelper(HelperBase):
         '''
         curr = self._first
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_SEGMENTS_KEY, curr.get_id()) or dict()
-            curr = MotexSegment(**data)
+            data = self._storage.load(_DEFAULT_SEGMENTS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_next_id() is not None:
-                data = self._storage.load(_DEFAULT_SEGMENTS_KEY, curr.get_next_id())
+                data = self._storage.load(_DEFAULT_SEGMENTS_KEY, self._field(curr.get_next_id()))
 
-            next_curr = MotexSegment(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
-    def reverse(self):
+    def _reverse_linked(self):
         '''
         >>> for ins in MotexSegmentHelper(storage).reverse():
         ...  print str(ins)
@@ -187,16 +170,16 @@ class MotexSegmentHelper(HelperBase):
         '''
         curr = self._last
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_SEGMENTS_KEY, curr.get_id()) or dict()
-            curr = MotexSegment(**data)
+            data = self._storage.load(_DEFAULT_SEGMENTS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_prev_id() is not None:
-                data = self._storage.load(_DEFAULT_SEGMENTS_KEY, curr.get_prev_id())
+                data = self._storage.load(_DEFAULT_SEGMENTS_KEY, self._field(curr.get_prev_id()))
 
-            next_curr = MotexSegment(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
     def get(self, index):
@@ -206,8 +189,8 @@ class MotexSegmentHelper(HelperBase):
         ...
         0x04 <MotexSegment> seg
         '''
-        if not isinstance(index, str):
-            raise Exception("index must be string")
+        if not isinstance(index, (int, str)):
+            raise Exception("index must be int or string")
 
-        data = self._storage.load(_DEFAULT_SEGMENTS_KEY, index) or dict()
-        return MotexSegment(**data)
+        data = self._storage.load(_DEFAULT_SEGMENTS_KEY, self._field(self._parse_id(index))) or dict()
+        return self._make(data)
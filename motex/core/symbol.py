@@ -2,110 +2,96 @@ import motex.common.hextools as hextools
 from motex.common.constants import _DEFAULT_METADATA_KEY, _DEFAULT_SYMBOLS_KEY
 from motex.storage import MotexStorageTracker
 from motex.common.base import HelperBase
+from motex.common.record import MotexRecord
 
 
-class MotexSymbol:
-    next_ = None
-    prev_ = None
-    index_ = None
-
-    def __init__(self, **kwargs):
-        for key, val in kwargs.items():
-            if val is not None:
-                setattr(self, key, val)
+class MotexSymbol(MotexRecord):
+    __slots__ = ('symbol_num',
+                 'symbol_index',
+                 'symbol_value',
+                 'symbol_size',
+                 'symbol_type',
+                 'symbol_bind',
+                 'symbol_visibility',
+                 'symbol_name',
+                 'symbol_import_export',
+                 'symbol_version')
 
     def __lt__(self, other):
-        return hextools.hex_to_int(self.symbol_value) < hextools.hex_to_int(other.symbol_value)
+        return self.symbol_value < other.symbol_value
 
     def __le__(self, other):
-        return hextools.hex_to_int(self.symbol_value) <= hextools.hex_to_int(other.symbol_value)
+        return self.symbol_value <= other.symbol_value
 
     def __gt__(self, other):
-        return hextools.hex_to_int(self.symbol_value) > hextools.hex_to_int(other.symbol_value)
+        return self.symbol_value > other.symbol_value
 
     def __ge__(self, other):
-        return hextools.hex_to_int(self.symbol_value) >= hextools.hex_to_int(other.symbol_value)
+        return self.symbol_value >= other.symbol_value
 
     def __eq__(self, other):
-        return hextools.hex_to_int(self.symbol_value) == hextools.hex_to_int(other.symbol_value)
+        return self.symbol_value == other.symbol_value
 
     def __str__(self):
-        return "%s: <MotexSymbol> (%s)" % (self.symbol_value, self.symbol_name)
-
-    def get_id(self):
-        return self.index_
-
-    def get_next_id(self):
-        return self.next_
-
-    def get_prev_id(self):
-        return self.prev_
-
-    def to_dict(self):
-        return {'prev_': self.prev_,
-                'next_': self.next_,
-                'index_': self.index_,
-                'symbol_num': self.symbol_num,
-                'symbol_index': self.symbol_index,
-                'symbol_value': self.symbol_value,
-                'symbol_size': self.symbol_size,
-                'symbol_type': self.symbol_type,
-                'symbol_bind': self.symbol_bind,
-                'symbol_visibility': self.symbol_visibility,
-                'symbol_name': self.symbol_name,
-                'symbol_import_export': self.symbol_import_export,
-                'symbol_version': self.symbol_version,}
+        return "%s: <MotexSymbol> (%s)" % (hextools.int_to_hex(self.symbol_value), self.symbol_name)
 
 
 class MotexSymbolStorageHelper(MotexStorageTracker):
-    first = None
-    count = 0
-    prev_ = None
+    _records_key = _DEFAULT_SYMBOLS_KEY
+    _records_name = 'symbols'
 
-    @classmethod
-    def prepare(cls, storage):
+    def prepare(self, storage):
         storage.cleanup(_DEFAULT_SYMBOLS_KEY)
+        self._track_prepare(storage)
 
-    @classmethod
-    def save(cls, index=0, current=None, prev=None, storage=None):
-        field = str(index)
+    def save(self, index=0, current=None, prev=None, storage=None):
+        field = index
         current.index_ = field
+        current.ordinal_ = self.count
 
-        if cls.first is None:
-            cls.first = field
+        if self.first is None:
+            self.first = field
 
-        if cls.prev_ is not None:
-            cls.prev_.next_ = field
-            current.prev_ = cls.prev_.index_
+        if storage is not None:
+            self._track(storage, field)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_SYMBOLS_KEY, cls.prev_.index_, cls.prev_.to_dict())
+        if self.prev_ is not None:
+            self.prev_.next_ = field
+            current.prev_ = self.prev_.index_
 
-        cls.prev_ = current
-        cls.count = cls.count + 1
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_SYMBOLS_KEY, str(self.prev_.index_), self.prev_.to_dict())
 
-    @classmethod
-    def complete(cls, storage=None):
-        if cls.prev_ is None:
+        self.prev_ = current
+        self.count = self.count + 1
+
+    def complete(self, storage=None):
+        if self.prev_ is None:
             return
 
-        cls.prev_.next_ = None
-        field = cls.prev_.index_
+        self.prev_.next_ = None
+        field = str(self.prev_.index_)
 
-        if storage is not None and cls.prev_ is not None:
-            storage.store(_DEFAULT_SYMBOLS_KEY, field, cls.prev_.to_dict())
+        if storage is not None and self.prev_ is not None:
+            storage.store(_DEFAULT_SYMBOLS_KEY, field, self.prev_.to_dict())
 
             field = 'symbols_first'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.first)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.first)
 
             field = 'symbols_last'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.prev_.get_id())
+            storage.store(_DEFAULT_METADATA_KEY, field, self.prev_.get_id())
 
             field = 'symbols_count'
-            storage.store(_DEFAULT_METADATA_KEY, field, cls.count)
+            storage.store(_DEFAULT_METADATA_KEY, field, self.count)
+
+            self._track_complete(storage)
 
 
 class MotexSymbolHelper(HelperBase):
+    _records_key = _DEFAULT_SYMBOLS_KEY
+    _records_name = 'symbols'
+    _record_class = MotexSymbol
+
     def __init__(self, storage):
         self._storage = storage
         self._first = self._get_first()
@@ -126,9 +112,9 @@ class MotexSymbolHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_SYMBOLS_KEY, first)
+        data = self._storage.load(_DEFAULT_SYMBOLS_KEY, self._field(first))
         if data != None:
-            return MotexSymbol(**data)
+            return self._make(data)
         return None
 
     def _get_last(self):
@@ -137,19 +123,16 @@ class MotexSymbolHelper(HelperBase):
         if first is None:
             return None
 
-        data = self._storage.load(_DEFAULT_SYMBOLS_KEY, first)
+        data = self._storage.load(_DEFAULT_SYMBOLS_KEY, self._field(first))
         if data != None:
-            return MotexSymbol(**data)
+            return self._make(data)
         return None
 
     def _get_count(self):
         field = 'symbols_count'
         return self._storage.load(_DEFAULT_METADATA_KEY, field)
 
-    def all(self):
-        return self.__iter__()
-
-    def __iter__(self):
+    def _iter_linked(self):
         '''
         >>> for ins in MotexSymbolHelper(storage).all():
         ...  print str(ins)
@@ -161,19 +144,19 @@ class MotexSymbolHelper(HelperBase):
         '''
         curr = self._first
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_SYMBOLS_KEY, curr.get_id()) or dict()
-            curr = MotexSymbol(**data)
+            data = self._storage.load(_DEFAULT_SYMBOLS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_next_id() is not None:
-                data = self._storage.load(_DEFAULT_SYMBOLS_KEY, curr.get_next_id())
+                data = self._storage.load(_DEFAULT_SYMBOLS_KEY, self._field(curr.get_next_id()))
 
-            next_curr = MotexSymbol(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
-    def reverse(self):
+    def _reverse_linked(self):
         '''
         >>> for ins in MotexSymbolHelper(storage).reverse():
         ...  print str(ins)
@@ -185,16 +168,16 @@ class MotexSymbolHelper(HelperBase):
         '''
         curr = self._last
         while curr.get_id() != None:
-            data = self._storage.load(_DEFAULT_SYMBOLS_KEY, curr.get_id()) or dict()
-            curr = MotexSymbol(**data)
+            data = self._storage.load(_DEFAULT_SYMBOLS_KEY, self._field(curr.get_id())) or dict()
+            curr = self._make(data)
 
             yield curr
 
             data = dict()
             if curr.get_prev_id() is not None:
-                data = self._storage.load(_DEFAULT_SYMBOLS_KEY, curr.get_prev_id())
+                data = self._storage.load(_DEFAULT_SYMBOLS_KEY, self._field(curr.get_prev_id()))
 
-            next_curr = MotexSymbol(**data)
+            next_curr = self._make(data)
             curr = next_curr
 
     def get(self, index):
@@ -204,8 +187,8 @@ class MotexSymbolHelper(HelperBase):
         ...
         0x04 <MotexSymbol> sym
         '''
-        if not isinstance(index, str):
-            raise Exception("index must be string")
+        if not isinstance(index, (int, str)):
+            raise Exception("index must be int or string")
 
-        data = self._storage.load(_DEFAULT_SYMBOLS_KEY, index) or dict()
-        return MotexSymbol(**data)
+        data = self._storage.load(_DEFAULT_SYMBOLS_KEY, self._field(self._parse_id(index))) or dict()
+        return self._make(data)
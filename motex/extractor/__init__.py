@@ -8,7 +8,7 @@ class MotexExtractor:
     supported_arch = []
     supported_binary_format = {'elf': ELFExtractor}
 
-    def __init__(self, motex_config, storage):
+    def __init__(self, motex_config, storage, profiler=None):
         if not all(map(lambda x: x is not None, [motex_config, storage])):
             logger.error('motex_config, storage cannot be None')
             sys.exit(1)
@@ -24,11 +24,11 @@ class MotexExtractor:
             logger.error("Invalid binary path")
             sys.exit(1)
 
-        self.extractor = format_extractor(binary_path)
-        self.storage = storage
+        self.extractor = format_extractor(binary_path, profiler)
+        self.storage = storage if profiler is None else storage.profiled(profiler)
 
-    def extract(self, extract_config):
-        self.extractor.extract(extract_config, self.storage)
+    def extract(self, extract_config, resume=False):
+        self.extractor.extract(extract_config, self.storage, resume)
 
 
 __all__ = ['MotexExtractor',]
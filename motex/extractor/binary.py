@@ -0,0 +1,55 @@
+import mmap
+
+
+class MotexBinaryView:
+    '''
+    Read-only mmap of the binary being extracted.
+
+    Section and segment bytes are handed out as `memoryview` slices of the
+    mapping, so no stage copies them from the file; pages are only read when
+    a slice is accessed. Slices must be released before `close`.
+    '''
+    def __init__(self, binary_path):
+        self.binary_path = binary_path
+        self._file = open(binary_path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            self._mmap = b''
+        self.data = memoryview(self._mmap)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def slice(self, offset, size):
+        if offset < 0 or size < 0 or offset + size > len(self.data):
+            raise Exception(f"range {offset:#x}+{size:#x} is outside of {self.binary_path}")
+        return self.data[offset:offset + size]
+
+    def section_data(self, section):
+        '''
+        Bytes of a MotexSection, empty for sections without file content (.bss).
+        '''
+        if section.section_type == 'NOBITS':
+            return self.data[0:0]
+        return self.slice(section.section_offset, section.section_size)
+
+    def segment_data(self, segment):
+        return self.slice(segment.segment_offset, segment.segment_physical_size)
+
+    def close(self):
+        if self.data is None:
+            return
+
+        self.data.release()
+        self.data = None
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
@@ -0,0 +1,91 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from motex.extractor.disassembler import FLOW_BRANCH, FLOW_JUMP, FLOW_STOP, branch_target, flow_kind
+
+
+class BasicblockGraph:
+    '''
+    Basic blocks and control flow edges of one function.
+
+    `leaders` is the sorted array of block start addresses, `blocks` holds
+    one dict per block (address, end_address, instructions_count,
+    successors, predecessors) in the same order and `edges` the
+    [from, to] block address pairs.
+    '''
+    def __init__(self, leaders, blocks, edges):
+        self.leaders = leaders
+        self.blocks = blocks
+        self.edges = edges
+
+    def __len__(self):
+        return len(self.leaders)
+
+    def leader_of(self, address):
+        position = bisect_right(self.leaders, address) - 1
+        return None if position < 0 else self.leaders[position]
+
+
+def build_basicblocks(instructions):
+    '''
+    Basic blocks of the (address, size, mnemonic, op_str) `instructions` of
+    a function, in address order.
+
+    Blocks start at the first instruction, at direct jump and branch targets
+    inside the function and after jumps, branches, returns and holes in the
+    address range; calls do not end a block. Targets and block membership are
+    resolved by bisecting sorted address arrays, in O(n log n).
+    '''
+    count = len(instructions)
+    starts = array('Q', (insn[0] for insn in instructions))
+
+    def instruction_at(address):
+        position = bisect_left(starts, address)
+        return position < count and starts[position] == address
+
+    leaders = set(starts[:1])
+    kinds = [None] * count
+    targets = [None] * count
+    for (n, (address, size, mnemonic, op_str)) in enumerate(instructions):
+        kind = kinds[n] = flow_kind(mnemonic)
+        if kind == FLOW_JUMP or kind == FLOW_BRANCH:
+            target = branch_target(op_str)
+            if target is not None and instruction_at(target):
+                targets[n] = target
+                leaders.add(target)
+
+        if n + 1 < count:
+            if kind == FLOW_JUMP or kind == FLOW_BRANCH or kind == FLOW_STOP or starts[n + 1] != address + size:
+                leaders.add(starts[n + 1])
+
+    leaders = array('Q', sorted(leaders))
+    positions = [bisect_left(starts, leader) for leader in leaders] + [count]
+
+    blocks = []
+    edges = []
+    predecessors = {leader: [] for leader in leaders}
+    for (n, leader) in enumerate(leaders):
+        last = positions[n + 1] - 1
+        (address, size, mnemonic, op_str) = instructions[last]
+        kind = kinds[last]
+
+        successors = []
+        if targets[last] is not None:
+            successors.append(targets[last])
+
+        falls_through = kind != FLOW_JUMP and kind != FLOW_STOP
+        if falls_through and last + 1 < count and starts[last + 1] == address + size:
+            if starts[last + 1] not in successors:
+                successors.append(starts[last + 1])
+
+        for successor in successors:
+            edges.append([leader, successor])
+            predecessors[successor].append(leader)
+
+        blocks.append({'address': leader,
+                       'end_address': address + size,
+                       'instructions_count': last + 1 - positions[n],
+                       'successors': successors,
+                       'predecessors': predecessors[leader]})
+
+    return BasicblockGraph(leaders, blocks, edges)
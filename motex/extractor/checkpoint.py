@@ -0,0 +1,88 @@
+from itertools import islice
+
+from motex.common.constants import _DEFAULT_CHECKPOINT_KEY
+from motex.common.record import MotexRecord
+
+
+def _plain(item):
+    return item.to_dict() if isinstance(item, MotexRecord) else item
+
+
+class ExtractionCheckpoint:
+    '''
+    Progress of the instruction sweep of an extraction, stored under the
+    checkpoint key every `interval` instructions, when a function starts.
+
+    `state` holds the address the sweep resumes at and the linked list state
+    of the storage helpers. What the sweep keeps in memory until the end of
+    the extraction (functions, callsites, interval index ranges, ...) goes to
+    a journal: every checkpoint appends a page with what was collected since
+    the previous one. The state is written after the records it covers have
+    been flushed, so it never points past what is stored.
+    '''
+    def __init__(self, interval, binary_hash, options):
+        self.interval = interval
+        self.binary_hash = binary_hash
+        self.options = options
+        self.state = None
+        self.journal = dict()
+        self._pages = 0
+        self._offsets = dict()
+        self._next = interval
+
+    def due(self, count):
+        return self.interval > 0 and count >= self._next
+
+    def save(self, storage, state, collected):
+        '''
+        Stores `state` with a journal page of what `collected` (name to the
+        sequence of everything collected so far) gained since the last save.
+        '''
+        page = dict()
+        for (name, items) in collected.items():
+            offset = self._offsets.get(name, 0)
+            page[name] = [_plain(item) for item in islice(items, offset, None)]
+            self._offsets[name] = offset + len(page[name])
+
+        flush = getattr(storage, 'flush', None)
+        if flush is not None:
+            flush()
+
+        storage.store(_DEFAULT_CHECKPOINT_KEY, f'journal_{self._pages}', page)
+        self._pages = self._pages + 1
+        self.state = dict(state, binary_hash=self.binary_hash, options=self.options, journal_pages=self._pages)
+        storage.store(_DEFAULT_CHECKPOINT_KEY, 'state', self.state)
+        if flush is not None:
+            flush()
+
+        self._next = state['count'] + self.interval
+
+    @classmethod
+    def load(cls, storage, interval):
+        state = storage.load(_DEFAULT_CHECKPOINT_KEY, 'state')
+        if state is None:
+            return None
+
+        checkpoint = cls(interval, state['binary_hash'], state['options'])
+        checkpoint.state = state
+        for page in range(state['journal_pages']):
+            for (name, items) in (storage.load(_DEFAULT_CHECKPOINT_KEY, f'journal_{page}') or dict()).items():
+                checkpoint.journal.setdefault(name, []).extend(items)
+
+        checkpoint._pages = state['journal_pages']
+        checkpoint._next = state['count'] + interval
+        return checkpoint
+
+    def restart(self, collected):
+        '''
+        Called once the sweep state has been rebuilt from the journal, so that
+        the next page only holds what is collected from now on.
+        '''
+        self._offsets = {name: len(items) for (name, items) in collected.items()}
+
+    def matches(self, binary_hash, options):
+        return self.binary_hash == binary_hash and self.options == options
+
+    @staticmethod
+    def clear(storage):
+        storage.cleanup(_DEFAULT_CHECKPOINT_KEY)
@@ -0,0 +1,152 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from logzero import logger
+
+from motex.common.constants import _CORPUS_KEY, _DEFAULT_METADATA_KEY
+from motex.core import Motex, MotexConfig
+from motex.extractor import MotexExtractor
+
+_ELF_MAGIC = b'\x7fELF'
+
+
+def _is_elf(path):
+    try:
+        with open(path, 'rb') as fd:
+            return fd.read(len(_ELF_MAGIC)) == _ELF_MAGIC
+    except OSError:
+        return False
+
+
+def _namespace_of(path):
+    # namespaces cannot hold the key separator
+    return str(path).replace(':', '_')
+
+
+def corpus_binaries(corpus_path):
+    '''
+    (namespace, binary path) of the binaries of a corpus, either every ELF
+    file under a directory, namespaced by its path relative to it, or the
+    lines of a manifest: a binary path, relative to the manifest, optionally
+    followed by a tab and the namespace to load it in.
+    '''
+    corpus_path = Path(corpus_path)
+    binaries = []
+    if corpus_path.is_dir():
+        for path in sorted(corpus_path.rglob('*')):
+            if path.is_file() and _is_elf(path):
+                binaries.append((_namespace_of(path.relative_to(corpus_path)), str(path)))
+    elif corpus_path.is_file():
+        with open(corpus_path) as fd:
+            for line in fd:
+                line = line.rstrip('\n')
+                if not line.strip() or line.startswith('#'):
+                    continue
+
+                (binary, _tab, namespace) = line.partition('\t')
+                binaries.append((namespace.strip() or _namespace_of(binary), str(corpus_path.parent / binary)))
+    else:
+        raise Exception(f"{corpus_path} is neither a directory nor a manifest")
+
+    seen = set()
+    for (namespace, binary) in binaries:
+        if namespace in seen:
+            raise Exception(f"namespace {namespace} is given to more than one binary")
+        seen.add(namespace)
+    return binaries
+
+
+def _load_binary(config_path, namespace, binary_path, storage=None, resume=False):
+    '''
+    Extracts one binary into its namespace, with a storage of its own unless
+    one is given. Returns (namespace, size, seconds, error).
+    '''
+    start = time.perf_counter()
+    try:
+        if storage is None:
+            config = Motex(config_path, namespace=namespace)
+            storage = config.storage
+        else:
+            config = MotexConfig(config_path)
+            storage = storage.in_namespace(namespace)
+
+        motex_config = dict(config.motex_config, binary_path=binary_path)
+        MotexExtractor(motex_config, storage).extract(config.extract_config, resume)
+        seconds = time.perf_counter() - start
+
+        storage.store(_DEFAULT_METADATA_KEY, 'binary_path', binary_path)
+        storage.store(_DEFAULT_METADATA_KEY, 'extract_seconds', seconds)
+    except (Exception, SystemExit) as error:
+        return (namespace, 0, time.perf_counter() - start, f'{type(error).__name__}: {error}')
+    return (namespace, os.path.getsize(binary_path), seconds, None)
+
+
+def load_corpus(config_path, corpus_path, jobs=None, resume=False):
+    '''
+    >>> load_corpus('sqlite.toml', '/usr/lib/x86_64-linux-gnu', jobs=8)
+
+    Extracts the binaries of a corpus into one storage, each in its own
+    namespace, `jobs` at a time: in as many processes when the backend takes
+    concurrent writers, in threads sharing the storage otherwise. Binaries
+    that fail are logged and skipped. The namespaces loaded are added to the
+    storage list and the throughput of the load is stored under
+    `motex:corpus` as `report`. With `resume` the binaries extracted
+    completely before are skipped and interrupted ones resumed.
+    '''
+    motex_instance = Motex(config_path)
+    storage = motex_instance.storage
+    binaries = corpus_binaries(corpus_path)
+
+    jobs = jobs or os.cpu_count() or 1
+    threads = jobs > 1 and not storage.backend.concurrent_writers
+    if threads:
+        logger.info(f"{motex_instance.storage_config['backend']} storage does not take concurrent writers, "
+                    f"binaries are extracted by {jobs} threads sharing it")
+
+    start = time.perf_counter()
+    if jobs == 1:
+        results = (_load_binary(config_path, namespace, binary, storage, resume) for (namespace, binary) in binaries)
+        report = _report(results, storage)
+    elif threads:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_load_binary, config_path, namespace, binary, storage, resume)
+                       for (namespace, binary) in binaries]
+            report = _report((future.result() for future in as_completed(futures)), storage)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_load_binary, config_path, namespace, binary, None, resume)
+                       for (namespace, binary) in binaries]
+            report = _report((future.result() for future in as_completed(futures)), storage)
+
+    seconds = time.perf_counter() - start
+    megabytes = report['bytes'] / (1024 * 1024)
+    report.update({'jobs': jobs,
+                   'seconds': seconds,
+                   'binaries_per_second': report['binaries'] / seconds if seconds else 0.0,
+                   'megabytes_per_second': megabytes / seconds if seconds else 0.0})
+    storage.store(_CORPUS_KEY, 'report', report)
+
+    logger.info(f"loaded {report['binaries']} binaries ({megabytes:.1f} MiB) in {seconds:.1f}s with {jobs} jobs: "
+                f"{report['binaries_per_second']:.2f} binaries/s, {report['megabytes_per_second']:.2f} MiB/s, "
+                f"{len(report['failed'])} failed")
+    return report
+
+
+def _report(results, storage):
+    loaded = []
+    failed = []
+    size = 0
+    for (namespace, binary_size, seconds, error) in results:
+        if error is not None:
+            logger.error(f"{namespace}: {error}")
+            failed.append(namespace)
+            continue
+
+        logger.info(f"{namespace}: {binary_size} bytes in {seconds:.2f}s")
+        loaded.append(namespace)
+        size = size + binary_size
+
+    storage.add_namespaces(loaded)
+    return {'binaries': len(loaded), 'failed': sorted(failed), 'bytes': size}
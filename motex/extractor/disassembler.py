@@ -0,0 +1,398 @@
+from bisect import bisect_left
+from collections import deque
+from heapq import heapify, heappop, heappush
+from concurrent.futures import ProcessPoolExecutor
+
+import capstone as capstone
+
+# longest x86 instruction, a chunk is handed this many extra bytes so the
+# instruction straddling its end boundary still decodes
+_MAX_INSTRUCTION_SIZE = 15
+
+_CHUNKS_PER_WORKER = 4
+
+# bytes handed to capstone at once while following a control flow path,
+# doubled while the path goes on: capstone decodes a whole window at once
+# and most paths end at a branch within a few instructions
+_RECURSIVE_WINDOW = 64
+_RECURSIVE_WINDOW_MAX = 1024
+
+# control flow classes of an instruction, see flow_kind
+FLOW_CALL = 'call'
+FLOW_JUMP = 'jump'
+FLOW_BRANCH = 'branch'
+FLOW_STOP = 'stop'
+
+# unconditional jumps and instructions after which the flow does not fall through
+_FLOW_JUMPS = ('jmp', 'ljmp')
+_FLOW_STOPS = ('ret', 'retf', 'retfq', 'iret', 'iretd', 'iretq', 'hlt', 'ud2', 'sysret', 'sysexit')
+
+# rough size of the decoded tuples per byte of code, used to size chunks
+# when the decoded results must fit a memory budget
+_DECODED_BYTES_PER_CODE_BYTE = 64
+
+
+class DisassembledChunk:
+    def __init__(self, start, end, instructions, next_address, stopped):
+        self.start = start
+        self.end = end
+        self.instructions = instructions
+        self.next_address = next_address
+        self.stopped = stopped
+
+
+def disassemble_chunk(code, start, end):
+    '''
+    Linear sweep of `code` (mapped at `start`) that stops at the first
+    instruction starting at or after `end`.
+
+    `code` may be any bytes-like object, capstone is handed a bytes copy of
+    it. Instructions are returned as picklable (address, size, mnemonic, op_str)
+    tuples. `stopped` is set when capstone gave up on invalid bytes before
+    reaching `end`, exactly where a single sweep of the whole section stops.
+    '''
+    md = capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_64)
+
+    instructions = []
+    next_address = start
+    for (address, size, mnemonic, op_str) in md.disasm_lite(bytes(code), start):
+        if address >= end:
+            break
+
+        instructions.append((address, size, mnemonic, op_str))
+        next_address = address + size
+
+    stopped = next_address < end and next_address < start + len(code)
+    return DisassembledChunk(start, end, instructions, next_address, stopped)
+
+
+def _disassemble_chunk_worker(args):
+    return disassemble_chunk(*args)
+
+
+def split_code(code_start, code_end, boundaries, chunks):
+    '''
+    Split [code_start, code_end) into at most `chunks` ranges of roughly equal
+    size, cutting only at the given boundary addresses (function symbols).
+    '''
+    boundaries = sorted(b for b in set(boundaries) if code_start < b < code_end)
+    target_size = max(1, (code_end - code_start) // max(1, chunks))
+
+    ranges = []
+    current = code_start
+    while current < code_end:
+        position = bisect_left(boundaries, current + target_size)
+        if position >= len(boundaries):
+            ranges.append((current, code_end))
+            break
+
+        ranges.append((current, boundaries[position]))
+        current = boundaries[position]
+
+    return ranges
+
+
+def _resync(code, code_start, expected, chunk):
+    '''
+    Redo the start of `chunk` from `expected`, where the sweep of the previous
+    chunk actually ended, until it meets an instruction the worker already
+    decoded; from there both sweeps are identical.
+    '''
+    positions = {insn[0]: n for n, insn in enumerate(chunk.instructions)}
+    offset = expected - code_start
+    head = disassemble_chunk(code[offset:chunk.end - code_start + _MAX_INSTRUCTION_SIZE], expected, chunk.end)
+
+    for (n, insn) in enumerate(head.instructions):
+        position = positions.get(insn[0])
+        if position is not None:
+            return DisassembledChunk(expected, chunk.end, head.instructions[:n] + chunk.instructions[position:],
+                                     chunk.next_address, chunk.stopped)
+    return head
+
+
+def _merge(code, code_start, chunks):
+    expected = code_start
+    for chunk in chunks:
+        if expected >= chunk.end:
+            continue
+
+        if chunk.start != expected:
+            chunk = _resync(code, code_start, expected, chunk)
+
+        yield from chunk.instructions
+
+        if chunk.stopped:
+            return
+        expected = chunk.next_address
+
+
+def _disassemble_pool(jobs, workers):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # a bounded window of submitted chunks, executor.map would queue them all
+        window = deque()
+        try:
+            for job in jobs:
+                window.append(executor.submit(_disassemble_chunk_worker, job))
+                if len(window) >= 2 * workers:
+                    break
+
+            while window:
+                chunk = window.popleft().result()
+                job = next(jobs, None)
+                if job is not None:
+                    window.append(executor.submit(_disassemble_chunk_worker, job))
+                yield chunk
+        finally:
+            for pending in window:
+                pending.cancel()
+
+
+def _known_chunks(code, code_start, boundaries, known, chunk_size=None):
+    '''
+    Chunks between consecutive `boundaries`, taken from `known` when it has
+    the instructions of the range and decoded otherwise. Neighbouring ranges
+    that are decoded are swept together.
+    '''
+    code_end = code_start + len(code)
+    edges = sorted(b for b in set(boundaries) if code_start < b < code_end)
+
+    def decode(start, end):
+        chunks = 1 if not chunk_size else -(-(end - start) // chunk_size)
+        for (chunk_start, chunk_end) in split_code(start, end, edges, chunks):
+            yield disassemble_chunk(code[chunk_start - code_start:chunk_end - code_start + _MAX_INSTRUCTION_SIZE],
+                                    chunk_start, chunk_end)
+
+    pending = None
+    for (start, end) in zip([code_start] + edges, edges + [code_end]):
+        instructions = known(start, end)
+        if instructions is None:
+            pending = start if pending is None else pending
+            continue
+
+        if pending is not None:
+            yield from decode(pending, start)
+            pending = None
+
+        next_address = instructions[-1][0] + instructions[-1][1] if instructions else start
+        yield DisassembledChunk(start, end, instructions, next_address, next_address < end)
+
+    if pending is not None:
+        yield from decode(pending, code_end)
+
+
+def disassemble(code, code_start, boundaries=None, workers=1, memory_budget=None, known=None):
+    '''
+    Linear sweep over `code` yielding (address, size, mnemonic, op_str) in
+    address order.
+
+    With `workers` > 1 the code is split at `boundaries` and the chunks are
+    decoded in a process pool. The chunks are merged so that the result is
+    the same instruction stream a single sweep produces.
+
+    With a `memory_budget` (bytes) the code is cut in chunks small enough
+    that the decoded chunks held at once, at most two per worker, stay within
+    it; a single worker then decodes them one after the other.
+
+    `known(start, end)` can hand over the instructions between two boundaries
+    when they are already decoded (the stored sweep of the same bytes), as a
+    list that stops where that sweep left the range; it returns None for the
+    ranges to decode. Only those are swept, in this process.
+    '''
+    code_end = code_start + len(code)
+    chunks = workers * _CHUNKS_PER_WORKER
+    chunk_size = None
+    if memory_budget:
+        chunk_size = max(1, memory_budget // (2 * max(1, workers) * _DECODED_BYTES_PER_CODE_BYTE))
+        chunks = max(chunks, -(-len(code) // chunk_size))
+
+    if known is not None:
+        yield from _merge(code, code_start, _known_chunks(code, code_start, boundaries or [], known, chunk_size))
+        return
+
+    ranges = split_code(code_start, code_end, boundaries or [], chunks)
+
+    if len(ranges) <= 1 or (workers <= 1 and not memory_budget):
+        yield from disassemble_chunk(code, code_start, code_end).instructions
+        return
+
+    # chunks are copied out of `code` one at a time, it can be a memoryview of a mapped file
+    jobs = ((bytes(code[start - code_start:end - code_start + _MAX_INSTRUCTION_SIZE]), start, end)
+            for (start, end) in ranges)
+    if workers <= 1:
+        yield from _merge(code, code_start, (disassemble_chunk(*job) for job in jobs))
+    else:
+        yield from _merge(code, code_start, _disassemble_pool(jobs, workers))
+
+
+class DisassemblyCoverage:
+    '''
+    What a recursive descent reached: instructions and bytes decoded from
+    the entries, and those only decoded by the linear sweep of the gaps.
+    '''
+    def __init__(self, code_bytes=0, entries=0):
+        self.code_bytes = code_bytes
+        self.entries = entries
+        self.reachable_instructions = 0
+        self.reachable_bytes = 0
+        self.gap_instructions = 0
+        self.gap_bytes = 0
+
+    @property
+    def undecoded_bytes(self):
+        return self.code_bytes - self.reachable_bytes - self.gap_bytes
+
+    def to_dict(self):
+        return {'code_bytes': self.code_bytes,
+                'entries': self.entries,
+                'reachable_instructions': self.reachable_instructions,
+                'reachable_bytes': self.reachable_bytes,
+                'gap_instructions': self.gap_instructions,
+                'gap_bytes': self.gap_bytes,
+                'undecoded_bytes': self.undecoded_bytes}
+
+
+_flow_kinds = dict()
+
+
+def flow_kind(mnemonic):
+    '''
+    FLOW_CALL, FLOW_JUMP (unconditional), FLOW_BRANCH (conditional),
+    FLOW_STOP (ret, hlt...) or None for instructions that fall through.
+    '''
+    try:
+        return _flow_kinds[mnemonic]
+    except KeyError:
+        pass
+
+    # prefixes ("bnd jmp", "rep ret") come first
+    operation = mnemonic.split()[-1]
+    if operation in ('call', 'lcall'):
+        kind = FLOW_CALL
+    elif operation in _FLOW_JUMPS:
+        kind = FLOW_JUMP
+    elif operation.startswith('j') or operation.startswith('loop'):
+        kind = FLOW_BRANCH
+    elif operation in _FLOW_STOPS:
+        kind = FLOW_STOP
+    else:
+        kind = None
+
+    _flow_kinds[mnemonic] = kind
+    return kind
+
+
+def branch_target(op_str):
+    try:
+        return int(op_str, 16)
+    except ValueError:
+        # indirect branch, the target is a register or memory operand
+        return None
+
+
+def _decode_from(md, code, code_start, address, covered):
+    '''
+    Instructions from `address` until the flow stops, runs into bytes
+    already decoded or leaves the code, with the direct branch and call
+    targets met on the way.
+    '''
+    code_end = code_start + len(code)
+    instructions = []
+    targets = []
+    window_size = _RECURSIVE_WINDOW
+    while address < code_end:
+        offset = address - code_start
+        window = bytes(code[offset:offset + window_size])
+        window_size = min(window_size * 2, _RECURSIVE_WINDOW_MAX)
+
+        next_address = address
+        for (insn_address, size, mnemonic, op_str) in md.disasm_lite(window, address):
+            insn_offset = insn_address - code_start
+            if insn_address + size > code_end or any(covered[insn_offset:insn_offset + size]):
+                return instructions, targets
+
+            covered[insn_offset:insn_offset + size] = b'\x01' * size
+            instructions.append((insn_address, size, mnemonic, op_str))
+            next_address = insn_address + size
+
+            kind = flow_kind(mnemonic)
+            if kind is not None and kind != FLOW_STOP:
+                target = branch_target(op_str)
+                if target is not None:
+                    targets.append(target)
+
+            if kind == FLOW_JUMP or kind == FLOW_STOP:
+                return instructions, targets
+
+        if next_address == address:
+            # invalid bytes
+            return instructions, targets
+        address = next_address
+    return instructions, targets
+
+
+def _sweep_gaps(md, code, code_start, covered):
+    offset = 0
+    while offset < len(code):
+        if covered[offset]:
+            offset = offset + 1
+            continue
+
+        gap_end = covered.find(b'\x01', offset)
+        gap_end = len(code) if gap_end < 0 else gap_end
+
+        next_offset = offset
+        for (address, size, mnemonic, op_str) in md.disasm_lite(bytes(code[offset:gap_end]), code_start + offset):
+            yield (address, size, mnemonic, op_str)
+            next_offset = address - code_start + size
+
+        # skip a byte capstone could not decode, or the rest of the gap
+        offset = next_offset if next_offset > offset else offset + 1
+
+
+def disassemble_recursive(code, code_start, entries, fill_gaps=False, coverage=None):
+    '''
+    Recursive descent over `code` yielding (address, size, mnemonic, op_str)
+    in address order.
+
+    Decoding starts at the `entries` (function symbols, entry point) inside
+    the code and follows fall-through, direct branches and direct calls, so
+    alignment padding and inline data nothing flows into are not decoded.
+    Every byte is decoded at most once. With `fill_gaps` the bytes left over
+    are linearly swept as well. The decoded instructions are held until the
+    descent ends. A DisassemblyCoverage passed as `coverage` is filled in.
+    '''
+    md = capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_64)
+    code_end = code_start + len(code)
+    covered = bytearray(len(code))
+
+    worklist = [entry for entry in set(entries) if code_start <= entry < code_end]
+    heapify(worklist)
+    if coverage is not None:
+        coverage.code_bytes = len(code)
+        coverage.entries = len(worklist)
+
+    instructions = []
+    while worklist:
+        address = heappop(worklist)
+        if covered[address - code_start]:
+            continue
+
+        decoded, targets = _decode_from(md, code, code_start, address, covered)
+        instructions.extend(decoded)
+        for target in targets:
+            if code_start <= target < code_end and not covered[target - code_start]:
+                heappush(worklist, target)
+
+    if coverage is not None:
+        coverage.reachable_instructions = len(instructions)
+        coverage.reachable_bytes = sum(size for (address, size, mnemonic, op_str) in instructions)
+
+    if fill_gaps:
+        gaps = list(_sweep_gaps(md, code, code_start, covered))
+        if coverage is not None:
+            coverage.gap_instructions = len(gaps)
+            coverage.gap_bytes = sum(size for (address, size, mnemonic, op_str) in gaps)
+        instructions.extend(gaps)
+
+    instructions.sort()
+    yield from instructions
@@ -1,10 +1,32 @@
+import os
 from collections import OrderedDict 
 
 import lief
+from logzero import logger
 from lief import ELF
-import capstone as capstone
-from elftools.elf.elffile import ELFFile
 import motex.common.hextools as hextools
+from motex.common.hextools import content_hash
+from motex.common.constants import (
+    _DEFAULT_CHECKPOINT_INTERVAL,
+    _DEFAULT_MEMORY_BUDGET,
+    _DEFAULT_METADATA_KEY,
+    _DEFAULT_INSTRUCTIONS_KEY,
+    _DEFAULT_CALLSITES_KEY,
+    _DEFAULT_BASICBLOCKS_KEY,
+)
+from motex.common.interval import MotexIntervalIndex
+from motex.common.profile import MotexProfiler
+from motex.common.spill import MotexSpillList
+from motex.extractor.binary import MotexBinaryView
+from motex.extractor.cfg import build_basicblocks
+from motex.extractor.checkpoint import ExtractionCheckpoint
+from motex.extractor.disassembler import DisassemblyCoverage, disassemble, disassemble_recursive, _MAX_INSTRUCTION_SIZE
+from motex.extractor.incremental import (
+    ExtractionHashes,
+    IncrementalState,
+    MotexIncrementalStorage,
+    extraction_options,
+)
 
 from motex.core import (
     MotexSymbol,
@@ -14,29 +36,62 @@ from motex.core import (
     MotexInstruction,
     MotexCallsite,
     MotexFunction,
+    MotexBasicblock,
+    MotexStorageSession,
 )
 
-from motex.core.section import MotexSectionStorageHelper
-from motex.core.symbol import MotexSymbolStorageHelper
-from motex.core.segment import MotexSegmentStorageHelper
-from motex.core.relocation import MotexRelocationStorageHelper
-from motex.core.instruction import MotexInstructionStorageHelper
-from motex.core.callsite import MotexCallsiteStorageHelper
-from motex.core.function import MotexFunctionStorageHelper
+
+# rough size of a decoded instruction buffered for the basic blocks of its function
+_REGION_BYTES_PER_INSTRUCTION = 256
 
 
 class ELFExtractor:
-    def __init__(self, binary_path):
+    def __init__(self, binary_path, profiler=None):
         super().__init__()
         self.binary_path = binary_path
-
-        self.binary = lief.parse(binary_path)
-        self.symbols = self._get_symbols()
-        self.sections = self._get_sections()
-        self.relocations = self._get_relocations()
-        self.segments = self._get_segments()
+        self.profiler = profiler or MotexProfiler(enabled=False)
+
+        with self.profiler.phase('parse'):
+            self.binary = lief.parse(binary_path)
+            self.binary_view = MotexBinaryView(binary_path)
+        with self.profiler.phase('read_symbols'):
+            self.symbols = self._get_symbols()
+        with self.profiler.phase('read_sections'):
+            self.sections = self._get_sections()
+        with self.profiler.phase('read_relocations'):
+            self.relocations = self._get_relocations()
+        with self.profiler.phase('read_segments'):
+            self.segments = self._get_segments()
         self.callsites = OrderedDict()
         self.functions = OrderedDict()
+        self.basicblocks = OrderedDict()
+        self.function_ends = dict()
+
+        # streaming extraction state, see _extract_streaming
+        self.streaming = False
+        self.streaming_callsites = False
+        self.streaming_functions = False
+        self.streaming_basicblocks = False
+        self.extract_basicblocks = False
+        self.memory_budget = _DEFAULT_MEMORY_BUDGET
+        self.spill_directory = None
+        self.disassembly = 'linear'
+        self.fill_gaps = False
+        # instruction records decoded again from the binary when read, see MotexLazyInstructions
+        self.lazy_instructions = False
+        self.prev_callsite = None
+        self.prev_function = None
+        self.prev_basicblock = None
+        self.functions_index = None
+        self.basicblocks_index = None
+        # set when a previous extraction of the binary is updated, see _extract
+        self.incremental = None
+        # storage helpers of the running extraction
+        self.session = None
+        # progress of the instruction sweep, see _save_checkpoint
+        self.checkpoint = None
+        # content hash of the binary being extracted, see _get_hashes
+        self.binary_hash = None
 
         self.function_symbols = {v.symbol_value: v for k, v in self.symbols.items() \
                                  if v.symbol_type == 'FUNC' and self.relocations.get(k) is None and v.symbol_value != 0}
@@ -62,7 +117,7 @@ class ELFExtractor:
 
             symbol_dict = {'symbol_num': index,
                            'symbol_index': str(symbol.shndx),
-                           'symbol_value': hextools.int_to_hex(symbol.value),
+                           'symbol_value': symbol.value,
                            'symbol_size': symbol.size,
                            'symbol_type': str(symbol.type).split(".")[-1],
                            'symbol_bind': str(symbol.binding).split(".")[-1],
@@ -79,11 +134,10 @@ class ELFExtractor:
         for index, section in enumerate(self.binary.sections):
             segments_str = " - ".join([str(s.type).split(".")[-1] for s in section.segments])
 
-            section_dict = {'section_index': index,
-                            'section_name': section.name,
+            section_dict = {'section_name': section.name,
                             'section_type': str(section.type).split(".")[-1],
-                            'section_offset': hextools.int_to_hex(section.file_offset),
-                            'section_virtual_address': hextools.int_to_hex(section.virtual_address),
+                            'section_offset': section.file_offset,
+                            'section_virtual_address': section.virtual_address,
                             'section_size': section.size,
                             'section_entry_size': section.entry_size,
                             'section_entropy': abs(section.entropy),
@@ -107,22 +161,21 @@ class ELFExtractor:
             flags_str = "".join(flags_str)
 
             segments_dict = {'segment_type': str(segment.type).split(".")[1],
-                             'segment_offset': hextools.int_to_hex(segment.file_offset),
-                             'segment_virtual_address': hextools.int_to_hex(segment.virtual_address),
+                             'segment_offset': segment.file_offset,
+                             'segment_virtual_address': segment.virtual_address,
                              'segment_virtual_size': segment.virtual_size,
-                             'segment_physical_address': hextools.int_to_hex(segment.physical_address),
+                             'segment_physical_address': segment.physical_address,
                              'segment_physical_size': segment.physical_size,
                              'segment_flags': flags_str,
                              'segment_sections': [section.name for section in segment.sections],
-                             'segment_section_addrs': [hextools.int_to_hex(section.file_offset)
-                                                       for section in segment.sections]}
+                             'segment_section_addrs': [section.file_offset for section in segment.sections]}
 
             segs[str(index)] = (MotexSegment(**segments_dict))
         return segs
 
     def _get_relocations(self):
         plt_section = next(filter(lambda sec: sec[1].section_name == '.plt', self.sections.items()))[1]
-        plt_vma_address = hextools.hex_to_int(plt_section.section_virtual_address)
+        plt_vma_address = plt_section.section_virtual_address
         plt_entry_size = plt_section.section_entry_size
 
         relocs = OrderedDict()
@@ -138,198 +191,678 @@ class ELFExtractor:
                 reloc_type = str(ELF.RELOCATION_AARCH64(relocation.type))
 
             symbol_name = str(relocation.symbol.name) if relocation.has_symbol else ""
-            symbol_value = hextools.int_to_hex(relocation.symbol.value) if relocation.has_symbol else "0"*16
+            symbol_value = relocation.symbol.value if relocation.has_symbol else 0
 
             def reloc_compute(rel_type, rel_addr):
                 pass
 
             relocation_plt_address = plt_vma_address + (index + 1) * plt_entry_size;
 
-            relocation_dict = {'relocation_address': hextools.int_to_hex(relocation.address),
+            relocation_dict = {'relocation_address': relocation.address,
                                'relocation_type': reloc_type,
                                'relocation_symbol_value': symbol_value,
                                'relocation_symbol_name': symbol_name,
-                               'relocation_computed_plt_address': hextools.int_to_hex(relocation_plt_address)}
+                               'relocation_computed_plt_address': relocation_plt_address}
 
             relocs[relocation_dict['relocation_computed_plt_address']] = (MotexRelocation(**relocation_dict))
         return relocs
 
     def _extract_sections(self, storage):
         prev = None
-        MotexSectionStorageHelper.prepare(storage)
+        self.session.sections.prepare(storage)
 
+        interval_index = MotexIntervalIndex()
         for index, current in enumerate(self.sections.items()):
-            MotexSectionStorageHelper.save(index, current[1], prev, storage)
+            self.session.sections.save(index, current[1], prev, storage)
             prev = current[1]
 
-        MotexSectionStorageHelper.complete(storage)
+            start = current[1].section_virtual_address
+            if start != 0:
+                interval_index.add(start, start + current[1].section_size, current[1].get_ordinal())
+
+        self.session.sections.complete(storage)
+        interval_index.save(storage, 'sections')
     
     def _extract_symbols(self, storage):
         prev = None
-        MotexSymbolStorageHelper.prepare(storage)
+        self.session.symbols.prepare(storage)
 
         for index, current in enumerate(self.symbols.items()):
-            MotexSymbolStorageHelper.save(index, current[1], prev, storage)
+            self.session.symbols.save(index, current[1], prev, storage)
             prev = current[1]
 
-        MotexSymbolStorageHelper.complete(storage)
+        self.session.symbols.complete(storage)
 
     def _extract_relocations(self, storage):
         prev = None
-        MotexRelocationStorageHelper.prepare(storage)
+        self.session.relocations.prepare(storage)
 
         for index, current in enumerate(self.relocations.items()):
-            MotexRelocationStorageHelper.save(index, current[1], prev, storage)
+            self.session.relocations.save(index, current[1], prev, storage)
             prev = current[1]
 
-        MotexRelocationStorageHelper.complete(storage)
+        self.session.relocations.complete(storage)
 
     def _extract_segments(self, storage):
         prev = None
-        MotexSegmentStorageHelper.prepare(storage)
+        self.session.segments.prepare(storage)
 
+        interval_index = MotexIntervalIndex()
         for index, current in enumerate(self.segments.items()):
-            MotexSegmentStorageHelper.save(index, current[1], prev, storage)
+            self.session.segments.save(index, current[1], prev, storage)
             prev = current[1]
 
-        MotexSegmentStorageHelper.complete(storage)
+            start = current[1].segment_virtual_address
+            if start != 0:
+                interval_index.add(start, start + current[1].segment_virtual_size, current[1].get_ordinal())
+
+        self.session.segments.complete(storage)
+        interval_index.save(storage, 'segments')
 
     def _extract_callsites(self, storage):
         prev = None
-        MotexCallsiteStorageHelper.prepare(storage)
+        self.session.callsites.prepare(storage)
 
         for index, current in enumerate(self.callsites.items()):
-            MotexCallsiteStorageHelper.save(current[1].address, current[1], prev, storage)
+            self.session.callsites.save(current[1].address, current[1], prev, storage)
             prev = current[1]
 
-        MotexCallsiteStorageHelper.complete(storage)
+        self.session.callsites.complete(storage)
 
     def _extract_functions(self, storage):
         prev = None
-        MotexFunctionStorageHelper.prepare(storage)
+        self.session.functions.prepare(storage)
 
+        interval_index = MotexIntervalIndex()
         for index, current in enumerate(self.functions.items()):
-            MotexFunctionStorageHelper.save(current[1].address, current[1], prev, storage)
+            self.session.functions.save(current[1].address, current[1], prev, storage)
             prev = current[1]
 
-        MotexFunctionStorageHelper.complete(storage)
-
-    def _extract_instructions(self, storage):
-        with open(self.binary_path, 'rb') as bin_file:
-            elf = ELFFile(bin_file)
-            text_code_section = elf.get_section_by_name('.text')
-            text_code_content = text_code_section.data()
-            text_code_entry = text_code_section['sh_addr']
+            start = current[1].address
+            interval_index.add(start, self.function_ends.get(current[1].address, start), current[1].get_ordinal())
+
+        self.session.functions.complete(storage)
+        interval_index.save(storage, 'functions')
+
+    def _open_function(self, fn_sym):
+        function_dict = {'basicblock_leaders': [],
+                         'address': fn_sym.symbol_value,
+                         'name': fn_sym.symbol_name,
+                         'callsites_list': [],
+                         'function_edges': [],
+                         'basicblock_edges': [],
+                         'instructions_ranges': [],
+                         'instructions_count': 0}
+
+        if self.streaming:
+            # the open function is the only record revisited during the sweep
+            budget = self.memory_budget // 4
+            function_dict['callsites_list'] = MotexSpillList(budget, self.spill_directory)
+            function_dict['function_edges'] = MotexSpillList(budget, self.spill_directory)
+        return function_dict
+
+    @staticmethod
+    def _add_function_instruction(function_dict, address, size):
+        ranges = function_dict['instructions_ranges']
+        if ranges and ranges[-1][1] == address:
+            ranges[-1][1] = address + size
+        else:
+            ranges.append([address, address + size])
+        function_dict['instructions_count'] = function_dict['instructions_count'] + 1
+
+    def _close_function(self, function_dict, function_end, storage):
+        if not self.streaming:
+            self.functions[function_dict.get('address')] = MotexFunction(**function_dict)
+            return
+
+        spill_lists = [name for name, value in function_dict.items() if isinstance(value, MotexSpillList)]
+        for name in spill_lists:
+            spilled = function_dict[name]
+            function_dict[name] = spilled.tolist()
+            spilled.close()
+
+        if self.streaming_functions:
+            fn = MotexFunction(**function_dict)
+            self.session.functions.save(fn.address, fn, self.prev_function, storage)
+            self.prev_function = fn
+            self.functions_index.add(fn.address, function_end or fn.address, fn.get_ordinal())
+
+    def _close_callsite(self, callsite_dict, storage):
+        cs = MotexCallsite(**callsite_dict)
+        if not self.streaming:
+            self.callsites[callsite_dict.get('address')] = cs
+            return
+
+        if self.streaming_callsites:
+            self.session.callsites.save(cs.address, cs, self.prev_callsite, storage)
+            self.prev_callsite = cs
+
+    def _close_basicblock(self, basicblock_dict, storage):
+        bb = MotexBasicblock(**basicblock_dict)
+        if not self.streaming:
+            self.basicblocks[bb.address] = bb
+            return
+
+        if self.streaming_basicblocks:
+            self.session.basicblocks.save(bb.address, bb, self.prev_basicblock, storage)
+            self.prev_basicblock = bb
+            self.basicblocks_index.add(bb.address, bb.end_address, bb.get_ordinal())
+
+    def _callsite(self, address, size, op_str, function_dict):
+        callsite_dict = {'address': address,
+                         'return_address': address + size,
+                         'target_resolved': False,
+                         'target_name': op_str,
+                         'target_address': None,
+                         'target_type': None,
+                         'function_address': function_dict.get('address'),
+                         'basicblock_leader': None,}
+        try:
+            target_address = hextools.hex_to_int(op_str)
+            callsite_dict['target_resolved'] = True
+            callsite_dict['target_address'] = target_address
+
+            sym = self.function_symbols.get(callsite_dict['target_address'])
+            if sym:
+                callsite_dict['target_type'] = 'symbol'
+                callsite_dict['target_name'] = sym.symbol_name
+                function_dict['function_edges'].append(sym.symbol_value)
+
+            if target_address in self.relocations.keys():
+                rel_sym = self.relocations[target_address]
+                callsite_dict['target_type'] = 'reloc'
+                callsite_dict['target_name'] = rel_sym.relocation_symbol_name
+        except Exception as e:
+            pass
+
+        if function_dict:
+            function_dict['callsites_list'].append(address)
+        return callsite_dict
+
+    def _flush_region(self, region, function_dict, code, code_start, storage, basicblocks=False):
+        '''
+        Stores the buffered (address, size, mnemonic, op_str) instructions of
+        one function, with their callsites. With `basicblocks` the CFG of the
+        function is built first so that every record knows its block.
+        '''
+        if self.incremental is not None and region and region[-1][2] is None:
+            if self._flush_stored(region, function_dict, storage):
+                return
+        if self.incremental is not None:
+            region = self.incremental.decoded(region)
+
+        graph = None
+        if basicblocks and function_dict and region:
+            graph = build_basicblocks(region)
+            function_dict['basicblock_leaders'] = list(graph.leaders)
+            function_dict['basicblock_edges'] = graph.edges
+            for basicblock_dict in graph.blocks:
+                basicblock_dict['function_address'] = function_dict.get('address')
+                self._close_basicblock(basicblock_dict, storage)
+
+        current_function = function_dict.get('address') if function_dict else None
+        for (address, size, mnemonic, op_str) in region:
+            basicblock_address = None if graph is None else graph.leader_of(address)
+
+            if 'call' in mnemonic:
+                callsite_dict = self._callsite(address, size, op_str, function_dict)
+                callsite_dict['basicblock_leader'] = basicblock_address
+                self._close_callsite(callsite_dict, storage)
+
+            offset = address - code_start
+            instruction_dict = {'address': address,
+                                'function_address': current_function,
+                                'basicblock_address': basicblock_address,
+                                'content': code[offset:offset + size].hex(),
+                                'content_str': [mnemonic, op_str]}
+
+            if current_function:
+                self._add_function_instruction(function_dict, address, size)
+                if self.streaming:
+                    self.function_ends = {current_function: address + size}
+                else:
+                    self.function_ends[current_function] = address + size
+
+            insn = MotexInstruction(**instruction_dict)
+            self.session.instructions.save(address, insn, self.prev_instruction, storage)
+            self.prev_instruction = insn
+
+            if self.instructions_index is not None:
+                self.instructions_index.add(address, address + size, insn.get_ordinal())
+
+    def _flush_stored(self, region, function_dict, storage):
+        '''
+        Takes over the stored records of an unchanged function, handed over
+        by the incremental state, when they keep their ordinals and links.
+        Its callsites are resolved again, the symbols they point to may have
+        changed.
+        '''
+        address = function_dict.get('address') if function_dict else None
+        if address != region[0][0] or any(insn[2] is not None for insn in region):
+            return False
+
+        ordinal = self.session.instructions.count
+        prev = None if self.prev_instruction is None else self.prev_instruction.address
+        if not self.incremental.can_take(address, len(region), ordinal, prev):
+            return False
+
+        stored = self.incremental.take_function(address)
+        function_dict['basicblock_leaders'] = stored.get('basicblock_leaders') or []
+        function_dict['basicblock_edges'] = stored.get('basicblock_edges') or []
+        for basicblock_dict in self.incremental.load_stored(_DEFAULT_BASICBLOCKS_KEY, function_dict['basicblock_leaders']):
+            self._close_basicblock(basicblock_dict, storage)
+
+        for callsite in self.incremental.load_stored(_DEFAULT_CALLSITES_KEY, stored.get('callsites_list') or []):
+            op_str = hex(callsite['target_address']) if callsite['target_resolved'] else callsite['target_name']
+            callsite_dict = self._callsite(callsite['address'], callsite['return_address'] - callsite['address'],
+                                           op_str, function_dict)
+            callsite_dict['basicblock_leader'] = callsite['basicblock_leader']
+            self._close_callsite(callsite_dict, storage)
+
+        for (n, (insn_address, size, _mnemonic, _op_str)) in enumerate(region):
+            self._add_function_instruction(function_dict, insn_address, size)
+            if self.instructions_index is not None:
+                self.instructions_index.add(insn_address, insn_address + size, ordinal + n)
+
+        function_end = region[-1][0] + region[-1][1]
+        if self.streaming:
+            self.function_ends = {address: function_end}
+        else:
+            self.function_ends[address] = function_end
+
+        [last] = self.incremental.load_stored(_DEFAULT_INSTRUCTIONS_KEY, [region[-1][0]])
+        last = MotexInstruction.from_dict(last)
+        self.session.instructions.save_stored([insn[0] for insn in region], last, storage)
+        self.prev_instruction = last
+        return True
+
+    def _get_section(self, name):
+        section = next((section for section in self.sections.values() if section.section_name == name), None)
+        if section is None:
+            raise Exception(f"{self.binary_path} has no {name} section")
+        return section
+
+    def close(self):
+        self.binary_view.close()
+
+    def _get_hashes(self, extract_config):
+        binary_hash = content_hash(self.binary_view.data)
+
+        sections_hashes = dict()
+        for section in self.sections.values():
+            with self.binary_view.section_data(section) as data:
+                sections_hashes[section.section_name] = content_hash(data, section.section_virtual_address)
+
+        functions_hashes = dict()
+        text_code_section = self._get_section('.text')
+        with self.binary_view.section_data(text_code_section) as text_code_content:
+            text_code_entry = text_code_section.section_virtual_address
+            text_code_end = text_code_entry + len(text_code_content)
+
+            starts = sorted(address for address in self.function_symbols.keys()
+                            if text_code_entry <= address < text_code_end)
+            for (start, end) in zip(starts, starts[1:] + [text_code_end]):
+                data = text_code_content[start - text_code_entry:end - text_code_entry + _MAX_INSTRUCTION_SIZE]
+                functions_hashes[str(start)] = content_hash(data, start, end)
+
+        return ExtractionHashes(binary_hash, sections_hashes, functions_hashes, extraction_options(extract_config))
+
+    def _collected(self):
+        '''
+        What the sweep keeps in memory until the end of the extraction, for
+        the journal of the checkpoints.
+        '''
+        if self.streaming:
+            collected = dict()
+            if self.functions_index is not None:
+                collected['functions_index'] = self.functions_index.added()
+            if self.basicblocks_index is not None:
+                collected['basicblocks_index'] = self.basicblocks_index.added()
+            return collected
+
+        return {'functions': self.functions.values(),
+                'callsites': self.callsites.values(),
+                'basicblocks': self.basicblocks.values(),
+                'function_ends': self.function_ends.items(),
+                'instructions_index': self.instructions_index.added()}
+
+    def _save_checkpoint(self, address, storage):
+        '''
+        Called when the function at `address` is about to be opened, so that
+        no function is half swept in a checkpoint.
+        '''
+        state = {'address': address,
+                 'count': self.session.instructions.count,
+                 'instructions': self.session.instructions.checkpoint()}
+        if self.streaming_callsites:
+            state['callsites'] = self.session.callsites.checkpoint()
+        if self.streaming_functions:
+            state['functions'] = self.session.functions.checkpoint()
+        if self.streaming_basicblocks:
+            state['basicblocks'] = self.session.basicblocks.checkpoint()
+
+        with self.profiler.phase('checkpoints'):
+            self.checkpoint.save(storage, state, self._collected())
+        logger.info(f"checkpoint of {self.binary_path} at {address:#x}, {state['count']} instructions extracted")
+
+    def _resume_sweep(self):
+        '''
+        Rebuilds the sweep state of the checkpoint the extraction resumes
+        from and returns the address to resume the sweep at.
+        '''
+        state = self.checkpoint.state
+        journal = self.checkpoint.journal
+
+        self.session.instructions.resume(state['instructions'], MotexInstruction)
+        self.prev_instruction = self.session.instructions.prev_
+        if self.streaming_callsites:
+            self.session.callsites.resume(state['callsites'], MotexCallsite)
+            self.prev_callsite = self.session.callsites.prev_
+        if self.streaming_functions:
+            self.session.functions.resume(state['functions'], MotexFunction)
+            self.prev_function = self.session.functions.prev_
+        if self.streaming_basicblocks:
+            self.session.basicblocks.resume(state['basicblocks'], MotexBasicblock)
+            self.prev_basicblock = self.session.basicblocks.prev_
+
+        for (name, interval_index) in (('instructions_index', self.instructions_index),
+                                       ('functions_index', self.functions_index),
+                                       ('basicblocks_index', self.basicblocks_index)):
+            if interval_index is not None:
+                for (start, end, ordinal) in journal.get(name, []):
+                    interval_index.add(start, end, ordinal)
+
+        if not self.streaming:
+            for (name, record_class) in (('functions', MotexFunction),
+                                         ('callsites', MotexCallsite),
+                                         ('basicblocks', MotexBasicblock)):
+                records = OrderedDict()
+                for data in journal.get(name, []):
+                    records[data['address']] = record_class.from_dict(data)
+                setattr(self, name, records)
+            self.function_ends = {start: end for (start, end) in journal.get('function_ends', [])}
+
+        self.checkpoint.restart(self._collected())
+        return state['address']
+
+    def _extract_instructions(self, storage, workers=1):
+        text_code_section = self._get_section('.text')
+        with self.binary_view.section_data(text_code_section) as text_code_content:
+            text_code_entry = text_code_section.section_virtual_address
+
+            self.prev_instruction = None
+            self.session.instructions.lazy = self.lazy_instructions
+            # streamed instructions are found by bisecting their order pages instead
+            self.instructions_index = None if self.streaming else MotexIntervalIndex()
+            resume_address = None
+            if self.checkpoint is not None and self.checkpoint.state is not None:
+                resume_address = self._resume_sweep()
+            else:
+                self.session.instructions.prepare(storage)
+
+            boundaries = list(self.function_symbols.keys())
+            coverage = None
+            if self.disassembly == 'recursive':
+                coverage = DisassemblyCoverage()
+                decoded = disassemble_recursive(text_code_content, text_code_entry,
+                                                boundaries + [self.binary.entrypoint], self.fill_gaps, coverage)
+                if resume_address is not None:
+                    # the descent is replayed for the coverage, the sorted sweep skips what is stored
+                    decoded = (insn for insn in decoded if insn[0] >= resume_address)
+            elif resume_address is not None:
+                decoded = disassemble(text_code_content[resume_address - text_code_entry:], resume_address,
+                                      [boundary for boundary in boundaries if boundary > resume_address], workers,
+                                      self.memory_budget // 2 if self.streaming else None)
+            else:
+                decoded = disassemble(text_code_content, text_code_entry, boundaries, workers,
+                                      self.memory_budget // 2 if self.streaming else None,
+                                      known=None if self.incremental is None else self.incremental.known)
+
+            decoded = self.profiler.iterate('decode', decoded)
+
+            basicblocks = self.extract_basicblocks
+            # a function is buffered until it closes, for its blocks; streaming
+            # extractions give up on the blocks of functions outgrowing the budget
+            region_limit = self.memory_budget // (4 * _REGION_BYTES_PER_INSTRUCTION) if self.streaming else None
 
-            # function Tracker
             current_function = None
-            current_function_ret = False
             function_dict = dict()
+            region = []
 
-            # Callsite Tracker
-            current_callsite_open = False
-            callsite_dict = dict()
-
-            prev_insn = None
-            MotexInstructionStorageHelper.prepare(storage)
-            md = capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_64)
-
-            for (index, instruction) in enumerate(md.disasm(text_code_content, text_code_entry)):
-                insn_address = hextools.int_to_hex(instruction.address)
-
-                if self.function_symbols.get(insn_address):
+            for (address, size, mnemonic, op_str) in decoded:
+                fn_sym = self.function_symbols.get(address)
+                if fn_sym:
+                    self._flush_region(region, function_dict, text_code_content, text_code_entry, storage, basicblocks)
+                    region = []
                     if current_function:
-                        fn = MotexFunction(**function_dict)
-                        self.functions[function_dict.get('address')] = fn
-
-                    current_function = insn_address
-                    fn_sym = self.function_symbols.get(insn_address)
-                    if fn_sym:
-                        function_dict = {'basicblock_leaders': [],
-                                         'address': fn_sym.symbol_value,
-                                         'name': fn_sym.symbol_name,
-                                         'callsites_list': [],
-                                         'function_edges': [],
-                                         'basicblock_edges': [],
-                                         'instructions_list': []}
-
-                if current_callsite_open:
-                    callsite_dict['return_address'] = insn_address
-                    cs = MotexCallsite(**callsite_dict)
-                    self.callsites[callsite_dict.get('address')] = cs
-
-                    current_callsite_open = False
-                    callsite_dict = dict()
-
-                if 'call' in instruction.mnemonic:
-                    current_callsite_open = True
-                    callsite_dict = {'address': insn_address,
-                                     'target_resolved': False,
-                                     'target_name': instruction.op_str,
-                                     'target_address': None,
-                                     'target_type': None,
-                                     'function_address': current_function,
-                                     'basicblock_leader': None,}
-                    try:
-                        target_address = hextools.hex_to_int(instruction.op_str)
-                        callsite_dict['target_resolved'] = True
-                        callsite_dict['target_address'] = hextools.int_to_hex(target_address)
-
-                        sym = self.function_symbols.get(callsite_dict['target_address'])
-                        if sym:
-                            callsite_dict['target_type'] = 'symbol'
-                            callsite_dict['target_name'] = sym.symbol_name
-                            function_dict['function_edges'].append(sym.symbol_value)
-
-                        if hextools.int_to_hex(target_address) in self.relocations.keys():
-                            rel_sym = self.relocations[hextools.int_to_hex(target_address)]
-                            callsite_dict['target_type'] = 'reloc'
-                            callsite_dict['target_name'] = rel_sym.relocation_symbol_name
-                    except Exception as e:
-                        pass
-
-                    if current_function and not current_function_ret:
-                        function_dict['callsites_list'].append(insn_address)
-
-                instruction_dict = {'address': insn_address,
-                                    'function_address': current_function,
-                                    'basicblock_address': None,
-                                    'content': instruction.bytes.hex(),
-                                    'content_str': [instruction.mnemonic, instruction.op_str]}
-
-                if current_function:
-                    function_dict['instructions_list'].append(insn_address)
-
-                insn = MotexInstruction(**instruction_dict)
-                MotexInstructionStorageHelper.save(insn_address, insn, prev_insn, storage)
-                prev_insn = insn
-
-            MotexInstructionStorageHelper.complete(storage)
+                        self._close_function(function_dict, self.function_ends.get(current_function), storage)
+                    if self.checkpoint is not None and self.checkpoint.due(self.session.instructions.count):
+                        self._save_checkpoint(address, storage)
+
+                    current_function = address
+                    function_dict = self._open_function(fn_sym)
+                    if self.incremental is not None and self.disassembly == 'recursive':
+                        self.incremental.keep(address)
+                    basicblocks = self.extract_basicblocks
+
+                region.append((address, size, mnemonic, op_str))
+                # instructions taken from a previous extraction are buffered per function
+                if current_function is None or (not basicblocks and mnemonic is not None):
+                    self._flush_region(region, function_dict, text_code_content, text_code_entry, storage)
+                    region = []
+                elif basicblocks and region_limit is not None and len(region) > region_limit:
+                    logger.warning(f"{function_dict.get('name')} is too large for the memory budget, "
+                                   f"its basic blocks are not extracted")
+                    self._flush_region(region, function_dict, text_code_content, text_code_entry, storage)
+                    region = []
+                    basicblocks = False
+
+            self._flush_region(region, function_dict, text_code_content, text_code_entry, storage, basicblocks)
+            if current_function:
+                self._close_function(function_dict, self.function_ends.get(current_function), storage)
+
+            self.session.instructions.complete(storage)
+            if self.instructions_index is not None:
+                self.instructions_index.save(storage, 'instructions')
+
+            if self.lazy_instructions:
+                storage.store(_DEFAULT_METADATA_KEY, 'instructions_lazy',
+                              {'binary_path': os.path.abspath(self.binary_path),
+                               'binary_size': len(self.binary_view),
+                               'binary_hash': self.binary_hash,
+                               'code_address': text_code_entry,
+                               'code_offset': text_code_section.section_offset,
+                               'code_size': len(text_code_content)})
+
+            if coverage is not None:
+                storage.store(_DEFAULT_METADATA_KEY, 'instructions_coverage', coverage.to_dict())
 
     def _extract_basicblocks(self, storage):
-        pass
-        
-    def extract(self, extract_config, storage):
-        if extract_config.get('sections') is True:
-            self._extract_sections(storage)
+        prev = None
+        self.session.basicblocks.prepare(storage)
 
-        if extract_config.get('symbols') is True:
-            self._extract_symbols(storage)
+        interval_index = MotexIntervalIndex()
+        for index, current in enumerate(self.basicblocks.items()):
+            self.session.basicblocks.save(current[1].address, current[1], prev, storage)
+            prev = current[1]
 
-        if extract_config.get('segments') is True:
-            self._extract_segments(storage)
+            interval_index.add(current[1].address, current[1].end_address, current[1].get_ordinal())
+
+        self.session.basicblocks.complete(storage)
+        interval_index.save(storage, 'basicblocks')
+
+    def _extract_streaming(self, extract_config, storage):
+        '''
+        Single sweep that writes callsites and functions as soon as they are
+        closed instead of collecting them for the end of the extraction.
+        Decoded chunks and the lists of the open function are held within
+        `memory_budget` bytes, the latter spilling to `spill_directory`.
+        '''
+        self.streaming_callsites = extract_config.get('callsites') is True
+        self.streaming_functions = extract_config.get('functions') is True
+        self.streaming_basicblocks = self.extract_basicblocks
+        # resumed helpers are restored by _resume_sweep instead
+        resumed = self._resumed()
+
+        if self.streaming_callsites:
+            self.prev_callsite = None
+            if not resumed:
+                self.session.callsites.prepare(storage)
+
+        if self.streaming_functions:
+            self.prev_function = None
+            self.functions_index = MotexIntervalIndex()
+            if not resumed:
+                self.session.functions.prepare(storage)
+
+        if self.streaming_basicblocks:
+            self.prev_basicblock = None
+            self.basicblocks_index = MotexIntervalIndex()
+            if not resumed:
+                self.session.basicblocks.prepare(storage)
 
-        if extract_config.get('relocations') is True:
-            self._extract_relocations(storage)
-        
         if extract_config.get('instructions') is True:
-            self._extract_instructions(storage)
-
-        if extract_config.get('callsites') is True:
-            self._extract_callsites(storage)
-
-        if extract_config.get('functions') is True:
-            self._extract_functions(storage)
-
-        if extract_config.get('basicblocks') is True:
-            self._extract_basicblocks(storage) 
+            self._extract_instructions(storage, extract_config.get('workers', 1))
+
+        if self.streaming_callsites:
+            self.session.callsites.complete(storage)
+
+        if self.streaming_functions:
+            self.session.functions.complete(storage)
+            self.functions_index.save(storage, 'functions')
+
+        if self.streaming_basicblocks:
+            self.session.basicblocks.complete(storage)
+            self.basicblocks_index.save(storage, 'basicblocks')
+
+    def extract(self, extract_config, storage, resume=False):
+        with storage.pipeline() as pipeline:
+            self._extract(extract_config, pipeline, resume)
+            with self.profiler.phase('flush'):
+                pipeline.flush()
+
+    def _resumed(self):
+        return self.checkpoint is not None and self.checkpoint.state is not None
+
+    def _extract(self, extract_config, storage, resume=False):
+        '''
+        Hashes of the binary, its sections and functions are stored with the
+        records. With `incremental = true` a binary extracted before with the
+        same options is only extracted again if it changed, and then only
+        the functions whose bytes changed are disassembled again.
+
+        Other extractions store a checkpoint of the instruction sweep every
+        `checkpoint_interval` instructions. With `resume` an interrupted
+        extraction goes on from its last checkpoint, and one that completed
+        is left as it is.
+        '''
+        if extract_config.get('lazy_instructions') is True and extract_config.get('incremental') is True:
+            # incremental extractions take over the stored instruction records
+            raise Exception("lazy instructions are not extracted incrementally")
+
+        self.session = MotexStorageSession()
+        with self.profiler.phase('hashes'):
+            hashes = self._get_hashes(extract_config)
+        self.binary_hash = hashes.binary_hash
+        previous = ExtractionHashes.load(storage)
+        interval = extract_config.get('checkpoint_interval', _DEFAULT_CHECKPOINT_INTERVAL)
+
+        self.checkpoint = None
+        if resume:
+            self.checkpoint = ExtractionCheckpoint.load(storage, interval)
+            if self.checkpoint is None:
+                if previous is not None and previous.binary_hash == hashes.binary_hash and \
+                        previous.options == hashes.options:
+                    logger.info(f"{self.binary_path} was extracted completely, nothing to resume")
+                    return
+                logger.info(f"{self.binary_path} has no checkpoint to resume from, extracting it from the start")
+            elif not self.checkpoint.matches(hashes.binary_hash, hashes.options):
+                raise Exception(f"the checkpoint of {self.binary_path} was taken from another binary "
+                                f"or with other options, it cannot be resumed")
+            else:
+                logger.info(f"resuming the extraction of {self.binary_path} at {self.checkpoint.state['address']:#x}, "
+                            f"{self.checkpoint.state['count']} instructions in")
+
+        self.incremental = None
+        if not self._resumed():
+            if extract_config.get('incremental') is True and IncrementalState.usable(storage, previous, hashes):
+                if previous.binary_hash == hashes.binary_hash:
+                    logger.info(f"{self.binary_path} is unchanged since its last extraction, nothing to extract")
+                    return
+
+                storage = MotexIncrementalStorage(storage)
+                storage.snapshot()
+                self.incremental = IncrementalState(storage, previous, hashes)
+
+            # the stored records stop matching the stored hashes until this extraction completes
+            ExtractionHashes.invalidate(storage)
+            ExtractionCheckpoint.clear(storage)
+            if self.incremental is None:
+                self.checkpoint = ExtractionCheckpoint(interval, hashes.binary_hash, hashes.options)
+
+        self._extract_records(extract_config, storage)
+        self.profiler.count_records(self.session)
+        ExtractionCheckpoint.clear(storage)
+
+        if self.incremental is not None:
+            storage.delete_stale()
+            stats = self.incremental.stats()
+            storage.store(_DEFAULT_METADATA_KEY, 'incremental_stats', stats)
+            logger.info(f"reused {stats['reused_functions']} of {stats['functions']} functions "
+                        f"({stats['reused_instructions']} instructions not disassembled), "
+                        f"{stats['taken_instructions'] + stats['records_unchanged']} records left as stored, "
+                        f"{stats['records_written']} written, {stats['records_deleted']} deleted")
+        hashes.save(storage)
+
+    def _extract_records(self, extract_config, storage):
+        self.streaming = extract_config.get('streaming') is True
+        self.memory_budget = extract_config.get('memory_budget', _DEFAULT_MEMORY_BUDGET)
+        self.spill_directory = extract_config.get('spill_directory')
+
+        self.disassembly = extract_config.get('disassembly', 'linear')
+        self.fill_gaps = extract_config.get('fill_gaps') is True
+        self.lazy_instructions = extract_config.get('lazy_instructions') is True
+        # blocks are built from the instruction sweep, which has to run for them
+        self.extract_basicblocks = extract_config.get('basicblocks') is True
+        if self.extract_basicblocks and extract_config.get('instructions') is not True:
+            raise Exception("basic blocks are only extracted along with the instructions")
+        if self.disassembly not in ('linear', 'recursive'):
+            raise Exception(f"unknown disassembly mode `{self.disassembly}`")
+
+        # records extracted before the instructions are stored by the first checkpoint
+        if not self._resumed():
+            if extract_config.get('sections') is True:
+                with self.profiler.phase('sections'):
+                    self._extract_sections(storage)
+
+            if extract_config.get('symbols') is True:
+                with self.profiler.phase('symbols'):
+                    self._extract_symbols(storage)
+
+            if extract_config.get('segments') is True:
+                with self.profiler.phase('segments'):
+                    self._extract_segments(storage)
+
+            if extract_config.get('relocations') is True:
+                with self.profiler.phase('relocations'):
+                    self._extract_relocations(storage)
+        
+        if self.streaming:
+            with self.profiler.phase('instructions'):
+                self._extract_streaming(extract_config, storage)
+        else:
+            if extract_config.get('instructions') is True:
+                with self.profiler.phase('instructions'):
+                    self._extract_instructions(storage, extract_config.get('workers', 1))
+
+            if extract_config.get('callsites') is True:
+                with self.profiler.phase('callsites'):
+                    self._extract_callsites(storage)
+
+            if extract_config.get('functions') is True:
+                with self.profiler.phase('functions'):
+                    self._extract_functions(storage)
+
+            if self.extract_basicblocks:
+                with self.profiler.phase('basicblocks'):
+                    self._extract_basicblocks(storage) 
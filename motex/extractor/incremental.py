@@ -0,0 +1,305 @@
+from array import array
+from bisect import bisect_left
+
+from motex.common.constants import (
+    _DEFAULT_METADATA_KEY,
+    _DEFAULT_INSTRUCTIONS_KEY,
+    _DEFAULT_CALLSITES_KEY,
+    _DEFAULT_FUNCTIONS_KEY,
+    _DEFAULT_BASICBLOCKS_KEY,
+    _ORDER_KEY_SUFFIX,
+)
+from motex.common.schema import _SCHEMA_VERSION
+
+# kinds an incremental extraction updates in place instead of cleaning them up
+_INCREMENTAL_KINDS = {_DEFAULT_INSTRUCTIONS_KEY: 'instructions',
+                      _DEFAULT_CALLSITES_KEY: 'callsites',
+                      _DEFAULT_FUNCTIONS_KEY: 'functions',
+                      _DEFAULT_BASICBLOCKS_KEY: 'basicblocks'}
+
+# extract options that do not change what is extracted
+_UNSTORED_OPTIONS = ('workers', 'spill_directory', 'incremental', 'checkpoint_interval')
+
+
+def extraction_options(extract_config):
+    return {name: value for name, value in extract_config.items() if name not in _UNSTORED_OPTIONS}
+
+
+def order_ids(storage, records_key, records_name):
+    '''
+    Ids of the stored `records_name`, in their stored order.
+    '''
+    pages = storage.load(_DEFAULT_METADATA_KEY, f'{records_name}_pages') or 0
+    for page in range(pages):
+        yield from storage.load(records_key + _ORDER_KEY_SUFFIX, str(page)) or []
+
+
+def stale_ids(old, new):
+    '''
+    Ids of the ascending `old` missing from the ascending `new`.
+    '''
+    new = iter(new)
+    current = next(new, None)
+    for index in old:
+        while current is not None and current < index:
+            current = next(new, None)
+        if current != index:
+            yield index
+
+
+class ExtractionHashes:
+    '''
+    Content hashes of an extraction: the whole binary, every section and
+    the bytes of every function, from its symbol to the next one (plus the
+    bytes an instruction straddling that end may take). They are stored in
+    the metadata along with the extract options.
+    '''
+    def __init__(self, binary_hash, sections_hashes, functions_hashes, options):
+        self.binary_hash = binary_hash
+        self.sections_hashes = sections_hashes
+        self.functions_hashes = functions_hashes
+        self.options = options
+
+    @classmethod
+    def load(cls, storage):
+        binary_hash = storage.load(_DEFAULT_METADATA_KEY, 'binary_hash')
+        if binary_hash is None:
+            return None
+
+        return cls(binary_hash,
+                   storage.load(_DEFAULT_METADATA_KEY, 'sections_hashes') or dict(),
+                   storage.load(_DEFAULT_METADATA_KEY, 'functions_hashes') or dict(),
+                   storage.load(_DEFAULT_METADATA_KEY, 'extract_options'))
+
+    @staticmethod
+    def invalidate(storage):
+        storage.delete(_DEFAULT_METADATA_KEY, 'binary_hash')
+
+    def save(self, storage):
+        storage.store(_DEFAULT_METADATA_KEY, 'binary_hash', self.binary_hash)
+        storage.store(_DEFAULT_METADATA_KEY, 'sections_hashes', self.sections_hashes)
+        storage.store(_DEFAULT_METADATA_KEY, 'functions_hashes', self.functions_hashes)
+        storage.store(_DEFAULT_METADATA_KEY, 'extract_options', self.options)
+
+
+class MotexIncrementalStorage:
+    '''
+    Storage of an incremental extraction. Records of the incremental kinds
+    are updated in place: cleanups of their keys are ignored, and a stored
+    record registered with `keep` is not written again when the new one is
+    identical. `delete_stale` then removes the records the extraction did not
+    produce again.
+    '''
+    def __init__(self, storage):
+        self.storage = storage
+        self.written = 0
+        self.skipped = 0
+        self.deleted = 0
+        self._kept = dict()
+        self._old_ids = dict()
+
+    def snapshot(self):
+        '''
+        Ids of the stored records, read before the new extraction replaces
+        their order pages.
+        '''
+        for (key, name) in _INCREMENTAL_KINDS.items():
+            self._old_ids[key] = array('Q', order_ids(self.storage, key, name))
+
+    def old_ids(self, key):
+        return self._old_ids.get(key, array('Q'))
+
+    def keep(self, key, field, data):
+        self._kept.setdefault(key, dict())[field] = data
+
+    def store(self, key, field, value):
+        kept = self._kept.get(key)
+        old = None if kept is None else kept.pop(field, None)
+        if old is not None and all(old.get(name) == item for name, item in value.items()):
+            self.skipped = self.skipped + 1
+            return True
+
+        if key in _INCREMENTAL_KINDS:
+            self.written = self.written + 1
+        return self.storage.store(key, field, value)
+
+    def store_many(self, key, mapping):
+        for field, value in mapping.items():
+            self.store(key, field, value)
+        return True
+
+    def load(self, key, field):
+        return self.storage.load(key, field)
+
+    def load_many(self, key, fields):
+        return self.storage.load_many(key, fields)
+
+    def delete(self, key, field):
+        return self.storage.delete(key, field)
+
+    def cleanup(self, key):
+        if key in _INCREMENTAL_KINDS:
+            return True
+        return self.storage.cleanup(key)
+
+    def delete_stale(self):
+        for (key, name) in _INCREMENTAL_KINDS.items():
+            new_ids = order_ids(self.storage, key, name)
+            for index in stale_ids(self._old_ids.get(key, ()), new_ids):
+                self.storage.delete(key, str(index))
+                self.deleted = self.deleted + 1
+        self._kept = dict()
+
+
+class IncrementalState:
+    '''
+    What an incremental extraction reuses from the previous one.
+
+    The stored instructions of every function whose bytes did not change
+    are handed to the sweep as (address, size, None, None), without being
+    disassembled or even read: when they keep their ordinals and neighbours
+    the extractor takes them over as they are stored. Otherwise `decoded`
+    reads them back and the stored records are kept by `storage`, so that
+    only those that differ are rewritten.
+    '''
+    def __init__(self, storage, previous, hashes):
+        self.storage = storage
+        self.unchanged = {int(address) for (address, digest) in hashes.functions_hashes.items()
+                          if previous.functions_hashes.get(address) == digest}
+        self.functions = len(hashes.functions_hashes)
+        self.reused_functions = 0
+        self.reused_instructions = 0
+        self.taken_instructions = 0
+        self.changed_sections = sorted(name for (name, digest) in hashes.sections_hashes.items()
+                                       if previous.sections_hashes.get(name) != digest)
+        # stored records of the functions handed to the sweep
+        self._functions = dict()
+
+    @classmethod
+    def usable(cls, storage, previous, hashes):
+        '''
+        A previous extraction is reused when it stored the same kinds of
+        records, with the same options and schema.
+        '''
+        if previous is None or previous.options != hashes.options:
+            return False
+        version = storage.load(_DEFAULT_METADATA_KEY, 'instructions_schema_version')
+        return version == _SCHEMA_VERSION
+
+    def known(self, start, end):
+        '''
+        (address, size, None, None) of the stored instructions of the unchanged
+        function at `start`, up to `end`, or None when it must be decoded.
+        Sizes follow from the addresses and the instruction ranges of the
+        function.
+        '''
+        if start not in self.unchanged:
+            return None
+
+        old_ids = self.storage.old_ids(_DEFAULT_INSTRUCTIONS_KEY)
+        first = bisect_left(old_ids, start)
+        function = self.storage.load(_DEFAULT_FUNCTIONS_KEY, str(start))
+        if function is None or first >= len(old_ids) or old_ids[first] != start:
+            return None
+
+        ranges = function.get('instructions_ranges') or []
+        instructions = []
+        position = 0
+        for n in range(first, bisect_left(old_ids, end)):
+            address = old_ids[n]
+            while position < len(ranges) and ranges[position][1] <= address:
+                position = position + 1
+            if position >= len(ranges) or address < ranges[position][0]:
+                return None
+
+            next_address = old_ids[n + 1] if n + 1 < len(old_ids) else ranges[position][1]
+            instructions.append((address, min(next_address, ranges[position][1]) - address, None, None))
+
+        self._functions[start] = (function, len(instructions))
+        self.reused_functions = self.reused_functions + 1
+        self.reused_instructions = self.reused_instructions + len(instructions)
+        return instructions
+
+    def keep(self, start):
+        '''
+        Keeps the stored records of the unchanged function at `start` when its
+        instructions are decoded again anyway (recursive descent).
+        '''
+        if start not in self.unchanged:
+            return
+
+        function = self.storage.load(_DEFAULT_FUNCTIONS_KEY, str(start))
+        if function is None:
+            return
+
+        old_ids = self.storage.old_ids(_DEFAULT_INSTRUCTIONS_KEY)
+        first = bisect_left(old_ids, start)
+        last = first + (function.get('instructions_count') or 0)
+        self.load_stored(_DEFAULT_INSTRUCTIONS_KEY, old_ids[first:last])
+        self._keep_function(function)
+
+    def can_take(self, start, count, ordinal, prev):
+        '''
+        Whether the `count` instructions handed over for the function at
+        `start` can be taken over as stored: all of them, with the `ordinal`
+        and the previous instruction `prev` they get now.
+        '''
+        handed = self._functions.get(start)
+        if handed is None or handed[1] != count:
+            return False
+
+        old_ids = self.storage.old_ids(_DEFAULT_INSTRUCTIONS_KEY)
+        first = bisect_left(old_ids, start)
+        return first == ordinal and (old_ids[first - 1] if first > 0 else None) == prev
+
+    def take_function(self, start):
+        '''
+        Stored record of the function at `start`, its instructions taken over.
+        '''
+        (function, count) = self._functions.pop(start)
+        self.taken_instructions = self.taken_instructions + count
+        self.storage.keep(_DEFAULT_FUNCTIONS_KEY, str(start), function)
+        return function
+
+    def load_stored(self, key, ids):
+        '''
+        Stored records with the given ids, kept by the storage.
+        '''
+        fields = [str(index) for index in ids]
+        records = self.storage.load_many(key, fields) if fields else []
+        for (field, data) in zip(fields, records):
+            if data is not None:
+                self.storage.keep(key, field, data)
+        return records
+
+    def _keep_function(self, function):
+        self.storage.keep(_DEFAULT_FUNCTIONS_KEY, str(function['address']), function)
+        self.load_stored(_DEFAULT_CALLSITES_KEY, function.get('callsites_list') or [])
+        self.load_stored(_DEFAULT_BASICBLOCKS_KEY, function.get('basicblock_leaders') or [])
+
+    def decoded(self, region):
+        '''
+        `region` with the instructions taken from the store read back.
+        '''
+        stored = [insn[0] for insn in region if insn[2] is None]
+        if not stored:
+            return region
+
+        records = dict(zip(stored, self.load_stored(_DEFAULT_INSTRUCTIONS_KEY, stored)))
+        for address in stored:
+            handed = self._functions.pop(address, None)
+            if handed is not None:
+                self._keep_function(handed[0])
+
+        return [insn if insn[2] is not None else (insn[0], insn[1]) + tuple(records[insn[0]]['content_str'])
+                for insn in region]
+
+    def stats(self):
+        return {'functions': self.functions,
+                'reused_functions': self.reused_functions,
+                'reused_instructions': self.reused_instructions,
+                'taken_instructions': self.taken_instructions,
+                'changed_sections': self.changed_sections,
+                'records_written': self.storage.written,
+                'records_unchanged': self.storage.skipped,
+                'records_deleted': self.storage.deleted}
@@ -1,10 +1,45 @@
+import copy
+import threading
+
+from motex.common.constants import (
+    _CORPUS_KEY,
+    _DEFAULT_KEY_PREFIX,
+    _DEFAULT_METADATA_KEY,
+    _DEFAULT_NAMESPACE,
+    _ORDER_KEY_SUFFIX,
+    _DEFAULT_ORDER_PAGE_SIZE,
+)
+from motex.common.profile import MotexProfiledBackend, MotexProfiledFormatter
+from motex.common.schema import _SCHEMA_VERSION, record_kind
 from motex.storage.backend import StorageBackend
 from motex.storage.formatter import StorageFormatter
+from motex.storage.cache import MotexStorageCache
+from motex.storage.pages import MotexStoragePages
+from motex.storage.snapshot import write_snapshot
+
+
+_DEFAULT_BATCH_SIZE = 1000
 
 
 class MotexStorage:
-    def __init__(self, storage_backend, storage_format, **kwargs):
+    '''
+    Records are stored under `motex:default:*` keys. A storage opened in
+    another namespace maps them to `motex:<namespace>:*`, so that one backend
+    holds the extractions of many binaries.
+
+    With `pages` (a compression, `zlib` or `lzma`) instruction records are
+    stored in compressed pages of `page_span` addresses, see
+    MotexStoragePages.
+    '''
+    def __init__(self, storage_backend, storage_format, batch_size=None, cache_entries=None, cache_bytes=None,
+                 namespace=None, pages=None, page_span=None, page_cache=None, **kwargs):
+        self._set_namespace(namespace or _DEFAULT_NAMESPACE)
         self.storage_format = storage_format or 'json'
+        self.batch_size = batch_size or _DEFAULT_BATCH_SIZE
+
+        self.cache = None
+        if cache_entries is not None or cache_bytes is not None:
+            self.cache = MotexStorageCache(max_entries=cache_entries, max_bytes=cache_bytes)
 
         if not isinstance(storage_format, str):
             raise Exception("storage formatter must be string")
@@ -14,35 +49,344 @@ class MotexStorage:
 
         self.backend = StorageBackend.get_backend(storage_backend, **kwargs)
         self.formatter = StorageFormatter.get_formatter(storage_format)
+        if self.backend.record_format not in (None, storage_format):
+            raise Exception(f"{storage_backend} backend holds {self.backend.record_format} records, "
+                            f"format must be {self.backend.record_format}")
+
+        self.pages = None
+        if pages:
+            if self.backend.__native_records__:
+                raise Exception(f"backend `{storage_backend}` stores records natively, it cannot store pages")
+            self.pages = MotexStoragePages(pages, page_span, page_cache)
+
+        # helpers read ahead from a background thread
+        self._lock = threading.RLock()
+
+    def _set_namespace(self, namespace):
+        if not isinstance(namespace, str) or not namespace or ':' in namespace:
+            raise Exception(f"invalid namespace {namespace!r}")
+
+        self.namespace = namespace
+        self._key_prefix = f'motex:{namespace}:'
+
+    def _key(self, key):
+        if self._key_prefix == _DEFAULT_KEY_PREFIX or not key.startswith(_DEFAULT_KEY_PREFIX):
+            return key
+        return self._key_prefix + key[len(_DEFAULT_KEY_PREFIX):]
+
+    def in_namespace(self, namespace):
+        '''
+        >>> helpers = MotexHelpers(storage.in_namespace('libc.so.6'))
+
+        The storage of `namespace`, sharing the backend, cache and lock of this
+        one.
+        '''
+        storage = copy.copy(self)
+        storage._set_namespace(namespace)
+        return storage
+
+    def profiled(self, profiler):
+        '''
+        The storage reporting its backend calls and serializations to
+        `profiler`, a MotexProfiler, sharing the cache and lock of this one.
+        '''
+        storage = copy.copy(self)
+        storage.backend = MotexProfiledBackend(self.backend, profiler)
+        storage.formatter = MotexProfiledFormatter(self.formatter, profiler)
+        return storage
+
+    def namespaces(self):
+        '''
+        Namespaces loaded by `motex load --corpus`, in name order.
+        '''
+        return self.load(_CORPUS_KEY, 'namespaces') or []
+
+    def add_namespaces(self, namespaces):
+        with self._lock:
+            self.store(_CORPUS_KEY, 'namespaces', sorted(set(self.namespaces()) | set(namespaces)))
+
+    def _serialize(self, value, kind=None):
+        if self.backend.__native_records__:
+            return value
+        return self.formatter.serialize(value, kind)
+
+    def _deserialize(self, data, kind=None):
+        if data is None or self.backend.__native_records__:
+            return data
+        return self.formatter.deserialize(data, kind)
+
+    def _paged(self, key):
+        return self.pages is not None and record_kind(key) == 'instructions'
 
     def store(self, key, field, value):
-        return self.backend.store(key, field, self.formatter.serialize(value))
+        key = self._key(key)
+        with self._lock:
+            if self.cache is not None:
+                self.cache.invalidate(key, field)
+            if self._paged(key):
+                return self.pages.store_many(self, key, {field: value})
+            return self.backend.store(key, field, self._serialize(value, record_kind(key)))
+
+    def store_many(self, key, mapping):
+        key = self._key(key)
+        with self._lock:
+            if self.cache is not None:
+                for field in mapping.keys():
+                    self.cache.invalidate(key, field)
+            if self._paged(key):
+                return self.pages.store_many(self, key, mapping)
+
+            kind = record_kind(key)
+            serialized = {field: self._serialize(value, kind) for field, value in mapping.items()}
+            return self.backend.store_many(key, serialized)
+
+    def pipeline(self, batch_size=None):
+        '''
+        >>> with storage.pipeline() as pipeline:
+        ...     pipeline.store(key, field, value)
+        '''
+        return MotexStoragePipeline(self, batch_size or self.batch_size)
 
     def load(self, key, field):
-        data = self.backend.load(key, field)
-        if data is None:
-            return None
+        key = self._key(key)
+        with self._lock:
+            if self._paged(key):
+                return self.pages.load_many(self, key, [field])[0]
+            if self.cache is None:
+                return self._deserialize(self.backend.load(key, field), record_kind(key))
+
+            value = self.cache.get(key, field)
+            if value is None:
+                data = self.backend.load(key, field)
+                value = self._deserialize(data, record_kind(key))
+                self.cache.put(key, field, value, self.cache.sizeof(data))
+            return value
+
+    def load_many(self, key, fields):
+        key = self._key(key)
+        with self._lock:
+            # decoded pages are cached by the pages themselves
+            if self._paged(key):
+                return self.pages.load_many(self, key, fields)
+
+            kind = record_kind(key)
+            if self.cache is None:
+                return [self._deserialize(data, kind) for data in self.backend.load_many(key, fields)]
+
+            values = [self.cache.get(key, field) for field in fields]
+            missing = [n for n, value in enumerate(values) if value is None]
+            if missing:
+                for n, data in zip(missing, self.backend.load_many(key, [fields[n] for n in missing])):
+                    values[n] = self._deserialize(data, kind)
+                    self.cache.put(key, fields[n], values[n], self.cache.sizeof(data))
+            return values
+
+    def delete(self, key, field):
+        key = self._key(key)
+        with self._lock:
+            if self.cache is not None:
+                self.cache.invalidate(key, field)
+            if self._paged(key):
+                return self.pages.delete(self, key, field)
+            return self.backend.delete(key, field)
+
+    def fields(self, key):
+        '''
+        Fields stored under `key`, in no particular order.
+        '''
+        key = self._key(key)
+        with self._lock:
+            if self._paged(key):
+                return self.pages.fields(self, key)
+            return self.backend.fields(key)
+
+    def cleanup(self, key):
+        key = self._key(key)
+        with self._lock:
+            if self.cache is not None:
+                self.cache.invalidate_key(key)
+            if self._paged(key):
+                return self.pages.cleanup(self, key)
+            return self.backend.cleanup(key)
+
+    def snapshot(self, path):
+        '''
+        >>> storage.snapshot('test.motex')
+
+        Writes the records of the storage to a snapshot, opened by the
+        `snapshot` backend, see write_snapshot.
+        '''
+        with self._lock:
+            return write_snapshot(self, path)
+
+    def cache_stats(self):
+        return None if self.cache is None else self.cache.stats()
+
+
+class MotexStoragePipeline:
+    '''
+    Buffers writes and hands them to the backend in batches of `batch_size`
+    records through `store_many`. It can be passed anywhere a MotexStorage is
+    expected; reads, deletes and cleanups see the buffered writes.
+    '''
+    def __init__(self, storage, batch_size):
+        self.storage = storage
+        self.batch_size = batch_size
+        self._pending = dict()
+        self._pending_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
         else:
-            return self.formatter.deserialize(self.backend.load(key, field))
+            self.discard()
+
+    def store(self, key, field, value):
+        mapping = self._pending.setdefault(key, dict())
+        if field not in mapping:
+            self._pending_count = self._pending_count + 1
+        mapping[field] = value
+
+        if self._pending_count >= self.batch_size:
+            self.flush()
+        return True
+
+    def store_many(self, key, mapping):
+        for field, value in mapping.items():
+            self.store(key, field, value)
+        return True
+
+    def load(self, key, field):
+        mapping = self._pending.get(key)
+        if mapping is not None and field in mapping:
+            return mapping[field]
+        return self.storage.load(key, field)
+
+    def load_many(self, key, fields):
+        mapping = self._pending.get(key)
+        if not mapping:
+            return self.storage.load_many(key, fields)
+
+        missing = [field for field in fields if field not in mapping]
+        loaded = dict(zip(missing, self.storage.load_many(key, missing))) if missing else dict()
+        return [mapping[field] if field in mapping else loaded[field] for field in fields]
 
     def delete(self, key, field):
-        return self.backend.delete(key, field)
+        mapping = self._pending.get(key)
+        if mapping is not None and mapping.pop(field, None) is not None:
+            self._pending_count = self._pending_count - 1
+        return self.storage.delete(key, field)
 
     def cleanup(self, key):
-        return self.backend.cleanup(key)
+        mapping = self._pending.pop(key, dict())
+        self._pending_count = self._pending_count - len(mapping)
+        return self.storage.cleanup(key)
+
+    def flush(self):
+        for key, mapping in self._pending.items():
+            self.storage.store_many(key, mapping)
+        self.discard()
+
+    def discard(self):
+        self._pending = dict()
+        self._pending_count = 0
 
 
 class MotexStorageTracker:
-    @classmethod
-    def prev_is_nil(cls):
-        if isinstance(cls.prev_, str):
-            return True if cls.prev_ == 'nil' else False
+    '''
+    Besides the prev_/next_ links, storage helpers record the order of the
+    saved ids in pages of _DEFAULT_ORDER_PAGE_SIZE under `<key>:order` so
+    helpers can fetch records in bulk instead of following the links. The
+    position of a record in that order is its `ordinal_`.
+
+    Storage helpers keep the state of one extraction: every extraction saves
+    its records through helpers of its own, see MotexStorageSession.
+    '''
+    _records_key = None
+    _records_name = None
+
+    def __init__(self):
+        self.first = None
+        self.count = 0
+        self.prev_ = None
+
+        self._order = []
+        self._order_pages = 0
+        self._order_index = []
+
+    def _track_prepare(self, storage):
+        self.first = None
+        self.count = 0
+        self.prev_ = None
+
+        self._order = []
+        self._order_pages = 0
+        self._order_index = []
+        storage.cleanup(self._records_key + _ORDER_KEY_SUFFIX)
+
+    def _track(self, storage, index):
+        self._order.append(index)
+        if len(self._order) >= _DEFAULT_ORDER_PAGE_SIZE:
+            self._track_flush(storage)
+
+    def _track_flush(self, storage):
+        if not self._order:
+            return
+
+        storage.store(self._records_key + _ORDER_KEY_SUFFIX, str(self._order_pages), self._order)
+        self._order_index.append(self._order[0])
+        self._order_pages = self._order_pages + 1
+        self._order = []
+
+    def _track_complete(self, storage):
+        self._track_flush(storage)
+
+        field = f'{self._records_name}_pages'
+        storage.store(_DEFAULT_METADATA_KEY, field, self._order_pages)
+
+        field = f'{self._records_name}_page_size'
+        storage.store(_DEFAULT_METADATA_KEY, field, _DEFAULT_ORDER_PAGE_SIZE)
+
+        # first id of every page, lets helpers bisect an address to its ordinal
+        field = f'{self._records_name}_page_index'
+        storage.store(_DEFAULT_METADATA_KEY, field, self._order_index)
+
+        field = f'{self._records_name}_schema_version'
+        storage.store(_DEFAULT_METADATA_KEY, field, _SCHEMA_VERSION)
+
+    def checkpoint(self):
+        '''
+        Linked list state of the helper, see ExtractionCheckpoint. The last
+        record saved is only stored once the next one links to it, so it is
+        part of the state.
+        '''
+        return {'first': self.first,
+                'count': self.count,
+                'prev_': None if self.prev_ is None else self.prev_.to_dict(),
+                'order': list(self._order),
+                'order_pages': self._order_pages,
+                'order_index': list(self._order_index)}
+
+    def resume(self, state, record_class):
+        self.first = state['first']
+        self.count = state['count']
+        self.prev_ = None if state['prev_'] is None else record_class.from_dict(state['prev_'])
+
+        self._order = list(state['order'])
+        self._order_pages = state['order_pages']
+        self._order_index = list(state['order_index'])
+
+    def prev_is_nil(self):
+        if isinstance(self.prev_, str):
+            return True if self.prev_ == 'nil' else False
         else:
             return False
 
-    @classmethod
-    def next_is_nil(cls):
-        if isinstance(cls.next_, str):
-            return True if cls.next_ == 'nil' else False
+    def next_is_nil(self):
+        if isinstance(self.next_, str):
+            return True if self.next_ == 'nil' else False
         else:
             return False
@@ -1,10 +1,29 @@
 from __future__ import absolute_import, print_function
 
 import abc
+import sqlite3
+import simplejson as json
 from vedis import Vedis
 
+try:
+    import redis
+except ImportError:
+    redis = None
+
+import motex.common.hextools as hextools
+from motex.common.schema import record_kind, stored_fields
+
 
 class StorageBackendBase(metaclass=abc.ABCMeta):
+    # backends storing records as typed values get them unserialized
+    __native_records__ = False
+
+    # whether several processes may write to the same database at once
+    concurrent_writers = False
+
+    # format of the records of backends holding them already serialized in one
+    record_format = None
+
     @classmethod
     @abc.abstractproperty
     def __backend_name__(cls):
@@ -26,6 +45,17 @@ class StorageBackendBase(metaclass=abc.ABCMeta):
     def delete(self, key, field):
         raise NotImplementedError()
 
+    def store_many(self, key, mapping):
+        for field, value in mapping.items():
+            self.store(key, field, value)
+        return True
+
+    def load_many(self, key, fields):
+        return [self.load(key, field) for field in fields]
+
+    def fields(self, key):
+        raise NotImplementedError()
+
 
 class StorageBackend(StorageBackendBase):
     backends = dict()
@@ -52,20 +82,67 @@ class StorageBackendVedis(StorageBackend):
         self.database_path = kwargs.get('database_path')
         self.db = Vedis(self.database_path)
 
+    # vedis hash values end at their first NUL byte, and hmset formats its
+    # command with the values and quotes them, so NUL is stored as \x01\x01,
+    # % as \x01\x03, a trailing backslash as \x01\x04 and \x01 as \x01\x02
+    @staticmethod
+    def _escape(value):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if b'\x00' in value or b'\x01' in value or b'%' in value:
+            value = value.replace(b'\x01', b'\x01\x02').replace(b'\x00', b'\x01\x01').replace(b'%', b'\x01\x03')
+        if value.endswith(b'\\'):
+            value = value[:-1] + b'\x01\x04'
+        return value
+
+    @staticmethod
+    def _unescape(value):
+        if value is not None and b'\x01' in value:
+            value = value.replace(b'\x01\x01', b'\x00').replace(b'\x01\x03', b'%').replace(b'\x01\x04', b'\\') \
+                .replace(b'\x01\x02', b'\x01')
+        return value
+
     def store(self, key, field, value):
-        if not all(map(lambda x: isinstance(x, str), [key, field, value])):
-            raise Exception('key, field, value must be string')
+        if not all(map(lambda x: isinstance(x, str), [key, field])):
+            raise Exception('key, field must be string')
+
+        if not isinstance(value, (str, bytes)):
+            raise Exception('value must be string/bytes')
 
         _hash = self.db.Hash(key)
-        _hash[field] = value
+        _hash[field] = self._escape(value)
+        return True
+
+    def store_many(self, key, mapping):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        if not all(map(lambda x: isinstance(x, str), mapping.keys())) or \
+                not all(map(lambda x: isinstance(x, (str, bytes)), mapping.values())):
+            raise Exception('fields must be string, values string/bytes')
+
+        if not mapping:
+            return True
+
+        # no explicit transaction: in a reopened database, an hmset committed by one followed by
+        # the field by field cleanup of another hash leaves the other hashes unreadable
+        self.db.hmset(key, {field: self._escape(value) for field, value in mapping.items()})
         return True
 
+    def load_many(self, key, fields):
+        if not all(map(lambda x: isinstance(x, str), [key, *fields])):
+            raise Exception('key, fields must be string')
+
+        if not fields:
+            return []
+        return [self._unescape(value) for value in self.db.hmget(key, list(fields))]
+
     def load(self, key, field):
         if not all(map(lambda x: isinstance(x, str), [key, field])):
             raise Exception('key, field must be string')
 
         _hash = self.db.Hash(key)
-        return _hash[field]
+        return self._unescape(_hash[field])
 
     def delete(self, key, field):
         if not all(map(lambda x: isinstance(x, str), [key, field])):
@@ -75,6 +152,12 @@ class StorageBackendVedis(StorageBackend):
         del _hash[field]
         return True
 
+    def fields(self, key):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        return [field.decode('utf-8') for field in self.db.Hash(key).keys() or []]
+
     def cleanup(self, key):
         if not isinstance(key, str):
             raise Exception('key must be string')
@@ -88,4 +171,277 @@ class StorageBackendVedis(StorageBackend):
 
 class StorageBackendRedis(StorageBackend):
     __backend_name__ = 'redis'
-    pass
+
+    # fields sent per HSET/HMGET when a bulk call is split over a pipeline
+    chunk_size = 1000
+
+    # connection pools shared by every backend of the process talking to the same server
+    connection_pools = dict()
+
+    concurrent_writers = True
+
+    def __init__(self, **kwargs):
+        if redis is None:
+            raise Exception("Redis backend requires the redis package")
+
+        client = kwargs.get('client')
+        if client is None:
+            client = redis.Redis(connection_pool=self._get_connection_pool(**kwargs))
+
+        self.db = client
+
+    @classmethod
+    def _get_connection_pool(cls, **kwargs):
+        pool_key = (kwargs.get('host', '127.0.0.1'), kwargs.get('port', 6379), kwargs.get('db', 0))
+        pool = cls.connection_pools.get(pool_key)
+        if pool is None:
+            pool = redis.ConnectionPool(host=pool_key[0], port=pool_key[1], db=pool_key[2],
+                                        password=kwargs.get('password'),
+                                        max_connections=kwargs.get('max_connections'))
+            cls.connection_pools[pool_key] = pool
+        return pool
+
+    def store(self, key, field, value):
+        if not all(map(lambda x: isinstance(x, str), [key, field])):
+            raise Exception('key, field must be string')
+
+        if not isinstance(value, (str, bytes)):
+            raise Exception('value must be string/bytes')
+
+        self.db.hset(key, field, value)
+        return True
+
+    def store_many(self, key, mapping):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        items = list(mapping.items())
+        pipeline = self.db.pipeline(transaction=False)
+        for start in range(0, len(items), self.chunk_size):
+            pipeline.hset(key, mapping=dict(items[start:start + self.chunk_size]))
+        pipeline.execute()
+        return True
+
+    def load(self, key, field):
+        if not all(map(lambda x: isinstance(x, str), [key, field])):
+            raise Exception('key, field must be string')
+
+        return self.db.hget(key, field)
+
+    def load_many(self, key, fields):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        fields = list(fields)
+        pipeline = self.db.pipeline(transaction=False)
+        for start in range(0, len(fields), self.chunk_size):
+            pipeline.hmget(key, fields[start:start + self.chunk_size])
+
+        values = []
+        for chunk in pipeline.execute():
+            values.extend(chunk)
+        return values
+
+    def delete(self, key, field):
+        if not all(map(lambda x: isinstance(x, str), [key, field])):
+            raise Exception('key, field must be string')
+
+        self.db.hdel(key, field)
+        return True
+
+    def fields(self, key):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        return [field.decode('utf-8') if isinstance(field, bytes) else field for field in self.db.hkeys(key)]
+
+    def cleanup(self, key):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        self.db.delete(key)
+
+
+class StorageBackendSqlite(StorageBackend):
+    __backend_name__ = 'sqlite'
+    __native_records__ = True
+
+    # variables bound per statement when a bulk read is split
+    chunk_size = 500
+
+    # seconds a writer waits for the database lock held by another process
+    busy_timeout = 60
+
+    indexed_fields = ('address', 'function_address', 'target_name')
+
+    # ids are positions or addresses, older datasets hold them as strings
+    column_types = {'id': '',
+                    'address': 'INTEGER',
+                    'address_list': 'TEXT',
+                    'int': 'INTEGER',
+                    'float': 'REAL',
+                    'bool': 'INTEGER',
+                    'str': 'TEXT',
+                    'hex': 'TEXT',
+                    'list': 'TEXT'}
+
+    def __init__(self, **kwargs):
+        if kwargs is None or kwargs.get('database_path') is None:
+            raise Exception("Sqlite backend requires path argument")
+
+        self.database_path = kwargs.get('database_path')
+        if self.database_path == ':mem:':
+            self.database_path = ':memory:'
+
+        # WAL lets processes extracting other binaries write to the same file in turn
+        self.concurrent_writers = self.database_path != ':memory:'
+        self.db = sqlite3.connect(self.database_path, isolation_level=None, check_same_thread=False,
+                                  timeout=self.busy_timeout)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS hashes (key TEXT, field TEXT, value TEXT, PRIMARY KEY (key, field))')
+        self._tables = set()
+
+    def _table(self, key):
+        kind = record_kind(key)
+        if kind is None or kind in self._tables:
+            return kind
+
+        columns = ', '.join(f'{field} {self.column_types[_type]}' for field, _type in stored_fields(kind))
+        self.db.execute(f'CREATE TABLE IF NOT EXISTS {kind} '
+                        f'(key TEXT, field TEXT, {columns}, extra TEXT, PRIMARY KEY (key, field))')
+
+        # tables created before a field joined the schema
+        existing = set(row[1] for row in self.db.execute(f'PRAGMA table_info({kind})'))
+        for field, _type in stored_fields(kind):
+            if field not in existing:
+                self.db.execute(f'ALTER TABLE {kind} ADD COLUMN {field} {self.column_types[_type]}')
+
+        for field, _type in stored_fields(kind):
+            if field in self.indexed_fields:
+                self.db.execute(f'CREATE INDEX IF NOT EXISTS {kind}_{field} ON {kind} (key, {field})')
+
+        self._tables.add(kind)
+        return kind
+
+    def _encode(self, kind, record):
+        if not isinstance(record, dict):
+            raise Exception(f'{kind} value must be dict')
+
+        row = []
+        for field, _type in stored_fields(kind):
+            value = record.get(field)
+            if value is None:
+                row.append(None)
+            elif _type == 'address':
+                row.append(value if isinstance(value, int) else hextools.hex_to_int(value))
+            elif _type in ('list', 'address_list'):
+                row.append(json.dumps(value))
+            elif _type == 'bool':
+                row.append(int(value))
+            else:
+                row.append(value)
+
+        known = set(field for field, _type in stored_fields(kind))
+        extra = {field: value for field, value in record.items() if field not in known}
+        row.append(json.dumps(extra) if extra else None)
+        return row
+
+    def _decode(self, kind, row):
+        record = dict()
+        for (field, _type), value in zip(stored_fields(kind), row):
+            if value is None:
+                record[field] = None
+            elif _type in ('list', 'address_list'):
+                record[field] = json.loads(value)
+            elif _type == 'bool':
+                record[field] = bool(value)
+            else:
+                record[field] = value
+
+        if row[-1] is not None:
+            record.update(json.loads(row[-1]))
+        return record
+
+    def _insert(self, key, mapping):
+        kind = self._table(key)
+        if kind is None:
+            rows = [(key, field, json.dumps(value)) for field, value in mapping.items()]
+            self.db.executemany('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?)', rows)
+            return
+
+        rows = [[key, field] + self._encode(kind, value) for field, value in mapping.items()]
+        columns = ', '.join(['key', 'field'] + [field for field, _type in stored_fields(kind)] + ['extra'])
+        placeholders = ', '.join(['?'] * (len(stored_fields(kind)) + 3))
+        self.db.executemany(f'INSERT OR REPLACE INTO {kind} ({columns}) VALUES ({placeholders})', rows)
+
+    def _select(self, key, fields):
+        kind = self._table(key)
+        table, columns = ('hashes', 'value') if kind is None else \
+            (kind, ', '.join([field for field, _type in stored_fields(kind)] + ['extra']))
+
+        rows = dict()
+        for start in range(0, len(fields), self.chunk_size):
+            chunk = fields[start:start + self.chunk_size]
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor = self.db.execute(f'SELECT field, {columns} FROM {table} WHERE key = ? AND field IN ({placeholders})',
+                                     [key] + chunk)
+            for row in cursor:
+                rows[row[0]] = json.loads(row[1]) if kind is None else self._decode(kind, row[1:])
+        return rows
+
+    def store(self, key, field, value):
+        if not all(map(lambda x: isinstance(x, str), [key, field])):
+            raise Exception('key, field must be string')
+
+        self._insert(key, {field: value})
+        return True
+
+    def store_many(self, key, mapping):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        self.db.execute('BEGIN')
+        try:
+            self._insert(key, mapping)
+        except Exception:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+        return True
+
+    def load(self, key, field):
+        if not all(map(lambda x: isinstance(x, str), [key, field])):
+            raise Exception('key, field must be string')
+
+        return self._select(key, [field]).get(field)
+
+    def load_many(self, key, fields):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        fields = list(fields)
+        rows = self._select(key, fields)
+        return [rows.get(field) for field in fields]
+
+    def delete(self, key, field):
+        if not all(map(lambda x: isinstance(x, str), [key, field])):
+            raise Exception('key, field must be string')
+
+        table = self._table(key) or 'hashes'
+        self.db.execute(f'DELETE FROM {table} WHERE key = ? AND field = ?', (key, field))
+        return True
+
+    def fields(self, key):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        table = self._table(key) or 'hashes'
+        return [row[0] for row in self.db.execute(f'SELECT field FROM {table} WHERE key = ?', (key,))]
+
+    def cleanup(self, key):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        table = self._table(key) or 'hashes'
+        self.db.execute(f'DELETE FROM {table} WHERE key = ?', (key,))
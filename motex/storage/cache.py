@@ -0,0 +1,83 @@
+import sys
+from collections import OrderedDict
+
+
+class MotexStorageCache:
+    '''
+    Bounded LRU of decoded records keyed by (key, field).
+
+    The bound is a number of entries, an approximate number of bytes (the
+    size of the record as the backend returned it), or both. Cached records
+    are shared between callers and must be treated as read-only.
+    '''
+    def __init__(self, max_entries=None, max_bytes=None):
+        if max_entries is None and max_bytes is None:
+            raise Exception("cache requires max_entries or max_bytes")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._records = OrderedDict()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, item):
+        return item in self._records
+
+    @staticmethod
+    def sizeof(data):
+        if isinstance(data, (str, bytes, bytearray, memoryview)):
+            return len(data)
+        return sys.getsizeof(data)
+
+    def get(self, key, field):
+        entry = self._records.get((key, field))
+        if entry is None:
+            self.misses = self.misses + 1
+            return None
+
+        self._records.move_to_end((key, field))
+        self.hits = self.hits + 1
+        return entry[0]
+
+    def put(self, key, field, value, size=0):
+        if value is None:
+            return
+
+        self.invalidate(key, field)
+        self._records[(key, field)] = (value, size)
+        self.size = self.size + size
+
+        while self._records and self._over_capacity():
+            _, (_, evicted_size) = self._records.popitem(last=False)
+            self.size = self.size - evicted_size
+            self.evictions = self.evictions + 1
+
+    def _over_capacity(self):
+        if self.max_entries is not None and len(self._records) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self.size > self.max_bytes
+
+    def invalidate(self, key, field):
+        entry = self._records.pop((key, field), None)
+        if entry is not None:
+            self.size = self.size - entry[1]
+
+    def invalidate_key(self, key):
+        for item in [item for item in self._records if item[0] == key]:
+            self.invalidate(*item)
+
+    def clear(self):
+        self._records.clear()
+        self.size = 0
+
+    def stats(self):
+        return {'entries': len(self._records),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
@@ -4,6 +4,9 @@ import abc
 import simplejson as json
 import msgpack
 
+from motex.common.record import _make_function
+from motex.common.schema import _ADDRESS_KEYED_KINDS, _RECORD_SCHEMAS, _SCHEMA_VERSION, record_fields
+
 
 class StorageFormatterBase(metaclass=abc.ABCMeta):
     @classmethod
@@ -11,14 +14,16 @@ class StorageFormatterBase(metaclass=abc.ABCMeta):
     def __format_name__(cls):
         raise NotImplementedError()
 
+    # `kind` is the kind of the records stored under the key, see
+    # motex.common.schema, or None for any other value
     @classmethod
     @abc.abstractmethod
-    def serialize(cls, data):
+    def serialize(cls, data, kind=None):
         raise NotImplementedError()
 
     @classmethod
     @abc.abstractmethod
-    def deserialize(cls, data):
+    def deserialize(cls, data, kind=None):
         raise NotImplementedError()
 
 
@@ -41,7 +46,7 @@ class StorageJsonFormatter(StorageFormatter):
     __format_name__ = 'json'
 
     @classmethod
-    def serialize(cls, data):
+    def serialize(cls, data, kind=None):
         if data is None:
             raise ValueError("data must cannot be none")
 
@@ -49,7 +54,7 @@ class StorageJsonFormatter(StorageFormatter):
         return serialized_data
 
     @classmethod
-    def deserialize(cls, data=None):
+    def deserialize(cls, data=None, kind=None):
         if not isinstance(data, (str, bytes)):
             raise ValueError("data must be string/bytes")
 
@@ -58,20 +63,123 @@ class StorageJsonFormatter(StorageFormatter):
 
 
 class StorageMsgpackFormatter(StorageFormatter):
+    '''
+    Values packed as bytes, strings as msgpack str and bytes as msgpack bin,
+    so both come back with their type. Packed values are unpacked from the
+    bytes the backend returns, without decoding them first.
+    '''
     __format_name__ = 'msgpack'
 
     @classmethod
-    def serialize(cls, data):
+    def serialize(cls, data, kind=None):
         if data is None:
             raise ValueError("data must cannot be none")
 
-        serialized_data = msgpack.packb(data)
+        serialized_data = msgpack.packb(data, use_bin_type=True)
         return serialized_data
 
     @classmethod
-    def deserialize(cls, data):
-        if not isinstance(data, str):
-            raise Exception("data must be string")
+    def deserialize(cls, data, kind=None):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise ValueError("data must be bytes")
 
-        deserialized_data = msgpack.unpackb(data.encode("utf-8"), allow_invalid_utf8=True)
+        deserialized_data = msgpack.unpackb(data, raw=False)
         return deserialized_data
+
+
+# first byte of a compact value: a value packed as it is, or a record laid out
+# in the schema version the byte holds
+_COMPACT_VALUE = b'\x00'
+_COMPACT_RECORD = bytes([_SCHEMA_VERSION])
+
+
+def _pack_hex(value):
+    packed = bytes.fromhex(value)
+    if packed.hex() != value:
+        raise ValueError(f"{value} is not lowercase hex")
+    return packed
+
+
+def _compact_codec(kind):
+    '''
+    Generated encoder and decoder of the records of `kind`, between a dict
+    and the list of its field values in schema order. Address-keyed records
+    hold ids and addresses as offsets from their own address, the others
+    hold ids as offsets from their index.
+    '''
+    fields = record_fields(kind)
+    base = 'address' if kind in _ADDRESS_KEYED_KINDS else 'index_'
+    relative = ('id', 'address', 'address_list') if kind in _ADDRESS_KEYED_KINDS else ('id',)
+
+    encoded = []
+    decoded = []
+    for (field, _type) in fields:
+        if field == base or (_type not in relative and _type != 'hex'):
+            encoded.append(f"data['{field}']")
+            decoded.append(f"'{field}': {field}")
+        elif _type == 'hex':
+            encoded.append(f"None if data['{field}'] is None else _pack_hex(data['{field}'])")
+            decoded.append(f"'{field}': None if {field} is None else {field}.hex()")
+        elif _type == 'address_list':
+            encoded.append(f"None if data['{field}'] is None else [item - base for item in data['{field}']]")
+            decoded.append(f"'{field}': None if {field} is None else [item + base for item in {field}]")
+        else:
+            encoded.append(f"None if data['{field}'] is None else data['{field}'] - base")
+            decoded.append(f"'{field}': None if {field} is None else {field} + base")
+
+    # records with fields out of the schema are packed as they are
+    encode = _make_function('encode',
+                            'def encode(data):\n'
+                            f'    if len(data) != {len(fields)}:\n'
+                            '        raise ValueError("record fields do not match the schema")\n'
+                            f"    base = data['{base}']\n"
+                            f"    return [{', '.join(encoded)}]\n",
+                            {'_pack_hex': _pack_hex})
+
+    decode = _make_function('decode',
+                            'def decode(values):\n'
+                            f"    ({''.join(field + ', ' for (field, _type) in fields)}) = values\n"
+                            f'    base = {base}\n'
+                            f"    return {{{', '.join(decoded)}}}\n")
+    return (encode, decode)
+
+
+class StorageCompactFormatter(StorageFormatter):
+    '''
+    Records packed by msgpack as the list of their field values in the order
+    of the current schema, without field names, with addresses as offsets
+    (small integers pack in a byte or two) and instruction bytes as raw
+    bytes. A first byte tells which schema version the list follows. Other
+    values, and records that do not fit their schema (older datasets, extra
+    fields), are packed as they are. Values are bytes.
+    '''
+    __format_name__ = 'compact'
+
+    codecs = {kind: _compact_codec(kind) for kind in _RECORD_SCHEMAS}
+
+    @classmethod
+    def serialize(cls, data, kind=None):
+        if data is None:
+            raise ValueError("data must cannot be none")
+
+        codec = cls.codecs.get(kind)
+        if codec is not None and isinstance(data, dict):
+            try:
+                return _COMPACT_RECORD + msgpack.packb(codec[0](data), use_bin_type=True)
+            except (KeyError, TypeError, ValueError):
+                pass
+        return _COMPACT_VALUE + msgpack.packb(data, use_bin_type=True)
+
+    @classmethod
+    def deserialize(cls, data, kind=None):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise ValueError("data must be bytes")
+
+        values = msgpack.unpackb(memoryview(data)[1:], raw=False)
+        if data[:1] == _COMPACT_VALUE:
+            return values
+
+        codec = cls.codecs.get(kind)
+        if data[:1] != _COMPACT_RECORD or codec is None:
+            raise Exception(f"{kind} record of schema version {data[0]} cannot be read")
+        return codec[1](values)
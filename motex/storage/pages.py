@@ -0,0 +1,103 @@
+import lzma
+import zlib
+
+from motex.common.constants import _DEFAULT_PAGE_CACHE, _DEFAULT_PAGE_SPAN, _PAGES_KEY_SUFFIX
+from motex.storage.cache import MotexStorageCache
+
+# first byte of a stored page, so pages written with another compression stay readable
+_COMPRESSIONS = {'zlib': (b'z', zlib.compress, zlib.decompress),
+                 'lzma': (b'x', lzma.compress, lzma.decompress)}
+
+_DECOMPRESS = {tag: decompress for (tag, _compress, decompress) in _COMPRESSIONS.values()}
+
+
+class MotexStoragePages:
+    '''
+    Records of a key grouped in pages, the page of a record being its id (an
+    address) divided by `span`. A page is the mapping of its fields to their
+    records, serialized by the storage format as one value and compressed,
+    and stored under `<key>:pages`. Records keep their field semantics: a
+    store or delete rewrites the pages of the fields it touches. The last
+    `cache_pages` pages decoded are kept, so reading the records of a page
+    in a row decodes it once.
+    '''
+    def __init__(self, compression, span=None, cache_pages=None):
+        if compression not in _COMPRESSIONS:
+            raise Exception(f"unknown page compression `{compression}`")
+
+        self.compression = compression
+        (self._tag, self._compress, _decompress) = _COMPRESSIONS[compression]
+        self.span = span or _DEFAULT_PAGE_SPAN
+        self.cache = MotexStorageCache(max_entries=cache_pages or _DEFAULT_PAGE_CACHE)
+
+    def _pages(self, fields):
+        pages = dict()
+        for field in fields:
+            pages.setdefault(str(int(field) // self.span), []).append(field)
+        return pages
+
+    def _load_page(self, storage, key, page):
+        records = self.cache.get(key, page)
+        if records is not None:
+            return records
+
+        data = storage.backend.load(key, page)
+        if data is None:
+            return dict()
+
+        records = storage.formatter.deserialize(_DECOMPRESS[data[:1]](memoryview(data)[1:]))
+        self.cache.put(key, page, records)
+        return records
+
+    def _store_page(self, storage, key, page, records):
+        if not records:
+            self.cache.invalidate(key, page)
+            return storage.backend.delete(key, page)
+
+        data = storage.formatter.serialize(records)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        self.cache.put(key, page, records)
+        return storage.backend.store(key, page, self._tag + self._compress(data))
+
+    def store_many(self, storage, key, mapping):
+        key = key + _PAGES_KEY_SUFFIX
+        for (page, fields) in self._pages(mapping.keys()).items():
+            # cached pages are shared, they are replaced rather than updated
+            records = dict(self._load_page(storage, key, page))
+            for field in fields:
+                records[field] = mapping[field]
+            self._store_page(storage, key, page, records)
+        return True
+
+    def load_many(self, storage, key, fields):
+        key = key + _PAGES_KEY_SUFFIX
+        values = dict()
+        for (page, page_fields) in self._pages(fields).items():
+            records = self._load_page(storage, key, page)
+            for field in page_fields:
+                values[field] = records.get(field)
+        return [values[field] for field in fields]
+
+    def delete(self, storage, key, field):
+        key = key + _PAGES_KEY_SUFFIX
+        [page] = self._pages([field]).keys()
+        records = self._load_page(storage, key, page)
+        if field in records:
+            records = dict(records)
+            del records[field]
+            self._store_page(storage, key, page, records)
+        return True
+
+    def fields(self, storage, key):
+        key = key + _PAGES_KEY_SUFFIX
+        fields = []
+        for page in storage.backend.fields(key):
+            fields.extend(self._load_page(storage, key, page).keys())
+        return fields
+
+    def cleanup(self, storage, key):
+        key = key + _PAGES_KEY_SUFFIX
+        self.cache.invalidate_key(key)
+        return storage.backend.cleanup(key)
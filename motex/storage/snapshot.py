@@ -0,0 +1,279 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from motex.common.constants import (
+    _CORPUS_KEY,
+    _DEFAULT_METADATA_KEY,
+    _DEFAULT_SECTIONS_KEY,
+    _DEFAULT_SYMBOLS_KEY,
+    _DEFAULT_SEGMENTS_KEY,
+    _DEFAULT_RELOCATIONS_KEY,
+    _DEFAULT_FUNCTIONS_KEY,
+    _DEFAULT_BASICBLOCKS_KEY,
+    _DEFAULT_CALLSITES_KEY,
+    _DEFAULT_INSTRUCTIONS_KEY,
+    _DEFAULT_INDEX_KEY,
+    _ORDER_KEY_SUFFIX,
+    _LAZY_KEY_SUFFIX,
+)
+from motex.common.schema import record_kind
+from motex.storage.backend import StorageBackend
+
+_SNAPSHOT_MAGIC = b'MOTEXSNP'
+
+_SNAPSHOT_VERSION = 1
+
+# magic, version, byte order of the tables, offset and size of the directory
+_SNAPSHOT_HEADER = struct.Struct('<8sHB5xQQ')
+
+_BYTE_ORDERS = {'little': 0, 'big': 1}
+
+_RECORDS_KEYS = (_DEFAULT_SECTIONS_KEY,
+                 _DEFAULT_SYMBOLS_KEY,
+                 _DEFAULT_SEGMENTS_KEY,
+                 _DEFAULT_RELOCATIONS_KEY,
+                 _DEFAULT_FUNCTIONS_KEY,
+                 _DEFAULT_BASICBLOCKS_KEY,
+                 _DEFAULT_CALLSITES_KEY,
+                 _DEFAULT_INSTRUCTIONS_KEY)
+
+# checkpoints only matter to a load in progress
+_SNAPSHOT_KEYS = (_DEFAULT_METADATA_KEY, _DEFAULT_INDEX_KEY) + _RECORDS_KEYS + \
+    tuple(key + _ORDER_KEY_SUFFIX for key in _RECORDS_KEYS) + \
+    (_DEFAULT_INSTRUCTIONS_KEY + _LAZY_KEY_SUFFIX,)
+
+
+def _int_ids(fields):
+    '''
+    `fields` as sorted ints when they all are non-negative integers written
+    the way str() writes them, None otherwise.
+    '''
+    ids = []
+    for field in fields:
+        try:
+            _id = int(field)
+        except ValueError:
+            return None
+        if _id < 0 or _id >= 1 << 64 or str(_id) != field:
+            return None
+        ids.append(_id)
+    return sorted(ids)
+
+
+def _align(fd):
+    padding = -fd.tell() % 8
+    fd.write(b'\x00' * padding)
+    return fd.tell()
+
+
+def write_snapshot(storage, path):
+    '''
+    >>> write_snapshot(Motex('test.toml').storage, 'test.motex')
+
+    Writes the records of `storage`, in its namespace and the namespaces of
+    its corpus, to a single immutable file read by the snapshot backend:
+
+        header       magic, version, byte order, where the directory is
+        values       the records serialized in the storage format
+        tables       for every key, the sorted ids of its fields when they
+                     are addresses or positions, and the offsets of their
+                     values (one more than the fields, the last one ends
+                     the last value)
+        string pool  the fields of the keys that are not ids (metadata,
+                     indexes), sorted, with their offsets in the pool
+        directory    json, the format and the tables of every key
+
+    The file is written next to `path` and moved there once complete.
+    Returns the number of values written.
+    '''
+    namespaces = [storage.namespace] + [namespace for namespace in storage.namespaces()
+                                        if namespace != storage.namespace]
+    sources = [(storage, _CORPUS_KEY)]
+    for namespace in namespaces:
+        namespace_storage = storage.in_namespace(namespace)
+        sources.extend((namespace_storage, key) for key in _SNAPSHOT_KEYS)
+
+    keys = dict()
+    pool = bytearray()
+    values = 0
+    partial_path = f'{path}.partial'
+    with open(partial_path, 'wb') as fd:
+        fd.write(b'\x00' * _SNAPSHOT_HEADER.size)
+        for (source, key) in sources:
+            fields = source.fields(key)
+            if not fields:
+                continue
+
+            ids = _int_ids(fields)
+            fields = sorted(fields) if ids is None else [str(_id) for _id in ids]
+            kind = record_kind(key)
+            offsets = array('Q')
+            for start in range(0, len(fields), storage.batch_size):
+                for value in source.load_many(key, fields[start:start + storage.batch_size]):
+                    data = storage.formatter.serialize(value, kind)
+                    offsets.append(fd.tell())
+                    fd.write(data.encode('utf-8') if isinstance(data, str) else data)
+            offsets.append(fd.tell())
+            values = values + len(fields)
+
+            table = {'count': len(fields), 'ids': None, 'names': None}
+            if ids is not None:
+                table['ids'] = _align(fd)
+                fd.write(array('Q', ids).tobytes())
+            else:
+                names = array('Q')
+                for field in fields:
+                    names.append(len(pool))
+                    pool.extend(field.encode('utf-8'))
+                names.append(len(pool))
+                table['names'] = _align(fd)
+                fd.write(names.tobytes())
+
+            table['offsets'] = _align(fd)
+            fd.write(offsets.tobytes())
+            keys[source._key(key)] = table
+
+        pool_offset = fd.tell()
+        fd.write(pool)
+        directory = json.dumps({'format': storage.storage_format,
+                                'namespaces': namespaces,
+                                'pool': pool_offset,
+                                'keys': keys}).encode('utf-8')
+        directory_offset = fd.tell()
+        fd.write(directory)
+
+        fd.seek(0)
+        fd.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, _BYTE_ORDERS[sys.byteorder],
+                                       directory_offset, len(directory)))
+
+    os.replace(partial_path, path)
+    return values
+
+
+class StorageBackendSnapshot(StorageBackend):
+    '''
+    Read-only backend over a file written by `write_snapshot`. The file is
+    mapped in memory: opening it reads the header and the directory, the
+    tables of a key are cast in place when the key is first read, and values
+    are views of the mapping, not copies, only decoded by the storage format
+    when loaded. Processes reading the same snapshot share its pages.
+    '''
+    __backend_name__ = 'snapshot'
+
+    def __init__(self, **kwargs):
+        if kwargs is None or kwargs.get('path') is None:
+            raise Exception("Snapshot backend requires path argument")
+
+        self.path = kwargs.get('path')
+        with open(self.path, 'rb') as fd:
+            self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < _SNAPSHOT_HEADER.size:
+            raise Exception(f"{self.path} is not a motex snapshot")
+
+        (magic, version, byte_order, directory_offset, directory_size) = _SNAPSHOT_HEADER.unpack_from(self._map)
+        if magic != _SNAPSHOT_MAGIC:
+            raise Exception(f"{self.path} is not a motex snapshot")
+        if version != _SNAPSHOT_VERSION:
+            raise Exception(f"{self.path} is a version {version} snapshot, expected {_SNAPSHOT_VERSION}")
+        if byte_order != _BYTE_ORDERS[sys.byteorder]:
+            raise Exception(f"{self.path} was written on a machine of another byte order")
+
+        directory = json.loads(self._map[directory_offset:directory_offset + directory_size].decode('utf-8'))
+        self.record_format = directory['format']
+        self.namespaces = directory['namespaces']
+        self._pool = directory['pool']
+        self._keys = directory['keys']
+        self._view = memoryview(self._map)
+        self._tables = dict()
+
+    def _array(self, offset, count):
+        return self._view[offset:offset + 8 * count].cast('Q')
+
+    def _table(self, key):
+        table = self._tables.get(key)
+        if table is not None or key not in self._keys:
+            return table
+
+        entry = self._keys[key]
+        count = entry['count']
+        offsets = self._array(entry['offsets'], count + 1)
+        if entry['ids'] is not None:
+            table = (self._array(entry['ids'], count), None, offsets)
+        else:
+            # keys with fields other than ids are small, their fields are decoded at once
+            names = self._array(entry['names'], count + 1)
+            positions = {self._map[self._pool + names[n]:self._pool + names[n + 1]].decode('utf-8'): n
+                         for n in range(count)}
+            table = (None, positions, offsets)
+
+        self._tables[key] = table
+        return table
+
+    def _position(self, table, field):
+        (ids, positions, _offsets) = table
+        if positions is not None:
+            return positions.get(field)
+
+        try:
+            _id = int(field)
+        except ValueError:
+            return None
+
+        n = bisect_left(ids, _id)
+        return n if n < len(ids) and ids[n] == _id else None
+
+    def _value(self, table, n):
+        if n is None:
+            return None
+
+        offsets = table[2]
+        value = self._view[offsets[n]:offsets[n + 1]]
+        # msgpack and compact values are unpacked in place, json.loads wants bytes
+        return value.tobytes() if self.record_format == 'json' else value
+
+    def load(self, key, field):
+        if not all(map(lambda x: isinstance(x, str), [key, field])):
+            raise Exception('key, field must be string')
+
+        table = self._table(key)
+        if table is None:
+            return None
+        return self._value(table, self._position(table, field))
+
+    def load_many(self, key, fields):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        table = self._table(key)
+        if table is None:
+            return [None] * len(fields)
+        return [self._value(table, self._position(table, field)) for field in fields]
+
+    def fields(self, key):
+        if not isinstance(key, str):
+            raise Exception('key must be string')
+
+        table = self._table(key)
+        if table is None:
+            return []
+
+        (ids, positions, _offsets) = table
+        return list(positions) if positions is not None else [str(_id) for _id in ids]
+
+    def store(self, key, field, value):
+        raise Exception(f"snapshot {self.path} is read-only")
+
+    def store_many(self, key, mapping):
+        raise Exception(f"snapshot {self.path} is read-only")
+
+    def delete(self, key, field):
+        raise Exception(f"snapshot {self.path} is read-only")
+
+    def cleanup(self, key):
+        raise Exception(f"snapshot {self.path} is read-only")
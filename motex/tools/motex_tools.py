@@ -1,19 +1,55 @@
+import os
 import sys
 import argparse
 from pathlib import Path
 from importlib.machinery import SourceFileLoader
+from logzero import logger
 from motex import __version__, Motex, MotexExtractor, MotexHelpers
+from motex.common.profile import MotexProfiler
+from motex.extractor.corpus import load_corpus
 
 
 def command_load(arguments):
+    if arguments.corpus is not None:
+        if arguments.profile is not None:
+            logger.error("--profile profiles the load of a single binary")
+            sys.exit(1)
+
+        load_corpus(arguments.config, arguments.corpus, jobs=arguments.jobs, resume=arguments.resume)
+        return
+
     motex_instance = Motex(arguments.config)
-    extractor = MotexExtractor(motex_instance.motex_config, motex_instance.storage)
-    extractor.extract(motex_instance.extract_config)
+    profiler = None
+    if arguments.profile is not None:
+        profiler = MotexProfiler()
+        profiler.start()
+
+    extractor = MotexExtractor(motex_instance.motex_config, motex_instance.storage, profiler)
+    extractor.extract(motex_instance.extract_config, resume=arguments.resume)
+
+    if profiler is not None:
+        profiler.stop()
+        binary_path = motex_instance.motex_config['binary_path']
+        profiler.save(arguments.profile,
+                      version=__version__,
+                      binary_path=binary_path,
+                      binary_size=os.path.getsize(binary_path),
+                      backend=motex_instance.storage_config['backend'],
+                      format=motex_instance.storage_config['format'],
+                      extract=motex_instance.extract_config)
+        logger.info(f"profile written to {arguments.profile}")
+
+
+def command_snapshot(arguments):
+    motex_instance = Motex(arguments.config)
+    values = motex_instance.storage.snapshot(arguments.output)
+    logger.info(f"{values} values written to {arguments.output} "
+                f"({os.path.getsize(arguments.output)} bytes)")
 
 
 def command_run(arguments):
     motex_instance = Motex(arguments.config)
-    helpers = MotexHelpers(motex_instance.storage)
+    helpers = MotexHelpers(motex_instance.storage, arguments.namespace)
 
     full_module_name = arguments.script
     if not Path(full_module_name).is_file():
@@ -45,11 +81,23 @@ def main():
 
     load_parser = subparsers.add_parser('load')
     load_parser.add_argument('config', help="Path to toml config file")
+    load_parser.add_argument('--corpus', help="Directory of binaries or manifest to load, one namespace per binary")
+    load_parser.add_argument('-j', '--jobs', type=int, help="Binaries of a corpus extracted at once")
+    load_parser.add_argument('--resume', action='store_true',
+                             help="Go on with interrupted extractions from their last checkpoint")
+    load_parser.add_argument('--profile', metavar='REPORT',
+                             help="Write the time, memory and storage calls of each extraction phase to a json file")
     load_parser.set_defaults(func=command_load)
 
+    snapshot_parser = subparsers.add_parser('snapshot')
+    snapshot_parser.add_argument('config', help="Path to toml config file")
+    snapshot_parser.add_argument('output', help="Path of the read-only snapshot file to write (.motex)")
+    snapshot_parser.set_defaults(func=command_snapshot)
+
     run_parser = subparsers.add_parser('run')
     run_parser.add_argument('config', help="Path to toml config file")
     run_parser.add_argument('script', help="Path to script file")
+    run_parser.add_argument('--namespace', help="Namespace of the binary the script runs on")
     run_parser.set_defaults(func=command_run)
 
     args = parser.parse_args()
@@ -0,0 +1,42 @@
+from __future__ import absolute_import, print_function
+
+from motex.common.interval import MotexIntervalIndex
+
+
+def make_index(ranges):
+    index = MotexIntervalIndex()
+    for ordinal, (start, end) in enumerate(ranges):
+        index.add(start, end, ordinal)
+    return index.build()
+
+
+class TestMotexIntervalIndex:
+    def test_interval_index_find(self):
+        index = make_index([(0x10, 0x12), (0x12, 0x15), (0x20, 0x30)])
+        assert index.find(0x10) == 0
+        assert index.find(0x14) == 1
+        assert index.find(0x15) is None
+        assert index.find(0x2f) == 2
+        assert index.find(0x0) is None
+        assert index.ordinals is None
+
+    def test_interval_index_overlapping_ranges(self):
+        index = make_index([(0x2000, 0x2100), (0x1000, 0x9000), (0x1000, 0x1010)])
+        assert index.find(0x1008) == 2
+        assert index.find(0x2050) == 0
+        assert index.find(0x3000) == 1
+        assert index.ordinals is not None
+
+    def test_interval_index_find_many(self):
+        index = make_index([(0x10, 0x12), (0x12, 0x15), (0x20, 0x30)])
+        addresses = [0x25, 0x0, 0x13, 0x10, 0x100, 0x11]
+        assert index.find_many(addresses) == [index.find(address) for address in addresses]
+
+    def test_interval_index_ignores_empty_ranges(self):
+        assert len(make_index([(0x10, 0x10), (0x10, 0x11)])) == 1
+
+    def test_interval_index_roundtrip(self):
+        index = make_index([(0x20, 0x30), (0x10, 0x12)])
+        loaded = MotexIntervalIndex(**index.to_dict())
+        assert loaded.find(0x11) == 1
+        assert loaded.find(0x21) == 0
@@ -0,0 +1,82 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.common.constants import _DEFAULT_METADATA_KEY
+from motex.common.hextools import content_hash
+from motex.core.instruction import MotexInstruction, MotexInstructionHelper, MotexInstructionStorageHelper
+from motex.storage import MotexStorage
+
+CODE_ADDRESS = 0x1000
+
+CODE_OFFSET = 0x40
+
+# spans two order pages
+CODE = [(b'\x90', ['nop', '']),
+        (b'\xb8\x01\x00\x00\x00', ['mov', 'eax, 1']),
+        (b'\xc3', ['ret', ''])] * 400
+
+
+def make_instructions():
+    address = CODE_ADDRESS
+    for (n, (content, content_str)) in enumerate(CODE):
+        yield MotexInstruction(address=address,
+                               function_address=CODE_ADDRESS + 0x100 * (n // 300),
+                               basicblock_address=None if n < 30 else CODE_ADDRESS + 0x10 * (n // 30),
+                               content=content.hex(),
+                               content_str=content_str)
+        address = address + len(content)
+
+
+def make_binary(path):
+    code = b''.join(content for (content, _content_str) in CODE)
+    data = b'\x00' * CODE_OFFSET + code + b'\x00' * 0x40
+    path.write_bytes(data)
+    return {'binary_path': str(path),
+            'binary_size': len(data),
+            'binary_hash': content_hash(data),
+            'code_address': CODE_ADDRESS,
+            'code_offset': CODE_OFFSET,
+            'code_size': len(code)}
+
+
+def load(lazy=None):
+    storage = MotexStorage('vedis', 'json', database_path=':mem:')
+    storage_helper = MotexInstructionStorageHelper()
+    storage_helper.lazy = lazy is not None
+    storage_helper.prepare(storage)
+    for insn in make_instructions():
+        storage_helper.save(insn.address, insn, None, storage)
+    storage_helper.complete(storage)
+    if lazy is not None:
+        storage.store(_DEFAULT_METADATA_KEY, 'instructions_lazy', lazy)
+    return storage
+
+
+class TestMotexLazyInstructions:
+    def test_lazy_records(self, tmp_path):
+        lazy = make_binary(tmp_path / 'binary')
+        storage = load(lazy)
+        assert not storage.fields('motex:default:instructions')
+
+        stored = [insn.to_dict() for insn in MotexInstructionHelper(load()).all()]
+        helper = MotexInstructionHelper(storage)
+        assert [insn.to_dict() for insn in helper.all()] == stored
+        assert [insn.to_dict() for insn in helper.reverse()] == stored[::-1]
+
+        insn = helper.from_int(CODE_ADDRESS + 3)
+        assert insn.address == CODE_ADDRESS + 1 and insn.content_str == ['mov', 'eax, 1']
+        assert helper.get(str(CODE_ADDRESS + 3)).address is None
+
+    def test_changed_binary(self, tmp_path):
+        lazy = make_binary(tmp_path / 'binary')
+        storage = load(lazy)
+        data = (tmp_path / 'binary').read_bytes()
+        # same size, one instruction byte patched
+        (tmp_path / 'binary').write_bytes(data[:CODE_OFFSET] + b'\xc3' + data[CODE_OFFSET + 1:])
+        with pytest.raises(Exception, match='changed since'):
+            MotexInstructionHelper(storage)
+
+        (tmp_path / 'binary').write_bytes(b'\x90')
+        with pytest.raises(Exception, match='changed since'):
+            MotexInstructionHelper(storage)
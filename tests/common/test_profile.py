@@ -0,0 +1,49 @@
+from __future__ import absolute_import, print_function
+
+import json
+
+from motex.common.profile import MotexProfiler
+from motex.core import MotexStorageSession
+from motex.storage import MotexStorage
+
+
+class TestMotexProfiler:
+    def test_phases_add_up(self):
+        profiler = MotexProfiler()
+        for _ in range(3):
+            with profiler.phase('instructions'):
+                assert list(profiler.iterate('decode', range(4))) == [0, 1, 2, 3]
+
+        assert profiler.phases['instructions']['calls'] == 3
+        assert profiler.phases['decode']['calls'] == 12
+        assert profiler.phases['instructions']['wall_seconds'] >= profiler.phases['decode']['wall_seconds']
+
+    def test_disabled_profiler(self):
+        profiler = MotexProfiler(enabled=False)
+        profiler.start()
+        with profiler.phase('instructions'):
+            assert list(profiler.iterate('decode', range(4))) == [0, 1, 2, 3]
+        profiler.stop()
+        assert not profiler.phases and profiler.peak_memory is None
+
+    def test_profiled_storage(self, tmp_path):
+        profiler = MotexProfiler()
+        profiler.start()
+        storage = MotexStorage('vedis', 'json', database_path=':mem:').profiled(profiler)
+        storage.store('motex:default:meta', 'a', [1, 2])
+        storage.store_many('motex:default:meta', {'b': 1, 'c': 2})
+        assert storage.load('motex:default:meta', 'a') == [1, 2]
+
+        profiler.count_records(MotexStorageSession())
+        profiler.stop()
+        assert profiler.peak_memory is not None
+        assert profiler.serialized['values'] == 3
+        assert profiler.serialized['bytes'] == len('[1, 2]') + 2
+        assert profiler.backend_calls['store_many']['records'] == 2
+        assert profiler.backend_calls['load']['calls'] == 1
+
+        path = tmp_path / 'profile.json'
+        profiler.save(str(path), binary_path='t')
+        report = json.loads(path.read_text())
+        assert report['binary_path'] == 't'
+        assert report['records']['instructions'] == 0
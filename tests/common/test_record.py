@@ -0,0 +1,43 @@
+from __future__ import absolute_import, print_function
+
+import pickle
+
+import pytest
+
+from motex.core.instruction import MotexInstruction
+from motex.core.section import MotexSection
+
+TEST_INSTRUCTION = {'prev_': None,
+                    'next_': 0x401001,
+                    'index_': 0x401000,
+                    'ordinal_': 0,
+                    'address': 0x401000,
+                    'function_address': 0x401000,
+                    'basicblock_address': None,
+                    'content': '55',
+                    'content_str': ['push', 'rbp']}
+
+
+class TestMotexRecord:
+    def test_record_roundtrip(self):
+        insn = MotexInstruction.from_dict(TEST_INSTRUCTION)
+        assert insn.to_dict() == TEST_INSTRUCTION
+        assert MotexInstruction(**TEST_INSTRUCTION).to_dict() == TEST_INSTRUCTION
+        assert list(insn.to_dict()) == list(TEST_INSTRUCTION)
+
+    def test_record_slots(self):
+        insn = MotexInstruction(address=0x401000)
+        assert not hasattr(insn, '__dict__')
+        assert insn.get_id() is None and insn.content is None
+        with pytest.raises(AttributeError):
+            insn.extra = 1
+
+    def test_record_fields(self):
+        with pytest.raises(TypeError):
+            MotexInstruction(section_name='.text')
+        # stored records may carry fields the schema no longer knows
+        assert MotexSection.from_dict({'section_name': '.text', 'section_index': 3}).section_name == '.text'
+
+    def test_record_pickle(self):
+        insn = MotexInstruction.from_dict(TEST_INSTRUCTION)
+        assert pickle.loads(pickle.dumps(insn)).to_dict() == TEST_INSTRUCTION
@@ -0,0 +1,25 @@
+from __future__ import absolute_import, print_function
+
+from motex.common.spill import MotexSpillList
+
+
+class TestMotexSpillList:
+    def test_spill_list_in_memory(self):
+        spill = MotexSpillList(1024)
+        for address in range(0x1000, 0x1010):
+            spill.append(address)
+        assert spill.spilled == 0
+        assert spill.tolist() == list(range(0x1000, 0x1010))
+
+    def test_spill_list_spills_in_order(self, tmp_path):
+        spill = MotexSpillList(64, str(tmp_path))
+        for address in range(0x1000, 0x1000 + 100):
+            spill.append(address)
+        assert spill.spilled == 96
+        assert len(spill) == 100
+        assert spill.tolist() == list(range(0x1000, 0x1000 + 100))
+        # iterating does not consume the list
+        assert list(spill) == spill.tolist()
+
+        spill.close()
+        assert len(spill) == 0
@@ -0,0 +1,230 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.common.interval import MotexIntervalIndex
+from motex.storage import MotexStorage
+from motex.core import MotexStorageSession
+from motex.core.instruction import (
+    MotexInstruction,
+    MotexInstructionHelper,
+    MotexInstructionStorageHelper,
+)
+from motex.core.function import (
+    MotexFunction,
+    MotexFunctionHelper,
+    MotexFunctionStorageHelper,
+)
+from motex.core.basicblock import (
+    MotexBasicblock,
+    MotexBasicblockHelper,
+    MotexBasicblockStorageHelper,
+)
+
+# spans two order pages
+TEST_COUNT = 1100
+
+
+def make_instruction(address):
+    return MotexInstruction(address=address,
+                            function_address=None,
+                            basicblock_address=None,
+                            content='90',
+                            content_str=['nop', ''])
+
+
+@pytest.fixture
+def storage():
+    storage = MotexStorage('vedis', 'json', database_path=':mem:')
+    interval_index = MotexIntervalIndex()
+    storage_helper = MotexInstructionStorageHelper()
+    storage_helper.prepare(storage)
+    for address in range(0x1000, 0x1000 + TEST_COUNT):
+        insn = make_instruction(address)
+        storage_helper.save(insn.address, insn, None, storage)
+        interval_index.add(address, address + 1, insn.get_ordinal())
+    storage_helper.complete(storage)
+    interval_index.save(storage, 'instructions')
+    return storage
+
+
+class TestMotexInstructionHelper:
+    def test_helper_count(self, storage):
+        assert MotexInstructionHelper(storage).count == TEST_COUNT
+
+    @pytest.mark.parametrize('batch_size', [None, 1, 7, TEST_COUNT])
+    def test_helper_all_batched(self, storage, batch_size):
+        helper = MotexInstructionHelper(storage)
+        addresses = [insn.address for insn in helper.all(batch_size=batch_size)]
+        assert addresses == list(range(0x1000, 0x1000 + TEST_COUNT))
+
+    def test_helper_batched_matches_linked(self, storage):
+        helper = MotexInstructionHelper(storage)
+        linked = [insn.to_dict() for insn in helper._iter_linked()]
+        assert [insn.to_dict() for insn in helper] == linked
+        assert [insn.to_dict() for insn in helper.reverse(batch_size=3)] == linked[::-1]
+
+    def test_helper_linked_fallback(self, storage):
+        storage.delete('motex:default:meta', 'instructions_pages')
+        helper = MotexInstructionHelper(storage)
+        assert len(list(helper.all())) == TEST_COUNT
+
+    def test_helper_len_getitem(self, storage):
+        helper = MotexInstructionHelper(storage)
+        assert len(helper) == TEST_COUNT
+        assert helper[0].address == 0x1000
+        assert helper[1030].address == 0x1000 + 1030
+        assert helper[-1].get_ordinal() == TEST_COUNT - 1
+        with pytest.raises(IndexError):
+            helper[TEST_COUNT]
+
+    def test_helper_slice(self, storage):
+        helper = MotexInstructionHelper(storage)
+        assert [insn.get_ordinal() for insn in helper[1020:1030]] == list(range(1020, 1030))
+        assert [insn.get_ordinal() for insn in helper[10:0:-5]] == [10, 5]
+
+    def test_helper_between(self, storage):
+        helper = MotexInstructionHelper(storage)
+        between = helper.between(0x1000 + 1020, 0x1000 + 1030)
+        assert [insn.get_ordinal() for insn in between] == list(range(1020, 1030))
+        assert helper.between(0, 0x1000) == []
+        assert len(helper.between(0x1000 + TEST_COUNT - 1, 0x100000)) == 1
+
+    def test_helper_from_int(self, storage):
+        helper = MotexInstructionHelper(storage)
+        assert helper.from_int(0x1000 + 1030).get_ordinal() == 1030
+        assert helper.from_int(0x10) is None
+
+    def test_helper_from_int_without_index(self, storage):
+        # streamed extractions do not index instructions
+        storage.cleanup('motex:default:index')
+        helper = MotexInstructionHelper(storage)
+        assert not helper.has_interval_index()
+        assert helper.has_address_lookup()
+        assert helper.from_int(0x1000 + 1030).get_ordinal() == 1030
+        assert helper.from_int(0x10) is None
+        assert helper.from_int(0x1000 + TEST_COUNT) is None
+        found = helper.containing_many([0x1000 + 1050, 0x10, 0x1000 + 5])
+        assert [None if insn is None else insn.get_ordinal() for insn in found] == [1050, None, 5]
+
+    def test_helper_containing_many(self, storage):
+        helper = MotexInstructionHelper(storage)
+        found = helper.containing_many([0x1000 + 5, 0x10, 0x1000 + 1050, 0x1000 + 5])
+        assert [None if insn is None else insn.get_ordinal() for insn in found] == [5, None, 1050, 5]
+
+
+@pytest.fixture
+def storage_v1():
+    # dataset written before schema version 2: hex string ids and addresses,
+    # no order pages and no schema version in the metadata
+    storage = MotexStorage('vedis', 'json', database_path=':mem:')
+    addresses = ['%016x' % address for address in range(0x1000, 0x1003)]
+    for n, address in enumerate(addresses):
+        storage.store('motex:default:instructions', address,
+                      {'prev_': addresses[n - 1] if n > 0 else None,
+                       'next_': addresses[n + 1] if n + 1 < len(addresses) else None,
+                       'index_': address,
+                       'address': address,
+                       'function_address': addresses[0],
+                       'basicblock_address': None,
+                       'content': '90',
+                       'content_str': ['nop', '']})
+    storage.store('motex:default:meta', 'instructions_first', addresses[0])
+    storage.store('motex:default:meta', 'instructions_last', addresses[-1])
+    storage.store('motex:default:meta', 'instructions_count', len(addresses))
+    return storage
+
+
+class TestMotexInstructionHelperV1:
+    def test_helper_v1_upgraded_on_read(self, storage_v1):
+        helper = MotexInstructionHelper(storage_v1)
+        instructions = list(helper.all())
+        assert [insn.address for insn in instructions] == [0x1000, 0x1001, 0x1002]
+        assert instructions[1].get_prev_id() == 0x1000
+        assert instructions[2].function_address == 0x1000
+
+    def test_helper_v1_get(self, storage_v1):
+        helper = MotexInstructionHelper(storage_v1)
+        assert helper.get(0x1001).address == 0x1001
+        assert helper.get('0000000000001002').address == 0x1002
+
+
+def save_functions(storage, functions):
+    storage_helper = MotexFunctionStorageHelper()
+    storage_helper.prepare(storage)
+    for function in functions:
+        storage_helper.save(function.address, function, None, storage)
+    storage_helper.complete(storage)
+
+
+class TestMotexFunctionHelper:
+    def test_function_instructions_from_ranges(self, storage):
+        save_functions(storage, [MotexFunction(address=0x1000 + 10, name='f',
+                                               instructions_ranges=[[0x1000 + 10, 0x1000 + 20],
+                                                                    [0x1000 + 1020, 0x1000 + 1030]],
+                                               instructions_count=20)])
+
+        function = MotexFunctionHelper(storage).first
+        expected = list(range(0x1000 + 10, 0x1000 + 20)) + list(range(0x1000 + 1020, 0x1000 + 1030))
+        assert len(function.instructions_list) == 20
+        assert function.instructions_list == expected
+        assert function.instructions_list[10] == 0x1000 + 1020
+        assert function.instructions_list[-1] == 0x1000 + 1029
+        assert function.instructions_list[8:12] == expected[8:12]
+        assert [insn.address for insn in function.instructions_list.instructions()] == expected
+        assert 'instructions_list' not in function.to_dict()
+
+    def test_function_instructions_v2(self, storage):
+        # functions stored before schema version 3 list their addresses
+        storage.store('motex:default:functions', str(0x1000),
+                      {'prev_': None, 'next_': None, 'index_': 0x1000, 'ordinal_': 0, 'address': 0x1000,
+                       'name': 'f', 'basicblock_leaders': [], 'function_edges': [], 'callsites_list': [],
+                       'basicblock_edges': [], 'instructions_list': [0x1000, 0x1001]})
+        storage.store('motex:default:meta', 'functions_first', str(0x1000))
+        storage.store('motex:default:meta', 'functions_schema_version', 2)
+
+        function = MotexFunctionHelper(storage).first
+        assert function.instructions_count == 2
+        assert list(function.instructions_list) == [0x1000, 0x1001]
+        assert [insn.address for insn in function.instructions_list.instructions()] == [0x1000, 0x1001]
+
+
+class TestMotexBasicblockHelper:
+    def test_basicblocks(self, storage):
+        storage_helper = MotexBasicblockStorageHelper()
+        storage_helper.prepare(storage)
+        for (address, end_address) in [(0x1000, 0x1004), (0x1004, 0x100b), (0x100b, 0x100d)]:
+            block = MotexBasicblock(address=address, end_address=end_address, function_address=0x1000,
+                                    instructions_count=2, successors=[], predecessors=[])
+            storage_helper.save(block.address, block, None, storage)
+        storage_helper.complete(storage)
+
+        helper = MotexBasicblockHelper(storage)
+        assert helper.count == 3
+        assert [block.address for block in helper] == [0x1000, 0x1004, 0x100b]
+        assert helper.get(0x1004).end_address == 0x100b
+        assert helper.containing(0x100a).address == 0x1004
+        assert helper.containing(0x100d) is None
+
+
+class TestMotexStorageSession:
+    def test_sessions_interleave(self):
+        storage = MotexStorage('vedis', 'json', database_path=':mem:')
+        extractions = [(MotexStorageSession(), storage.in_namespace('a'), range(0x1000, 0x1003)),
+                       (MotexStorageSession(), storage.in_namespace('b'), range(0x2000, 0x2005))]
+        for (session, namespace, _addresses) in extractions:
+            session.instructions.prepare(namespace)
+
+        for n in range(5):
+            for (session, namespace, addresses) in extractions:
+                if n < len(addresses):
+                    insn = make_instruction(addresses[n])
+                    session.instructions.save(insn.address, insn, None, namespace)
+
+        for (session, namespace, addresses) in extractions:
+            session.instructions.complete(namespace)
+
+            helper = MotexInstructionHelper(namespace)
+            assert helper.count == len(addresses)
+            assert [insn.address for insn in helper] == list(addresses)
+            assert [insn.address for insn in helper._iter_linked()] == list(addresses)
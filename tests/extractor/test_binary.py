@@ -0,0 +1,30 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.core.section import MotexSection
+from motex.extractor.binary import MotexBinaryView
+
+
+@pytest.fixture
+def binary_path(tmp_path):
+    path = tmp_path / 'binary'
+    path.write_bytes(bytes(range(16)))
+    return str(path)
+
+
+class TestMotexBinaryView:
+    def test_binary_view_section_data(self, binary_path):
+        with MotexBinaryView(binary_path) as view:
+            text = MotexSection(section_type='PROGBITS', section_offset=4, section_size=3)
+            with view.section_data(text) as data:
+                assert isinstance(data, memoryview)
+                assert bytes(data) == b'\x04\x05\x06'
+
+            bss = MotexSection(section_type='NOBITS', section_offset=4, section_size=0x1000)
+            assert len(view.section_data(bss)) == 0
+
+    def test_binary_view_out_of_range(self, binary_path):
+        with MotexBinaryView(binary_path) as view:
+            with pytest.raises(Exception):
+                view.slice(8, 16)
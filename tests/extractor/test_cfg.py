@@ -0,0 +1,38 @@
+from __future__ import absolute_import, print_function
+
+from motex.extractor.cfg import build_basicblocks
+
+# test eax, eax; je 0x100b; call 0x2000; jmp 0x1000; nop; ret
+TEST_FUNCTION = [(0x1000, 2, 'test', 'eax, eax'),
+                 (0x1002, 2, 'je', '0x100b'),
+                 (0x1004, 5, 'call', '0x2000'),
+                 (0x1009, 2, 'jmp', '0x1000'),
+                 (0x100b, 1, 'nop', ''),
+                 (0x100c, 1, 'ret', '')]
+
+
+class TestBuildBasicblocks:
+    def test_leaders(self):
+        graph = build_basicblocks(TEST_FUNCTION)
+        assert list(graph.leaders) == [0x1000, 0x1004, 0x100b]
+        assert [block['instructions_count'] for block in graph.blocks] == [2, 2, 2]
+        assert [block['end_address'] for block in graph.blocks] == [0x1004, 0x100b, 0x100d]
+
+    def test_edges(self):
+        graph = build_basicblocks(TEST_FUNCTION)
+        assert graph.edges == [[0x1000, 0x100b], [0x1000, 0x1004], [0x1004, 0x1000]]
+        assert [block['successors'] for block in graph.blocks] == [[0x100b, 0x1004], [0x1000], []]
+        assert [block['predecessors'] for block in graph.blocks] == [[0x1004], [0x1000], [0x1000]]
+
+    def test_leader_of(self):
+        graph = build_basicblocks(TEST_FUNCTION)
+        assert graph.leader_of(0x1009) == 0x1004
+        assert graph.leader_of(0x100c) == 0x100b
+        assert graph.leader_of(0xfff) is None
+
+    def test_holes_and_outside_targets(self):
+        graph = build_basicblocks([(0x1000, 1, 'nop', ''),
+                                   (0x1004, 1, 'jne', '0x5000'),
+                                   (0x1005, 1, 'nop', '')])
+        assert list(graph.leaders) == [0x1000, 0x1004, 0x1005]
+        assert graph.edges == [[0x1004, 0x1005]]
@@ -0,0 +1,61 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.core.instruction import MotexInstruction, MotexInstructionHelper, MotexInstructionStorageHelper
+from motex.storage import MotexStorage
+from motex.extractor.checkpoint import ExtractionCheckpoint
+
+
+@pytest.fixture
+def storage():
+    return MotexStorage('vedis', 'json', database_path=':mem:')
+
+
+def test_journal_pages(storage):
+    collected = {'function_ends': [(1, 2)], 'instructions_index': [[1, 2, 0]]}
+    checkpoint = ExtractionCheckpoint(2, 'hash', {'instructions': True})
+    assert not checkpoint.due(1) and checkpoint.due(2)
+
+    checkpoint.save(storage, {'address': 1, 'count': 2}, collected)
+    collected['function_ends'].append((2, 4))
+    checkpoint.save(storage, {'address': 2, 'count': 5}, collected)
+    assert not checkpoint.due(6) and checkpoint.due(7)
+
+    loaded = ExtractionCheckpoint.load(storage, 2)
+    assert loaded.state['address'] == 2 and loaded.state['journal_pages'] == 2
+    assert loaded.journal == {'function_ends': [[1, 2], [2, 4]], 'instructions_index': [[1, 2, 0]]}
+    assert loaded.matches('hash', {'instructions': True})
+    assert not loaded.matches('hash', {'instructions': False})
+
+    ExtractionCheckpoint.clear(storage)
+    assert ExtractionCheckpoint.load(storage, 2) is None
+
+
+def test_interval_zero_disables(storage):
+    assert not ExtractionCheckpoint(0, 'hash', {}).due(1 << 30)
+
+
+def make_instruction(address):
+    return MotexInstruction(address=address,
+                            function_address=None,
+                            basicblock_address=None,
+                            content='90',
+                            content_str=['nop', ''])
+
+
+def test_helper_resume(storage):
+    helper = MotexInstructionStorageHelper()
+    helper.prepare(storage)
+    for address in (1, 2):
+        helper.save(address, make_instruction(address), None, storage)
+
+    # the last instruction saved is only stored once the next one links to it
+    resumed = MotexInstructionStorageHelper()
+    resumed.resume(helper.checkpoint(), MotexInstruction)
+    resumed.save(3, make_instruction(3), None, storage)
+    resumed.complete(storage)
+
+    instructions = list(MotexInstructionHelper(storage).all())
+    assert [insn.address for insn in instructions] == [1, 2, 3]
+    assert [insn.get_ordinal() for insn in instructions] == [0, 1, 2]
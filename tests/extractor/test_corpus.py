@@ -0,0 +1,27 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.extractor.corpus import corpus_binaries
+
+
+def test_corpus_binaries_directory(tmp_path):
+    (tmp_path / 'lib').mkdir()
+    (tmp_path / 'lib' / 'libc.so.6').write_bytes(b'\x7fELF\x02\x01')
+    (tmp_path / 'ls').write_bytes(b'\x7fELF\x02\x01')
+    (tmp_path / 'README').write_text('not a binary')
+
+    assert corpus_binaries(tmp_path) == [('lib/libc.so.6', str(tmp_path / 'lib' / 'libc.so.6')),
+                                         ('ls', str(tmp_path / 'ls'))]
+
+
+def test_corpus_binaries_manifest(tmp_path):
+    manifest = tmp_path / 'corpus.txt'
+    manifest.write_text('# binaries\nbin/ls\n/usr/bin/cat\tcat-8.32\n\n')
+
+    assert corpus_binaries(manifest) == [('bin/ls', str(tmp_path / 'bin' / 'ls')),
+                                         ('cat-8.32', '/usr/bin/cat')]
+
+    manifest.write_text('bin/ls\nls\tbin/ls\n')
+    with pytest.raises(Exception):
+        corpus_binaries(manifest)
@@ -0,0 +1,79 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.extractor.disassembler import (
+    DisassemblyCoverage,
+    disassemble,
+    disassemble_chunk,
+    disassemble_recursive,
+    split_code,
+)
+
+# push rbp; mov rbp, rsp; nop; pop rbp; ret  x 3 functions
+TEST_CODE = b'\x55\x48\x89\xe5\x90\x5d\xc3' * 3
+TEST_BOUNDARIES = [0x1000, 0x1007, 0x100e]
+
+# call 0x100a; ret; nop x 4 (padding); jmp 0x100d; (data byte); ret
+TEST_FLOW_CODE = b'\xe8\x05\x00\x00\x00\xc3' + b'\x90' * 4 + b'\xeb\x01\xff\xc3'
+
+
+class TestSplitCode:
+    def test_split_code_cuts_at_boundaries(self):
+        assert split_code(0x1000, 0x1015, TEST_BOUNDARIES, 3) == [(0x1000, 0x1007), (0x1007, 0x100e), (0x100e, 0x1015)]
+
+    def test_split_code_without_boundaries(self):
+        assert split_code(0x1000, 0x1015, [], 3) == [(0x1000, 0x1015)]
+
+
+class TestDisassemble:
+    def test_disassemble_chunk_stops_at_end(self):
+        chunk = disassemble_chunk(TEST_CODE, 0x1000, 0x1007)
+        assert [insn[0] for insn in chunk.instructions] == [0x1000, 0x1001, 0x1004, 0x1005, 0x1006]
+        assert chunk.next_address == 0x1007
+        assert chunk.stopped is False
+
+    def test_disassemble_chunk_stops_on_invalid_bytes(self):
+        chunk = disassemble_chunk(b'\x90\xff\xff\x90', 0x1000, 0x1004)
+        assert chunk.next_address == 0x1001
+        assert chunk.stopped is True
+
+    @pytest.mark.parametrize('boundaries', [TEST_BOUNDARIES, [0x1002, 0x1009, 0x1010]])
+    def test_disassemble_parallel_matches_serial(self, boundaries):
+        serial = list(disassemble(TEST_CODE, 0x1000))
+        assert list(disassemble(TEST_CODE, 0x1000, boundaries, workers=2)) == serial
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_disassemble_memory_budget_matches_serial(self, workers):
+        serial = list(disassemble(TEST_CODE, 0x1000))
+        # one byte of budget cuts the code at every boundary
+        assert list(disassemble(TEST_CODE, 0x1000, [0x1002, 0x1007, 0x1009, 0x100e], workers, memory_budget=1)) == serial
+
+
+class TestDisassembleRecursive:
+    def test_disassemble_recursive_follows_flow(self):
+        coverage = DisassemblyCoverage()
+        instructions = list(disassemble_recursive(TEST_FLOW_CODE, 0x1000, [0x1000], coverage=coverage))
+        assert [(insn[0], insn[2]) for insn in instructions] == [(0x1000, 'call'), (0x1005, 'ret'),
+                                                                 (0x100a, 'jmp'), (0x100d, 'ret')]
+        assert coverage.reachable_bytes == 9
+        assert coverage.undecoded_bytes == 5
+
+    def test_disassemble_recursive_fill_gaps(self):
+        coverage = DisassemblyCoverage()
+        instructions = list(disassemble_recursive(TEST_FLOW_CODE, 0x1000, [0x1000], fill_gaps=True, coverage=coverage))
+        assert [insn[0] for insn in instructions] == [0x1000, 0x1005, 0x1006, 0x1007, 0x1008, 0x1009, 0x100a, 0x100d]
+        assert coverage.gap_instructions == 4
+        assert coverage.undecoded_bytes == 1
+
+    def test_disassemble_known_ranges(self):
+        swept = list(disassemble(TEST_CODE, 0x1000))
+        stored = [insn for insn in swept if 0x1007 <= insn[0] < 0x100e]
+
+        def known(start, end):
+            return stored if start == 0x1007 else None
+
+        assert list(disassemble(TEST_CODE, 0x1000, TEST_BOUNDARIES, known=known)) == swept
+
+    def test_disassemble_recursive_matches_linear(self):
+        assert list(disassemble_recursive(TEST_CODE, 0x1000, TEST_BOUNDARIES)) == list(disassemble(TEST_CODE, 0x1000))
@@ -0,0 +1,105 @@
+from __future__ import absolute_import, print_function
+
+import shutil
+import subprocess
+
+import pytest
+
+from motex.core import MotexHelpers
+from motex.storage import MotexStorage
+from motex.common.constants import _DEFAULT_INSTRUCTIONS_KEY, _DEFAULT_METADATA_KEY
+from motex.common.hextools import content_hash
+from motex.extractor.elf_extractor import ELFExtractor
+from motex.extractor.incremental import MotexIncrementalStorage, stale_ids
+
+TEST_SOURCE = '''
+int helper(int x) { if (x > 3) return x * 2; return x + 0x11223344; }
+int loop(int n) { int s = 0; for (int i = 0; i < n; i++) s += helper(i); return s; }
+int main(int argc, char **argv) { return loop(argc); }
+'''
+
+TEST_CONFIG = {'sections': True, 'symbols': True, 'segments': True, 'relocations': True,
+               'instructions': True, 'callsites': True, 'functions': True, 'basicblocks': True}
+
+
+@pytest.fixture
+def storage():
+    storage = MotexStorage('vedis', 'json', database_path=':mem:')
+    storage.store(_DEFAULT_INSTRUCTIONS_KEY, '1', {'address': 1, 'content': '90'})
+    storage.store(_DEFAULT_INSTRUCTIONS_KEY, '2', {'address': 2, 'content': 'c3'})
+    storage.store(_DEFAULT_INSTRUCTIONS_KEY + ':order', '0', [1, 2])
+    storage.store(_DEFAULT_METADATA_KEY, 'instructions_pages', 1)
+    return storage
+
+
+def test_content_hash():
+    assert content_hash(b'\x90', 0x1000) == content_hash(b'\x90', 0x1000)
+    assert content_hash(b'\x90', 0x1000) != content_hash(b'\x90', 0x1001)
+
+
+def test_stale_ids():
+    assert list(stale_ids([1, 2, 4, 7], [2, 3, 4, 5])) == [1, 7]
+
+
+class TestMotexIncrementalStorage:
+    def test_keeps_unchanged_records(self, storage):
+        incremental = MotexIncrementalStorage(storage)
+        incremental.keep(_DEFAULT_INSTRUCTIONS_KEY, '1', storage.load(_DEFAULT_INSTRUCTIONS_KEY, '1'))
+        incremental.keep(_DEFAULT_INSTRUCTIONS_KEY, '2', storage.load(_DEFAULT_INSTRUCTIONS_KEY, '2'))
+
+        incremental.store(_DEFAULT_INSTRUCTIONS_KEY, '1', {'address': 1, 'content': '90'})
+        incremental.store(_DEFAULT_INSTRUCTIONS_KEY, '2', {'address': 2, 'content': 'cc'})
+        assert (incremental.skipped, incremental.written) == (1, 1)
+        assert storage.load(_DEFAULT_INSTRUCTIONS_KEY, '2') == {'address': 2, 'content': 'cc'}
+
+    def test_delete_stale(self, storage):
+        incremental = MotexIncrementalStorage(storage)
+        incremental.snapshot()
+
+        incremental.cleanup(_DEFAULT_INSTRUCTIONS_KEY)
+        assert storage.load(_DEFAULT_INSTRUCTIONS_KEY, '1') is not None
+
+        incremental.store(_DEFAULT_INSTRUCTIONS_KEY + ':order', '0', [2])
+        incremental.delete_stale()
+        assert incremental.deleted == 1
+        assert storage.load(_DEFAULT_INSTRUCTIONS_KEY, '1') is None
+        assert storage.load(_DEFAULT_INSTRUCTIONS_KEY, '2') is not None
+
+
+@pytest.fixture
+def binary_path(tmp_path):
+    compiler = shutil.which('cc')
+    if compiler is None:
+        pytest.skip('no C compiler')
+
+    source = tmp_path / 'binary.c'
+    source.write_text(TEST_SOURCE)
+    path = tmp_path / 'binary'
+    subprocess.run([compiler, '-O1', '-fno-inline', '-o', str(path), str(source)], check=True)
+    return path
+
+
+def load(binary_path, database_path, incremental=False):
+    storage = MotexStorage('vedis', 'json', database_path=str(database_path))
+    ELFExtractor(str(binary_path)).extract(dict(TEST_CONFIG, incremental=incremental), storage)
+
+    this = MotexHelpers(storage)
+    records = {name: [record.to_dict() for record in getattr(this, name).all()]
+               for name in ('sections', 'symbols', 'segments', 'relocations',
+                            'instructions', 'callsites', 'functions', 'basicblocks')}
+    stats = storage.load(_DEFAULT_METADATA_KEY, 'incremental_stats')
+    storage.backend.db.close()
+    return (records, stats)
+
+
+def test_incremental_reload(binary_path, tmp_path):
+    load(binary_path, tmp_path / 'test.db', incremental=True)
+
+    # 1-byte patch of the constant of helper
+    data = binary_path.read_bytes()
+    assert data.count(bytes.fromhex('44332211')) == 1
+    binary_path.write_bytes(data.replace(bytes.fromhex('44332211'), bytes.fromhex('45332211')))
+
+    (records, stats) = load(binary_path, tmp_path / 'test.db', incremental=True)
+    assert stats['reused_functions'] > 0 and stats['functions'] > stats['reused_functions']
+    assert records == load(binary_path, tmp_path / 'fresh.db')[0]
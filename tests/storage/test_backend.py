@@ -6,16 +6,20 @@ from motex.storage.backend import (
     StorageBackend,
     StorageBackendVedis,
     StorageBackendRedis,
+    StorageBackendSqlite,
 )
+from motex.storage.snapshot import StorageBackendSnapshot
 
 
 class TestStorageBackend:
     def test_storage_backend_len(self):
         test_data = [1, 2, 3]
-        assert len(StorageBackend.backends.items()) == 2
+        assert len(StorageBackend.backends.items()) == 4
 
     def test_storage_backend_keys(self):
         assert StorageBackend.backends.get('vedis') is not None
+        assert StorageBackend.backends.get('sqlite') is not None
+        assert StorageBackend.backends.get('snapshot') is StorageBackendSnapshot
         assert StorageBackend.backends.get('invalid_backend_key') is None
 
 
@@ -41,7 +45,121 @@ class TestStorageBackendVedis:
     def test_backend_vedis_delete(self):
         pass
 
+    def test_backend_vedis_store_many(self):
+        backend = StorageBackendVedis(database_path=':mem:')
+        assert backend.store_many('key', {'a': '1', 'b': '2'})
+        assert backend.load('key', 'a') == b'1'
+        assert backend.load('key', 'b') == b'2'
+
+    def test_backend_vedis_load_many(self):
+        backend = StorageBackendVedis(database_path=':mem:')
+        backend.store_many('key', {'a': '1', 'b': '2'})
+        assert backend.load_many('key', ['b', 'missing', 'a']) == [b'2', None, b'1']
+
+    def test_backend_vedis_fields(self):
+        backend = StorageBackendVedis(database_path=':mem:')
+        backend.store_many('key', {'a': '1', 'b': '2'})
+        assert sorted(backend.fields('key')) == ['a', 'b']
+        assert backend.fields('missing') == []
+
+    def test_backend_vedis_bytes(self):
+        backend = StorageBackendVedis(database_path=':mem:')
+        values = {'a': b'\x00\x01\x01\x02', 'b': b'\x01\x00%\x01\x03', 'c': bytes(range(256)), 'e': '100%s',
+                  'f': b'\\\x01\\'}
+        backend.store_many('key', values)
+        backend.store('key', 'd', b'a\x00b')
+        assert backend.load_many('key', ['a', 'b', 'c', 'e', 'f']) == [b'\x00\x01\x01\x02', b'\x01\x00%\x01\x03',
+                                                                       bytes(range(256)), b'100%s', b'\\\x01\\']
+        assert backend.load('key', 'd') == b'a\x00b'
+
+    def test_backend_vedis_store_many_invalid_arguments(self):
+        backend = StorageBackendVedis(database_path=':mem:')
+        with pytest.raises(Exception) as e:
+            backend.store_many('key', {'a': 1})
+        assert str(e.value) == 'fields must be string, values string/bytes'
+
+
+@pytest.fixture
+def redis_backend():
+    fakeredis = pytest.importorskip('fakeredis')
+    return StorageBackendRedis(client=fakeredis.FakeRedis())
+
 
 class TestStorageBackendRedis:
     def test_backend_redis_name(self):
         assert StorageBackendRedis.__backend_name__ == 'redis'
+
+    def test_backend_redis_store_load(self, redis_backend):
+        assert redis_backend.store('key', 'a', '1')
+        assert redis_backend.load('key', 'a') == b'1'
+        assert redis_backend.load('key', 'missing') is None
+
+    def test_backend_redis_delete(self, redis_backend):
+        redis_backend.store('key', 'a', '1')
+        assert redis_backend.delete('key', 'a')
+        assert redis_backend.load('key', 'a') is None
+
+    def test_backend_redis_store_many_load_many(self, redis_backend):
+        redis_backend.chunk_size = 2
+        mapping = {str(i): str(i * 2) for i in range(5)}
+        assert redis_backend.store_many('key', mapping)
+        assert redis_backend.load_many('key', ['0', '4', 'missing']) == [b'0', b'8', None]
+
+    def test_backend_redis_cleanup(self, redis_backend):
+        redis_backend.store_many('key', {'a': '1', 'b': '2'})
+        redis_backend.cleanup('key')
+        assert redis_backend.load_many('key', ['a', 'b']) == [None, None]
+
+    def test_backend_redis_fields(self, redis_backend):
+        redis_backend.store_many('key', {'a': '1', 'b': '2'})
+        assert sorted(redis_backend.fields('key')) == ['a', 'b']
+
+
+TEST_INSTRUCTION = {'prev_': None,
+                    'next_': 0x401001,
+                    'index_': 0x401000,
+                    'ordinal_': 0,
+                    'address': 0x401000,
+                    'function_address': 0x401000,
+                    'basicblock_address': None,
+                    'content': '55',
+                    'content_str': ['push', 'rbp']}
+
+
+@pytest.fixture
+def sqlite_backend():
+    return StorageBackendSqlite(database_path=':mem:')
+
+
+class TestStorageBackendSqlite:
+    def test_backend_sqlite_name(self):
+        assert StorageBackendSqlite.__backend_name__ == 'sqlite'
+        assert StorageBackendSqlite.__native_records__ is True
+
+    def test_backend_sqlite_init_invalid_arguments(self):
+        with pytest.raises(Exception) as e:
+            assert StorageBackendSqlite()
+        assert str(e.value) == "Sqlite backend requires path argument"
+
+    def test_backend_sqlite_record_roundtrip(self, sqlite_backend):
+        key = 'motex:default:instructions'
+        assert sqlite_backend.store(key, str(TEST_INSTRUCTION['index_']), TEST_INSTRUCTION)
+        assert sqlite_backend.load(key, str(TEST_INSTRUCTION['index_'])) == TEST_INSTRUCTION
+
+        row = sqlite_backend.db.execute('SELECT address, content_str FROM instructions').fetchone()
+        assert row == (0x401000, '["push", "rbp"]')
+
+    def test_backend_sqlite_metadata(self, sqlite_backend):
+        key = 'motex:default:meta'
+        assert sqlite_backend.store_many(key, {'instructions_count': 1, 'instructions_first': '4198400'})
+        assert sqlite_backend.load_many(key, ['instructions_count', 'missing']) == [1, None]
+        assert sorted(sqlite_backend.fields(key)) == ['instructions_count', 'instructions_first']
+
+    def test_backend_sqlite_delete_cleanup(self, sqlite_backend):
+        key = 'motex:default:instructions'
+        sqlite_backend.store_many(key, {'a': TEST_INSTRUCTION, 'b': TEST_INSTRUCTION})
+        assert sqlite_backend.delete(key, 'a')
+        assert sqlite_backend.load(key, 'a') is None
+
+        sqlite_backend.cleanup(key)
+        assert sqlite_backend.load(key, 'b') is None
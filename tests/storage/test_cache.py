@@ -0,0 +1,70 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.storage import MotexStorage
+from motex.storage.cache import MotexStorageCache
+
+
+class TestMotexStorageCache:
+    def test_cache_requires_capacity(self):
+        with pytest.raises(Exception) as e:
+            MotexStorageCache()
+        assert str(e.value) == "cache requires max_entries or max_bytes"
+
+    def test_cache_hit_miss(self):
+        cache = MotexStorageCache(max_entries=2)
+        assert cache.get('key', 'a') is None
+        cache.put('key', 'a', {'a': 1})
+        assert cache.get('key', 'a') == {'a': 1}
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_cache_evicts_least_recently_used_entry(self):
+        cache = MotexStorageCache(max_entries=2)
+        cache.put('key', 'a', 1)
+        cache.put('key', 'b', 2)
+        cache.get('key', 'a')
+        cache.put('key', 'c', 3)
+        assert ('key', 'a') in cache
+        assert ('key', 'b') not in cache
+        assert cache.evictions == 1
+
+    def test_cache_evicts_on_bytes(self):
+        cache = MotexStorageCache(max_bytes=10)
+        cache.put('key', 'a', 1, size=6)
+        cache.put('key', 'b', 2, size=6)
+        assert len(cache) == 1
+        assert cache.size == 6
+
+    def test_cache_invalidate_key(self):
+        cache = MotexStorageCache(max_entries=10)
+        cache.put('key', 'a', 1)
+        cache.put('other', 'a', 1)
+        cache.invalidate_key('key')
+        assert ('key', 'a') not in cache
+        assert ('other', 'a') in cache
+
+
+class TestMotexStorageCached:
+    @pytest.fixture
+    def storage(self):
+        return MotexStorage('vedis', 'json', cache_entries=10, database_path=':mem:')
+
+    def test_storage_load_is_cached(self, storage):
+        storage.store('key', 'a', [1])
+        assert storage.load('key', 'a') == [1]
+        assert storage.load_many('key', ['a']) == [[1]]
+        assert storage.cache_stats()['hits'] == 1
+
+    def test_storage_store_invalidates(self, storage):
+        storage.store('key', 'a', [1])
+        storage.load('key', 'a')
+        storage.store_many('key', {'a': [2]})
+        assert storage.load('key', 'a') == [2]
+
+    def test_storage_cleanup_invalidates(self, storage):
+        storage.store('key', 'a', [1])
+        storage.load('key', 'a')
+        storage.cleanup('key')
+        assert storage.load('key', 'a') is None
@@ -6,13 +6,24 @@ from motex.storage.formatter import (
     StorageFormatter,
     StorageJsonFormatter,
     StorageMsgpackFormatter,
+    StorageCompactFormatter,
 )
+from motex.storage import MotexStorage
+
+TEST_INSTRUCTION = {'prev_': 4198480, 'next_': 4198485, 'index_': 4198482, 'ordinal_': 1,
+                    'address': 4198482, 'function_address': 4198480, 'basicblock_address': None,
+                    'content': '4989d1', 'content_str': ['mov', 'r9, rdx']}
+
+TEST_SYMBOL = {'prev_': None, 'next_': 1, 'index_': 0, 'ordinal_': 0, 'symbol_num': 0, 'symbol_index': '0',
+               'symbol_value': 0, 'symbol_size': 0, 'symbol_type': 'FUNC', 'symbol_bind': 'GLOBAL',
+               'symbol_visibility': 'DEFAULT', 'symbol_name': 'printf', 'symbol_import_export': 'I',
+               'symbol_version': 'GLIBC_2.2.5(3)'}
 
 
 class TestStorageFormatter:
     def test_storage_formatter_len(self):
         test_data = [1, 2, 3]
-        assert len(StorageFormatter.formatters.items()) == 2
+        assert len(StorageFormatter.formatters.items()) == 3
 
     def test_storage_formatter_keys(self):
         assert StorageFormatter.formatters.get('json') is not None
@@ -51,3 +62,62 @@ class TestStorageMsgpackFormatter:
     def test_storage_msgpack_formatter_serialize_invalid_argument(self):
         with pytest.raises(ValueError) as e:
             assert StorageMsgpackFormatter.serialize(None)
+
+    def test_storage_msgpack_formatter_deserialize_valid_argument(self):
+        test_data = {'content': b'\x90\xff\x00', 'content_str': ['nop', '\u00e9']}
+        serialized = StorageMsgpackFormatter.serialize(test_data)
+        assert StorageMsgpackFormatter.deserialize(serialized) == test_data
+        assert StorageMsgpackFormatter.deserialize(memoryview(serialized)) == test_data
+
+    def test_storage_msgpack_formatter_deserialize_invalid_argument(self):
+        with pytest.raises(ValueError) as e:
+            assert StorageMsgpackFormatter.deserialize('\x93\x01\x02\x03')
+        assert str(e.value) == 'data must be bytes'
+
+    @pytest.mark.parametrize('backend', ['vedis', 'redis'])
+    def test_storage_msgpack_formatter_backends(self, backend):
+        kwargs = {'database_path': ':mem:'}
+        if backend == 'redis':
+            fakeredis = pytest.importorskip('fakeredis')
+            kwargs = {'client': fakeredis.FakeRedis()}
+
+        storage = MotexStorage(backend, 'msgpack', **kwargs)
+        test_data = {'content': bytes(range(256)), 'name': '100%'}
+        storage.store_many('motex:default:meta', {'a': test_data, 'b': [1, 2]})
+        assert storage.load_many('motex:default:meta', ['a', 'b']) == [test_data, [1, 2]]
+
+
+class TestStorageCompactFormatter:
+    def test_storage_compact_formatter_name(self):
+        assert StorageCompactFormatter.__format_name__ == 'compact'
+
+    @pytest.mark.parametrize('kind, record', [('instructions', TEST_INSTRUCTION), ('symbols', TEST_SYMBOL)])
+    def test_storage_compact_formatter_records(self, kind, record):
+        serialized = StorageCompactFormatter.serialize(record, kind)
+        assert isinstance(serialized, bytes)
+        assert len(serialized) < len(StorageJsonFormatter.serialize(record)) // 3
+        assert StorageCompactFormatter.deserialize(serialized, kind) == record
+
+    @pytest.mark.parametrize('record', [dict(TEST_INSTRUCTION, content='4989D1'),
+                                        dict(TEST_INSTRUCTION, prev_='00401050'),
+                                        dict(TEST_INSTRUCTION, instructions_list=[])])
+    def test_storage_compact_formatter_unfit_records(self, record):
+        serialized = StorageCompactFormatter.serialize(record, 'instructions')
+        assert StorageCompactFormatter.deserialize(serialized, 'instructions') == record
+
+    def test_storage_compact_formatter_values(self):
+        for value in ([1, 2, 3], {'a': [1.5, None, True]}, 'text'):
+            assert StorageCompactFormatter.deserialize(StorageCompactFormatter.serialize(value)) == value
+
+    def test_storage_compact_formatter_invalid_argument(self):
+        with pytest.raises(ValueError):
+            StorageCompactFormatter.serialize(None)
+        with pytest.raises(ValueError):
+            StorageCompactFormatter.deserialize('[1, 2, 3]')
+
+    def test_storage_compact_formatter_vedis(self):
+        storage = MotexStorage('vedis', 'compact', database_path=':mem:')
+        storage.store_many('motex:default:instructions', {'4198482': TEST_INSTRUCTION})
+        storage.store('motex:default:meta', 'instructions_pages', 1)
+        assert storage.load('motex:default:instructions', '4198482') == TEST_INSTRUCTION
+        assert storage.load('motex:default:meta', 'instructions_pages') == 1
@@ -0,0 +1,74 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.storage import MotexStorage
+
+_KEY = 'motex:default:instructions'
+
+
+def record(address):
+    return {'address': address, 'content': '90', 'content_str': ['nop', '']}
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+@pytest.mark.parametrize('storage_format', ['json', 'msgpack', 'compact'])
+def test_pages_roundtrip(compression, storage_format):
+    storage = MotexStorage('vedis', storage_format, database_path=':mem:', pages=compression, page_span=16)
+    storage.store_many(_KEY, {str(address): record(address) for address in range(40)})
+    storage.store(_KEY, '41', record(41))
+
+    assert storage.load(_KEY, '3') == record(3)
+    assert storage.load_many(_KEY, ['39', '0', '41', '40']) == [record(39), record(0), record(41), None]
+    # 42 records of addresses 0 to 41 fill 3 pages
+    assert len(storage.backend.db.Hash(_KEY + ':pages').keys()) == 3
+    assert storage.backend.load(_KEY, '3') is None
+    assert sorted(storage.fields(_KEY), key=int) == [str(address) for address in range(40)] + ['41']
+
+
+def test_pages_redis():
+    fakeredis = pytest.importorskip('fakeredis')
+    storage = MotexStorage('redis', 'compact', client=fakeredis.FakeRedis(), pages='zlib')
+    storage.store_many(_KEY, {str(address): record(address) for address in range(8)})
+    storage.pages.cache.clear()
+    assert storage.load_many(_KEY, ['7', '0']) == [record(7), record(0)]
+
+
+def test_pages_delete_cleanup():
+    storage = MotexStorage('vedis', 'json', database_path=':mem:', pages='zlib', page_span=16)
+    storage.store_many(_KEY, {str(address): record(address) for address in range(20)})
+
+    storage.delete(_KEY, '17')
+    assert storage.load(_KEY, '17') is None and storage.load(_KEY, '18') == record(18)
+    for address in range(16):
+        storage.delete(_KEY, str(address))
+    assert storage.backend.load(_KEY + ':pages', '0') is None
+
+    storage.cleanup(_KEY)
+    assert storage.load(_KEY, '18') is None
+
+
+def test_pages_decoded_once():
+    storage = MotexStorage('vedis', 'json', database_path=':mem:', pages='zlib', page_span=16, page_cache=1)
+    storage.store_many(_KEY, {str(address): record(address) for address in range(32)})
+    storage.pages.cache.clear()
+    misses = storage.pages.cache.misses
+
+    assert [storage.load(_KEY, str(address)) for address in range(32)] == [record(address) for address in range(32)]
+    assert storage.pages.cache.misses - misses == 2
+
+
+def test_pages_only_instructions():
+    storage = MotexStorage('vedis', 'json', database_path=':mem:', pages='zlib')
+    storage.store('motex:default:functions', '1', {'address': 1})
+    assert storage.backend.load('motex:default:functions', '1') == b'{"address": 1}'
+
+
+def test_pages_invalid():
+    with pytest.raises(Exception) as e:
+        MotexStorage('vedis', 'json', database_path=':mem:', pages='gzip')
+    assert str(e.value) == "unknown page compression `gzip`"
+
+    with pytest.raises(Exception) as e:
+        MotexStorage('sqlite', 'json', database_path=':memory:', pages='zlib')
+    assert str(e.value) == "backend `sqlite` stores records natively, it cannot store pages"
@@ -0,0 +1,73 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.storage import MotexStorage
+
+TEST_INSTRUCTION = {'prev_': None,
+                    'next_': 0x401001,
+                    'index_': 0x401000,
+                    'ordinal_': 0,
+                    'address': 0x401000,
+                    'function_address': 0x401000,
+                    'basicblock_address': None,
+                    'content': '55',
+                    'content_str': ['push', 'rbp']}
+
+
+@pytest.fixture(params=['json', 'msgpack', 'compact'])
+def snapshot(request, tmp_path):
+    storage = MotexStorage('vedis', request.param, database_path=':mem:')
+    storage.store_many('motex:default:instructions', {'4198400': TEST_INSTRUCTION, '16': TEST_INSTRUCTION})
+    storage.store('motex:default:instructions:order', '0', [16, 4198400])
+    storage.store_many('motex:default:meta', {'instructions_count': 2, 'name': 'été'})
+    storage.store('motex:default:checkpoint', 'state', {'address': 1})
+    storage.in_namespace('t2').store('motex:default:meta', 'instructions_count', 3)
+    storage.add_namespaces(['t2'])
+
+    path = str(tmp_path / 'test.motex')
+    assert storage.snapshot(path) == 7
+    return MotexStorage('snapshot', request.param, path=path)
+
+
+def test_snapshot_load(snapshot):
+    assert snapshot.load('motex:default:instructions', '4198400') == TEST_INSTRUCTION
+    assert snapshot.load_many('motex:default:instructions', ['16', '17', 'x']) == [TEST_INSTRUCTION, None, None]
+    assert snapshot.load('motex:default:instructions:order', '0') == [16, 4198400]
+    assert snapshot.load_many('motex:default:meta', ['name', 'missing']) == ['été', None]
+    assert snapshot.load('motex:default:checkpoint', 'state') is None
+    assert snapshot.load('motex:default:functions', '16') is None
+
+    assert snapshot.namespaces() == ['t2']
+    assert snapshot.in_namespace('t2').load('motex:default:meta', 'instructions_count') == 3
+    assert snapshot.fields('motex:default:instructions') == ['16', '4198400']
+
+    # values are views of the mapped file, except for json
+    data = snapshot.backend.load('motex:default:instructions', '16')
+    assert isinstance(data, bytes if snapshot.storage_format == 'json' else memoryview)
+
+
+def test_snapshot_read_only(snapshot):
+    with pytest.raises(Exception) as e:
+        snapshot.store('motex:default:meta', 'name', 'x')
+    assert str(e.value).endswith('is read-only')
+
+
+def test_snapshot_invalid(tmp_path):
+    storage = MotexStorage('vedis', 'json', database_path=':mem:')
+    storage.store('motex:default:meta', 'name', 't')
+    path = str(tmp_path / 'test.motex')
+    storage.snapshot(path)
+
+    with pytest.raises(Exception) as e:
+        MotexStorage('snapshot', 'compact', path=path)
+    assert str(e.value) == "snapshot backend holds json records, format must be json"
+
+    (tmp_path / 'other').write_bytes(b'not a snapshot' * 4)
+    with pytest.raises(Exception) as e:
+        MotexStorage('snapshot', 'json', path=str(tmp_path / 'other'))
+    assert str(e.value).endswith('is not a motex snapshot')
+
+    with pytest.raises(Exception) as e:
+        MotexStorage('snapshot', 'json')
+    assert str(e.value) == "Snapshot backend requires path argument"
@@ -0,0 +1,92 @@
+from __future__ import absolute_import, print_function
+
+import pytest
+
+from motex.storage import MotexStorage
+
+
+@pytest.fixture
+def storage():
+    return MotexStorage('vedis', 'json', batch_size=2, database_path=':mem:')
+
+
+class TestMotexStorage:
+    def test_storage_store_load(self, storage):
+        assert storage.store('key', 'field', {'a': 1})
+        assert storage.load('key', 'field') == {'a': 1}
+        assert storage.load('key', 'missing') is None
+
+    def test_storage_store_many(self, storage):
+        assert storage.store_many('key', {'a': [1], 'b': [2]})
+        assert storage.load('key', 'a') == [1]
+        assert storage.load('key', 'b') == [2]
+
+    def test_storage_namespaces(self, storage):
+        other = storage.in_namespace('libc.so.6')
+        other.store('motex:default:meta', 'a', 1)
+        assert other.load('motex:default:meta', 'a') == 1
+        assert storage.load('motex:default:meta', 'a') is None
+        assert storage.load('motex:libc.so.6:meta', 'a') == 1
+
+        storage.add_namespaces(['libc.so.6', 'ls'])
+        assert other.namespaces() == ['libc.so.6', 'ls']
+
+    def test_storage_invalid_namespace(self, storage):
+        with pytest.raises(Exception):
+            storage.in_namespace('a:b')
+
+
+class TestMotexStoragePipeline:
+    def test_pipeline_flushes_on_batch_size(self, storage):
+        pipeline = storage.pipeline()
+        pipeline.store('key', 'a', 1)
+        assert storage.load('key', 'a') is None
+
+        pipeline.store('key', 'b', 2)
+        assert storage.load('key', 'a') == 1
+        assert storage.load('key', 'b') == 2
+
+    def test_pipeline_reads_pending_writes(self, storage):
+        with storage.pipeline(batch_size=10) as pipeline:
+            pipeline.store('key', 'a', 1)
+            assert pipeline.load('key', 'a') == 1
+            assert storage.load('key', 'a') is None
+        assert storage.load('key', 'a') == 1
+
+    def test_pipeline_discards_on_error(self, storage):
+        with pytest.raises(ValueError):
+            with storage.pipeline(batch_size=10) as pipeline:
+                pipeline.store('key', 'a', 1)
+                raise ValueError()
+        assert storage.load('key', 'a') is None
+
+    def test_pipeline_cleanup_drops_pending_writes(self, storage):
+        with storage.pipeline(batch_size=10) as pipeline:
+            pipeline.store('key', 'a', 1)
+            pipeline.cleanup('key')
+        assert storage.load('key', 'a') is None
+
+    def test_pipeline_load_many_mixes_pending_writes(self, storage):
+        storage.store('key', 'a', 1)
+        with storage.pipeline(batch_size=10) as pipeline:
+            pipeline.store('key', 'b', 2)
+            assert pipeline.load_many('key', ['a', 'b', 'c']) == [1, 2, None]
+
+
+def test_vedis_reload(tmp_path):
+    path = str(tmp_path / 'test.db')
+    counts = {'motex:default:symbols': 1000, 'motex:default:instructions': 20000, 'motex:default:functions': 800}
+
+    def load():
+        storage = MotexStorage('vedis', 'json', database_path=path)
+        with storage.pipeline() as pipeline:
+            for (key, count) in counts.items():
+                pipeline.cleanup(key)
+                pipeline.store_many(key, {str(n): {'address': n} for n in range(count)})
+        storage.backend.db.close()
+
+    # loading again into the same file used to leave the hashes it had not rewritten yet unreadable
+    load()
+    load()
+    storage = MotexStorage('vedis', 'json', database_path=path)
+    assert {key: len(storage.fields(key)) for key in counts} == counts